@@ -11,6 +11,7 @@ from jose import JWTError
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import get_settings
 from app.core.database import get_db
 from app.core.security import decode_token
 from app.models.user import User
@@ -61,6 +62,17 @@ async def get_current_user(
     return user
 
 
+async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    """Użytkownik z listy ADMIN_EMAILS — dostęp do statystyk całej instalacji."""
+    admins = {email.lower() for email in get_settings().ADMIN_EMAILS}
+    if current_user.email.lower() not in admins:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Wymagane uprawnienia administratora",
+        )
+    return current_user
+
+
 class PaginationParams:
     def __init__(
         self,
@@ -0,0 +1,46 @@
+"""
+Serwowanie plików lokalnego backendu storage (STORAGE_BACKEND="local").
+
+GET/HEAD {LOCAL_STORAGE_PUBLIC_URL}/{bucket}/{key} — odpowiednik publicznego
+bucketu S3. FileResponse obsługuje Range/If-Range (206, wiele zakresów),
+ETag i Last-Modified, więc odtwarzacz może przewijać wideo, a platformy
+pobierać plik fragmentami. Plik wysyłany jest przez sendfile, bez buforowania.
+"""
+
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import FileResponse
+
+from app.core.config import get_settings
+from app.services.video.local_storage import LocalFileStore
+from app.services.video.storage import StorageService
+
+settings = get_settings()
+router = APIRouter()
+
+
+def route_prefix() -> str:
+    """Ścieżka route'a = ścieżka z LOCAL_STORAGE_PUBLIC_URL (domyślnie /media)."""
+    return urlsplit(settings.LOCAL_STORAGE_PUBLIC_URL).path.rstrip("/") or "/media"
+
+
+@lru_cache
+def _store() -> LocalFileStore:
+    return LocalFileStore(settings.LOCAL_STORAGE_DIR, settings.S3_BUCKET_NAME)
+
+
+@router.api_route("/{bucket}/{key:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_media(bucket: str, key: str) -> FileResponse:
+    try:
+        if bucket != settings.S3_BUCKET_NAME:
+            raise ValueError(bucket)
+        path = _store().path(key)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Nie znaleziono"
+        ) from None
+    if not path.is_file():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nie znaleziono")
+    return FileResponse(path, media_type=StorageService.guess_content_type(key))
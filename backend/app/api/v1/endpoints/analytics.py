@@ -11,7 +11,8 @@ from pydantic import BaseModel
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_user
+from app.api.deps import get_current_admin, get_current_user
+from app.core.config import get_settings
 from app.core.database import get_db
 from app.models.series import Series
 from app.models.video import Video, VideoStatus
@@ -122,3 +123,70 @@ async def get_series_stats(
         )
 
     return stats
+
+
+@router.get("/llm-cache")
+async def get_llm_cache_stats(current_user: User = Depends(get_current_admin)):
+    """Skuteczność cache LLM (trafienia / few-shot / chybienia per rodzaj) — tylko admin."""
+    from app.services.llm.semantic_cache import get_cache_stats
+
+    return {"mode": get_settings().LLM_CACHE_MODE, "stats": await get_cache_stats()}
+
+
+@router.get("/retry-amplification")
+async def get_retry_amplification_stats(current_user: User = Depends(get_current_admin)):
+    """Amplifikacja ponowień per provider (próby / wywołania, odmowy budżetu) — tylko admin."""
+    from app.core.retry_budget import get_retry_amplification
+
+    return {
+        "budget_per_job": get_settings().RETRY_BUDGET_PER_JOB,
+        "stats": await get_retry_amplification(),
+    }
+
+
+class VideoCost(BaseModel):
+    video_id: uuid.UUID
+    title: str | None
+    calls: int
+    cost_usd: float
+    tokens: int
+    characters: int
+    api_time_s: float
+    upload_mb: float = 0.0
+    upload_mb_per_s: float = 0.0
+
+
+@router.get("/costs/videos", response_model=list[VideoCost])
+async def get_video_costs(
+    limit: int = Query(50, ge=1, le=500),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Szacunkowy koszt wywołań API per wideo użytkownika (z ledgera)."""
+    from app.services.analytics.ledger import cost_per_video
+
+    return await cost_per_video(db, current_user.id, limit)
+
+
+@router.get("/api-latency")
+async def get_api_latency(
+    hours: int = Query(24, ge=1, le=24 * 30),
+    current_user: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Latencja p50/p95 i odsetek błędów per provider zewnętrzny — tylko admin."""
+    from app.services.analytics.ledger import latency_by_provider
+
+    return {"hours": hours, "providers": await latency_by_provider(db, hours)}
+
+
+@router.get("/llm-usage")
+async def get_llm_usage(
+    hours: int = Query(24, ge=1, le=24 * 30),
+    current_user: User = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db),
+):
+    """Tokeny i koszt LLM per operacja i ścieżka (primary / retry / fallback) — tylko admin."""
+    from app.services.analytics.ledger import usage_by_path
+
+    return {"hours": hours, "operations": await usage_by_path(db, hours)}
@@ -23,6 +23,20 @@ from app.schemas.series import (
 router = APIRouter()
 
 
+async def _validate_voice(tts_provider: str, voice_id: str | None) -> None:
+    """Odrzuca głos spoza katalogu providera (zamiast błędu w połowie pipeline'u)."""
+    if not voice_id:
+        return
+
+    from app.services.tts.voice_catalogue import is_voice_available
+
+    if await is_voice_available(tts_provider, voice_id) is False:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=f"Głos '{voice_id}' nie jest dostępny u providera '{tts_provider}'",
+        )
+
+
 @router.get("", response_model=SeriesListResponse)
 async def list_series(
     pagination: PaginationParams = Depends(),
@@ -76,6 +90,8 @@ async def create_series(
             detail=f"Osiągnięto limit serii ({current_user.max_series}). Ulepsz plan, aby tworzyć więcej.",
         )
 
+    await _validate_voice(body.tts_provider, body.voice_id)
+
     series = Series(
         user_id=current_user.id,
         title=body.title,
@@ -84,6 +100,7 @@ async def create_series(
         language=body.language,
         tone=body.tone,
         target_duration_seconds=body.target_duration_seconds,
+        generation_mode=body.generation_mode,
         schedule_config=body.schedule_config.model_dump(),
         publish_channels=body.publish_channels.model_dump(),
         visual_style=body.visual_style.model_dump(),
@@ -138,6 +155,12 @@ async def update_series(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Seria nie znaleziona")
 
     update_data = body.model_dump(exclude_unset=True)
+    if update_data.get("voice_id") or update_data.get("tts_provider"):
+        await _validate_voice(
+            update_data.get("tts_provider") or series.tts_provider,
+            update_data.get("voice_id") or series.voice_id,
+        )
+
     for field, value in update_data.items():
         if value is not None:
             if hasattr(value, "model_dump"):
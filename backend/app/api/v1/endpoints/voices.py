@@ -0,0 +1,54 @@
+"""
+Endpointy katalogu głosów TTS.
+Ulepszenie: cache w Redis + ETag (klient odpytuje bez ponownego transferu listy).
+"""
+
+from typing import Any
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from pydantic import BaseModel
+
+from app.api.deps import get_current_user
+from app.models.user import User
+from app.services.tts.voice_catalogue import get_voice_catalogue
+
+router = APIRouter()
+
+SUPPORTED_PROVIDERS = ("elevenlabs", "google", "local")
+
+
+class VoiceCatalogueResponse(BaseModel):
+    provider: str
+    voices: list[dict[str, Any]]
+    fetched_at: float
+
+
+@router.get("", response_model=VoiceCatalogueResponse)
+async def list_voices(
+    response: Response,
+    provider: str = Query(default="elevenlabs"),
+    if_none_match: str | None = Header(default=None),
+    current_user: User = Depends(get_current_user),
+):
+    """Lista głosów providera TTS. Obsługuje If-None-Match (304 Not Modified)."""
+    if provider not in SUPPORTED_PROVIDERS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Nieznany provider TTS")
+
+    try:
+        catalogue = await get_voice_catalogue(provider)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Katalog głosów chwilowo niedostępny",
+        ) from e
+
+    headers = {"ETag": catalogue.etag, "Cache-Control": "private, max-age=300"}
+    if if_none_match and catalogue.etag in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    response.headers.update(headers)
+    return VoiceCatalogueResponse(
+        provider=catalogue.provider,
+        voices=catalogue.voices,
+        fetched_at=catalogue.fetched_at,
+    )
@@ -2,13 +2,23 @@
 
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import auth, series, videos, publishing, analytics, webhooks, users
+from app.api.v1.endpoints import (
+    analytics,
+    auth,
+    publishing,
+    series,
+    users,
+    videos,
+    voices,
+    webhooks,
+)
 
 api_router = APIRouter()
 
 api_router.include_router(auth.router, prefix="/auth", tags=["Autoryzacja"])
 api_router.include_router(users.router, prefix="/users", tags=["Użytkownicy"])
 api_router.include_router(series.router, prefix="/series", tags=["Serie"])
+api_router.include_router(voices.router, prefix="/voices", tags=["Głosy"])
 api_router.include_router(videos.router, prefix="/videos", tags=["Wideo"])
 api_router.include_router(publishing.router, prefix="/publishing", tags=["Publikacja"])
 api_router.include_router(analytics.router, prefix="/analytics", tags=["Analityka"])
@@ -3,12 +3,17 @@ Konfiguracja aplikacji — centralne zarządzanie zmiennymi środowiskowymi.
 Ulepszenie: walidacja Pydantic Settings + grupowanie po domenach + sensowne defaults.
 """
 
+import os
+import tempfile
 from functools import lru_cache
 from typing import Literal
 
 from pydantic import Field, PostgresDsn, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# Katalog tymczasowy systemu (TMPDIR) — ten sam, w którym pipeline tworzy katalogi robocze
+_TMP_DIR = tempfile.gettempdir()
+
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
@@ -43,6 +48,8 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Konta z dostępem do globalnych statystyk (cache LLM, koszty, latencja) — CSV lub JSON
+    ADMIN_EMAILS: list[str] = []
 
     # ── OAuth2 Providers ──
     GOOGLE_CLIENT_ID: str = ""
@@ -54,6 +61,18 @@ class Settings(BaseSettings):
     OPENAI_MODEL: str = "gpt-4"
     OPENAI_MAX_TOKENS: int = 2000
     OPENAI_TEMPERATURE: float = 0.7
+    OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"
+    EMBEDDING_DIMENSIONS: int = 1536
+
+    # ── Budżet ponowień (wspólny dla wszystkich warstw retry w zadaniu) ──
+    RETRY_BUDGET_PER_JOB: int = 8
+
+    # ── Semantyczny cache LLM (pgvector) ──
+    LLM_CACHE_MODE: Literal["off", "reuse", "few_shot"] = "off"
+    LLM_CACHE_SCOPE: Literal["series", "language"] = "series"  # reuse pomija bieżącą serię
+    LLM_CACHE_SIMILARITY_THRESHOLD: float = 0.95  # reuse: próg podobieństwa cosinusowego
+    LLM_CACHE_FEW_SHOT_THRESHOLD: float = 0.80
+    LLM_CACHE_FEW_SHOT_EXAMPLES: int = 2
 
     # ── ElevenLabs TTS ──
     ELEVENLABS_API_KEY: str = ""
@@ -63,6 +82,16 @@ class Settings(BaseSettings):
     # ── Google Cloud TTS (fallback) ──
     GOOGLE_TTS_CREDENTIALS_PATH: str = ""
 
+    # ── Lokalny TTS (offline / testy obciążeniowe) ──
+    LOCAL_TTS_SAMPLE_RATE: int = 22050
+    LOCAL_TTS_CHARS_PER_SECOND: float = 15.0  # tempo zbliżone do naturalnej narracji
+    LOCAL_TTS_LATENCY_MS: int = 0  # sztuczne opóźnienie symulujące API
+    LOCAL_TTS_LATENCY_JITTER_MS: int = 0
+
+    # ── Katalog głosów (cache Redis) ──
+    VOICE_CATALOGUE_TTL_SECONDS: int = 86400
+    VOICE_CATALOGUE_REFRESH_AFTER_SECONDS: int = 3600
+
     # ── Storage (S3 / MinIO) ──
     S3_ENDPOINT_URL: str = ""
     S3_PUBLIC_BASE_URL: str = ""  # publiczny URL dla przeglądarki, np. http://localhost:9000
@@ -70,18 +99,48 @@ class Settings(BaseSettings):
     S3_SECRET_KEY: str = ""
     S3_BUCKET_NAME: str = "autoshorts-media"
     S3_REGION: str = "eu-central-1"
+    S3_UPLOAD_CONCURRENCY: int = 4  # równoległe operacje S3 na proces (AsyncStorageService)
+    S3_MAX_POOL_CONNECTIONS: int = 50  # ≥ S3_UPLOAD_CONCURRENCY × S3_MULTIPART_CONCURRENCY
+    S3_MULTIPART_THRESHOLD_MB: int = 32
+    S3_MULTIPART_PART_SIZE_MB: int = 16  # min. 5 MB (limit S3), max. 10 000 części
+    S3_MULTIPART_CONCURRENCY: int = 8  # równoległe części jednego pliku
+    S3_UPLOAD_STATE_TTL_SECONDS: int = 3 * 24 * 3600  # jak długo można wznowić upload
+    # Klucze z SHA-256 treści (cas/ab/…) + tabela referencji; identyczne pliki raz w S3
+    STORAGE_CONTENT_ADDRESSED: bool = False
+    STORAGE_BLOB_GC_GRACE_HOURS: int = 24
+    # GC osieroconych plików audio/ i videos/ — domyślnie tylko raport (dry-run)
+    STORAGE_GC_DRY_RUN: bool = True
+    STORAGE_GC_GRACE_HOURS: int = 48
+    # "local" — katalog na dysku (jeden węzeł / CI), pliki serwowane przez route /media
+    STORAGE_BACKEND: Literal["s3", "local"] = "s3"
+    # Najlepiej ten sam system plików co katalog roboczy (hardlink zamiast kopii)
+    LOCAL_STORAGE_DIR: str = os.path.join(_TMP_DIR, "autoshorts_storage")
+    LOCAL_STORAGE_PUBLIC_URL: str = "http://localhost:8000/media"  # ścieżka URL = route API
+
+    # ── Publikacja (strumieniowy upload na platformy) ──
+    PUBLISH_STREAM_CHUNK_MB: int = 8  # pamięć na jeden upload
+    # Rendery do publikacji z węzła (hardlink z katalogu roboczego)
+    PUBLISH_RENDER_CACHE_DIR: str = os.path.join(_TMP_DIR, "autoshorts_renders")
+    PUBLISH_RENDER_CACHE_HOURS: int = 24
 
     # ── YouTube API ──
     YOUTUBE_CLIENT_ID: str = ""
     YOUTUBE_CLIENT_SECRET: str = ""
+    YOUTUBE_UPLOAD_CHUNK_MB: int = 8  # zaokrąglane w dół do wielokrotności 256 KiB
+    YOUTUBE_UPLOAD_MAX_RESUMES: int = 5  # wznowienia w jednym wywołaniu; potem retry zadania
 
     # ── TikTok API ──
     TIKTOK_CLIENT_KEY: str = ""
     TIKTOK_CLIENT_SECRET: str = ""
+    TIKTOK_UPLOAD_CHUNK_MB: int = 10  # API: 5–64 MB, ostatni kawałek do 128 MB
 
     # ── Instagram / Meta ──
     META_APP_ID: str = ""
     META_APP_SECRET: str = ""
+    # Polling kontenerów Reels (zadanie beat): interwał × 2^próby, do maksimum
+    INSTAGRAM_POLL_INTERVAL_SECONDS: int = 15
+    INSTAGRAM_POLL_MAX_INTERVAL_SECONDS: int = 300
+    INSTAGRAM_PROCESSING_TIMEOUT_MINUTES: int = 60
 
     # ── Stripe ──
     STRIPE_SECRET_KEY: str = ""
@@ -93,6 +152,18 @@ class Settings(BaseSettings):
 
     # ── Stock Media (Pexels) ──
     PEXELS_API_KEY: str = ""
+    PEXELS_SEARCH_CONCURRENCY: int = 4
+    PEXELS_CANDIDATES_PER_QUERY: int = 5  # zapas na omijanie powtórek w serii
+    PEXELS_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    PEXELS_CLIP_MAX_DURATION_SECONDS: int = 30
+    SERIES_MEDIA_HISTORY_VIDEOS: int = 20  # ile ostatnich odcinków sprawdzać pod kątem powtórek
+
+    # ── Biblioteka mediów (pgvector + S3) ──
+    MEDIA_LIBRARY_ENABLED: bool = False
+    MEDIA_LIBRARY_SIMILARITY_THRESHOLD: float = 0.85
+    MEDIA_LIBRARY_INGEST_CONCURRENCY: int = 4
+    MEDIA_PHASH_MAX_DISTANCE: int = 6  # bity (z 64) — bliżej = to samo zdjęcie
+    MEDIA_PHASH_INDEX_REFRESH_SECONDS: int = 3600  # przeładowanie indeksu pHash w procesie
 
     # ── Sentry ──
     SENTRY_DSN: str = ""
@@ -100,14 +171,54 @@ class Settings(BaseSettings):
     # ── Rate Limiting ──
     RATE_LIMIT_PER_MINUTE: int = 60
 
+    # ── Limity providerów zewnętrznych (wspólne dla klastra, Redis) ──
+    PROVIDER_RATE_LIMIT_ENABLED: bool = True
+    OPENAI_RPM: int = 500
+    OPENAI_MAX_IN_FLIGHT: int = 20
+    ELEVENLABS_RPM: int = 100
+    ELEVENLABS_MAX_IN_FLIGHT: int = 5  # limit równoległych żądań zależy od planu
+    PEXELS_RPM: int = 60  # domyślny limit konta Pexels to 200/h — ustawić wg planu
+    PEXELS_MAX_IN_FLIGHT: int = 10
+    RATE_LIMIT_ACQUIRE_TIMEOUT_SECONDS: int = 120
+    RATE_LIMIT_LEASE_TTL_SECONDS: int = 180  # slot padniętego workera wraca po TTL
+
+    # ── Ledger wywołań API (koszt / latencja) ──
+    LEDGER_ENABLED: bool = True
+    LEDGER_FLUSH_BATCH_SIZE: int = 500
+    LEDGER_MAX_BUFFER: int = 10000
+    LEDGER_STATS_MAX_ROWS: int = 50000  # tylko SQLite: percentyle liczone w Pythonie z próbki
+    # Szacunkowy cennik (USD) — aktualizować wg planów u providerów
+    COST_OPENAI_PROMPT_PER_1K: float = 0.03
+    COST_OPENAI_COMPLETION_PER_1K: float = 0.06
+    COST_OPENAI_FALLBACK_PROMPT_PER_1K: float = 0.0005  # gpt-3.5-turbo
+    COST_OPENAI_FALLBACK_COMPLETION_PER_1K: float = 0.0015
+    COST_OPENAI_EMBEDDING_PER_1K: float = 0.00002
+    COST_ELEVENLABS_PER_1K_CHARS: float = 0.30
+    COST_GOOGLE_TTS_PER_1K_CHARS: float = 0.016
+
+    # ── Nagrywanie / odtwarzanie HTTP providerów (benchmarki, testy offline) ──
+    PROVIDER_HTTP_MODE: Literal["live", "record", "replay"] = "live"
+    PROVIDER_FIXTURES_DIR: str = "fixtures/providers"
+    PROVIDER_REPLAY_LATENCY: Literal["none", "recorded", "fixed", "normal", "lognormal"] = (
+        "recorded"
+    )
+    PROVIDER_REPLAY_LATENCY_MEAN_MS: float = 800.0
+    PROVIDER_REPLAY_LATENCY_STDDEV_MS: float = 300.0
+    PROVIDER_REPLAY_SEED: int = 42
+
     # ── FFmpeg ──
     FFMPEG_PATH: str = "ffmpeg"
     FFPROBE_PATH: str = "ffprobe"
 
+    # ── Cache klipów mezzanine (1080x1920, stałe FPS, krótki GOP) ──
+    CLIP_CACHE_DIR: str = os.path.join(_TMP_DIR, "autoshorts_clip_cache")
+    CLIP_CACHE_MAX_BYTES: int = 20 * 1024**3
+    CLIP_TRANSCODE_CONCURRENCY: int = 2
+
     # ── Moderacja treści ──
     CONTENT_MODERATION_ENABLED: bool = True
 
-    @field_validator("ALLOWED_ORIGINS", mode="before")
+    @field_validator("ALLOWED_ORIGINS", "ADMIN_EMAILS", mode="before")
     @classmethod
     def parse_origins(cls, v: str | list[str]) -> list[str]:
         if isinstance(v, str):
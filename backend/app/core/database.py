@@ -5,6 +5,7 @@ Ulepszenie: connection pooling, health check, graceful shutdown.
 
 from collections.abc import AsyncGenerator
 
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 
@@ -46,6 +47,9 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
 async def init_db() -> None:
     """Tworzy tabele (używane w developmencie; na produkcji Alembic)."""
     async with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Kolumny Vector (semantyczny cache LLM) wymagają rozszerzenia pgvector
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
         await conn.run_sync(Base.metadata.create_all)
 
 
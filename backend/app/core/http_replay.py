@@ -0,0 +1,161 @@
+"""
+Nagrywanie i odtwarzanie odpowiedzi HTTP providerów (OpenAI, ElevenLabs, Pexels).
+
+PROVIDER_HTTP_MODE:
+- live   — zwykłe wywołania sieciowe (domyślnie),
+- record — wywołania sieciowe + zapis odpowiedzi do fixture'ów,
+- replay — odpowiedzi serwowane z fixture'ów przez transport httpx w procesie,
+  z opóźnieniem wg PROVIDER_REPLAY_LATENCY (bez sieci i bez kosztów).
+
+Fixture = jeden plik JSON per żądanie; klucz to hash metody, hosta, ścieżki,
+parametrów i kanonicznego body (bez nagłówków autoryzacji), więc ten sam
+prompt zawsze trafia w to samo nagranie.
+"""
+
+import asyncio
+import base64
+import contextlib
+import hashlib
+import json
+import math
+import random
+import time
+from pathlib import Path
+
+import httpx
+import structlog
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+# Nagłówki zależne od transportu — treść zapisujemy już zdekodowaną
+_DROP_RESPONSE_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+_rng = random.Random(settings.PROVIDER_REPLAY_SEED)  # noqa: S311 — powtarzalne opóźnienia
+
+
+class FixtureNotFoundError(RuntimeError):
+    """Brak nagrania dla żądania w trybie replay."""
+
+
+def request_key(request: httpx.Request) -> str:
+    body = request.content or b""
+    with contextlib.suppress(ValueError, UnicodeDecodeError):
+        body = json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False).encode()
+    query = sorted(request.url.params.multi_items())
+    raw = f"{request.method} {request.url.host}{request.url.path} {query}".encode() + b"\n" + body
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+def _replay_delay(recorded_ms: float) -> float:
+    """Opóźnienie odpowiedzi w sekundach wg skonfigurowanego rozkładu."""
+    mode = settings.PROVIDER_REPLAY_LATENCY
+    mean = settings.PROVIDER_REPLAY_LATENCY_MEAN_MS
+    std = settings.PROVIDER_REPLAY_LATENCY_STDDEV_MS
+    if mode == "none":
+        ms = 0.0
+    elif mode == "recorded":
+        ms = recorded_ms
+    elif mode == "fixed":
+        ms = mean
+    elif mode == "normal":
+        ms = _rng.gauss(mean, std)
+    else:  # lognormal — długi ogon jak u prawdziwych API
+        sigma = math.sqrt(math.log(1 + (std / mean) ** 2)) if mean > 0 else 0.0
+        ms = _rng.lognormvariate(math.log(mean) - sigma**2 / 2, sigma) if mean > 0 else 0.0
+    return max(ms, 0.0) / 1000
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Transport httpx nagrywający (record) lub odtwarzający (replay) odpowiedzi providera."""
+
+    def __init__(self, provider: str, mode: str, fixtures_dir: str | Path):
+        self.provider = provider
+        self.mode = mode
+        self.dir = Path(fixtures_dir) / provider
+        self._live = httpx.AsyncHTTPTransport() if mode == "record" else None
+
+    def _path(self, request: httpx.Request) -> Path:
+        return self.dir / f"{request_key(request)}.json"
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.mode == "record":
+            return await self._record(request)
+        return await self._replay(request)
+
+    async def _record(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        response = await self._live.handle_async_request(request)
+        content = await response.aread()  # już zdekodowane (gzip itp.)
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        headers = {
+            k: v for k, v in response.headers.items() if k.lower() not in _DROP_RESPONSE_HEADERS
+        }
+        await response.aclose()
+
+        path = self._path(request)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "url": f"{request.url.scheme}://{request.url.host}{request.url.path}",
+                    "status_code": response.status_code,
+                    "headers": headers,
+                    "body_b64": base64.b64encode(content).decode(),
+                    "latency_ms": round(latency_ms, 1),
+                },
+                ensure_ascii=False,
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+        logger.info("Replay: nagrano odpowiedź", provider=self.provider, path=str(path))
+        return httpx.Response(
+            response.status_code, headers=headers, content=content, request=request
+        )
+
+    async def _replay(self, request: httpx.Request) -> httpx.Response:
+        path = self._path(request)
+        if not path.exists():
+            logger.error(
+                "Replay: brak nagrania",
+                provider=self.provider,
+                method=request.method,
+                url=str(request.url.copy_with(query=None)),
+                key=path.stem,
+            )
+            raise FixtureNotFoundError(f"Brak fixture {path}")
+
+        fixture = json.loads(path.read_text(encoding="utf-8"))
+        await asyncio.sleep(_replay_delay(fixture.get("latency_ms", 0.0)))
+        return httpx.Response(
+            fixture["status_code"],
+            headers=fixture["headers"],
+            content=base64.b64decode(fixture["body_b64"]),
+            request=request,
+        )
+
+    async def aclose(self) -> None:
+        if self._live is not None:
+            await self._live.aclose()
+
+
+def replay_transport(provider: str) -> httpx.AsyncBaseTransport | None:
+    """Transport dla klienta httpx providera; None w trybie live (domyślny transport)."""
+    if settings.PROVIDER_HTTP_MODE == "live":
+        return None
+    return ReplayTransport(provider, settings.PROVIDER_HTTP_MODE, settings.PROVIDER_FIXTURES_DIR)
+
+
+def openai_http_client() -> httpx.AsyncClient | None:
+    """Klient httpx dla AsyncOpenAI (http_client=); None w trybie live."""
+    transport = replay_transport("openai")
+    if transport is None:
+        return None
+    from openai import DefaultAsyncHttpxClient
+
+    return DefaultAsyncHttpxClient(transport=transport)
@@ -0,0 +1,162 @@
+"""
+Rozproszony limiter wywołań zewnętrznych providerów (OpenAI, ElevenLabs, Pexels).
+
+Każdy worker Celery woła providerów niezależnie — po skalowaniu workerów
+kończy się to falami 429, które retry dodatkowo wzmacnia. Limiter trzyma stan
+w Redis, wspólny dla całego klastra, per provider i klucz API:
+- token bucket (requests per minute, z dopuszczalnym burstem = RPM),
+- limit równoległych wywołań (lease z TTL — padnięty worker nie blokuje slotu).
+
+Oba warunki sprawdzane są atomowo jednym skryptem Lua. Gdy Redis jest
+niedostępny, limiter przepuszcza wywołania (fail-open).
+"""
+
+import asyncio
+import hashlib
+import random
+import time
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+import structlog
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+_KEY_PREFIX = "ratelimit:"
+
+# KEYS: bucket (hash tokens/ts), in-flight (zset lease_id -> wygaśnięcie)
+# ARGV: rpm, max_in_flight, lease_id, lease_ttl_ms
+# Zwraca 0 (przyznano) albo liczbę ms do kolejnej próby.
+_ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local rpm = tonumber(ARGV[1])
+local max_in_flight = tonumber(ARGV[2])
+local lease_ttl = tonumber(ARGV[4])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+if redis.call('ZCARD', KEYS[2]) >= max_in_flight then
+  local oldest = redis.call('ZRANGE', KEYS[2], 0, 0, 'WITHSCORES')
+  return math.max(math.min(tonumber(oldest[2]) - now, 250), 25)
+end
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or rpm
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(rpm, tokens + (now - ts) * rpm / 60000)
+if tokens < 1 then
+  redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+  return math.ceil((1 - tokens) * 60000 / rpm)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 120000)
+redis.call('ZADD', KEYS[2], now + lease_ttl, ARGV[3])
+redis.call('PEXPIRE', KEYS[2], lease_ttl)
+return 0
+"""
+
+
+class RateLimitTimeoutError(RuntimeError):
+    """Nie udało się uzyskać slotu u providera w zadanym czasie."""
+
+
+@dataclass(frozen=True)
+class ProviderLimit:
+    rpm: int
+    max_in_flight: int
+
+
+def _limits() -> dict[str, ProviderLimit]:
+    return {
+        "openai": ProviderLimit(settings.OPENAI_RPM, settings.OPENAI_MAX_IN_FLIGHT),
+        "elevenlabs": ProviderLimit(settings.ELEVENLABS_RPM, settings.ELEVENLABS_MAX_IN_FLIGHT),
+        "pexels": ProviderLimit(settings.PEXELS_RPM, settings.PEXELS_MAX_IN_FLIGHT),
+    }
+
+
+def _keys(provider: str, api_key: str) -> tuple[str, str]:
+    key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:12]
+    base = f"{_KEY_PREFIX}{provider}:{key_hash}"
+    return f"{base}:bucket", f"{base}:inflight"
+
+
+async def _get_redis():
+    import redis.asyncio as aioredis
+
+    return aioredis.from_url(settings.REDIS_URL, decode_responses=True, socket_connect_timeout=2)
+
+
+@asynccontextmanager
+async def provider_slot(provider: str, api_key: str) -> AsyncIterator[None]:
+    """
+    Czeka na slot u providera (RPM + max in-flight) i zwalnia go po wyjściu.
+    Rzuca RateLimitTimeoutError po RATE_LIMIT_ACQUIRE_TIMEOUT_SECONDS.
+    """
+    limit = _limits().get(provider)
+    # W trybie replay nie ma prawdziwego providera do ochrony
+    if (
+        not settings.PROVIDER_RATE_LIMIT_ENABLED
+        or limit is None
+        or settings.PROVIDER_HTTP_MODE == "replay"
+    ):
+        yield
+        return
+
+    bucket_key, inflight_key = _keys(provider, api_key)
+    lease_id = uuid.uuid4().hex
+    lease_ttl_ms = settings.RATE_LIMIT_LEASE_TTL_SECONDS * 1000
+
+    try:
+        r = await _get_redis()
+    except Exception as e:
+        logger.warning("Limiter: Redis niedostępny, fail-open", provider=provider, error=str(e))
+        yield
+        return
+
+    acquired = False
+    try:
+        deadline = time.monotonic() + settings.RATE_LIMIT_ACQUIRE_TIMEOUT_SECONDS
+        waited = 0.0
+        while True:
+            try:
+                wait_ms = await r.eval(
+                    _ACQUIRE_SCRIPT,
+                    2,
+                    bucket_key,
+                    inflight_key,
+                    limit.rpm,
+                    limit.max_in_flight,
+                    lease_id,
+                    lease_ttl_ms,
+                )
+            except Exception as e:
+                logger.warning("Limiter: błąd Redis, fail-open", provider=provider, error=str(e))
+                break
+            if wait_ms == 0:
+                acquired = True
+                break
+            # Jitter rozkłada workery w czasie, żeby nie wracały jednocześnie
+            delay = wait_ms / 1000 * random.uniform(1.0, 1.5)  # noqa: S311
+            if time.monotonic() + delay > deadline:
+                raise RateLimitTimeoutError(f"Limit providera {provider} — brak slotu")
+            await asyncio.sleep(delay)
+            waited += delay
+
+        if waited:
+            logger.info(
+                "Limiter: oczekiwanie na slot", provider=provider, waited_s=round(waited, 2)
+            )
+        yield
+    finally:
+        if acquired:
+            try:
+                await r.zrem(inflight_key, lease_id)
+            except Exception as e:
+                logger.warning("Limiter: nie zwolniono slotu", provider=provider, error=str(e))
+        await r.aclose()
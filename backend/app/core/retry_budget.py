@@ -0,0 +1,164 @@
+"""
+Budżet ponowień per zadanie (job) — wspólny dla wszystkich warstw retry.
+
+Ponowienia są zagnieżdżone: tenacity w wrapperach providerów, fallbacki
+(tańszy model, Google TTS) i retry samego zadania Celery. Bez wspólnego limitu
+jeden niesprawny provider mnoży płatne wywołania. Budżet żyje w contextvar
+(dziedziczą go taski asyncio), każda warstwa przed ponowieniem pobiera z niego
+żeton, a pozostała pula przechodzi do kolejnej próby zadania Celery.
+
+Amplifikacja (próby / wywołania logiczne) jest liczona per provider
+i po zakończeniu zadania dopisywana do hasha w Redis.
+"""
+
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import structlog
+from tenacity import RetryCallState, stop_after_attempt, wait_exponential
+from tenacity.stop import stop_base
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+_STATS_KEY = "retry_amplification"
+_COUNTERS = ("calls", "attempts", "denied")
+
+_current_budget: ContextVar["RetryBudget | None"] = ContextVar("retry_budget", default=None)
+
+
+class RetryBudget:
+    def __init__(self, total: int, job_id: str | None = None):
+        self.total = total
+        self.remaining = total
+        self.job_id = job_id
+        self.calls: Counter[str] = Counter()  # wywołania logiczne
+        self.attempts: Counter[str] = Counter()  # fizyczne próby (z ponowieniami)
+        self.denied: Counter[str] = Counter()  # ponowienia zablokowane przez budżet
+
+    def try_consume(self, provider: str) -> bool:
+        """Pobiera żeton na ponowienie; False, gdy budżet wyczerpany."""
+        if self.remaining <= 0:
+            self.denied[provider] += 1
+            logger.warning(
+                "Budżet ponowień wyczerpany", provider=provider, job_id=self.job_id
+            )
+            return False
+        self.remaining -= 1
+        return True
+
+    def amplification(self) -> dict[str, float]:
+        return {
+            provider: round(self.attempts[provider] / calls, 2)
+            for provider, calls in self.calls.items()
+            if calls
+        }
+
+    async def flush_stats(self) -> None:
+        """Dopisuje liczniki zadania do globalnych statystyk w Redis."""
+        if not self.calls:
+            return
+        logger.info(
+            "Amplifikacja ponowień",
+            job_id=self.job_id,
+            remaining=self.remaining,
+            total=self.total,
+            amplification=self.amplification(),
+        )
+        try:
+            import redis.asyncio as aioredis
+
+            r = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+            try:
+                async with r.pipeline(transaction=False) as pipe:
+                    for name in _COUNTERS:
+                        for provider, value in getattr(self, name).items():
+                            if value:
+                                pipe.hincrby(_STATS_KEY, f"{provider}:{name}", value)
+                    await pipe.execute()
+            finally:
+                await r.aclose()
+        except Exception as e:
+            logger.warning("Nie udało się zapisać statystyk ponowień", error=str(e))
+
+
+def current_budget() -> RetryBudget | None:
+    return _current_budget.get()
+
+
+@contextmanager
+def use_retry_budget(budget: RetryBudget) -> Iterator[RetryBudget]:
+    """Ustawia budżet dla bieżącego kontekstu (i tasków asyncio tworzonych w nim)."""
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+def consume_retry(provider: str) -> bool:
+    """
+    Pobiera żeton przed ponowieniem/fallbackiem poza tenacity.
+    Bez aktywnego budżetu (np. wywołanie z API) zawsze zezwala.
+    """
+    budget = current_budget()
+    return budget is None or budget.try_consume(provider)
+
+
+def record_call(provider: str, attempt_number: int = 1) -> None:
+    """Zlicza próbę wywołania providera (pierwsza próba = nowe wywołanie logiczne)."""
+    budget = current_budget()
+    if budget is None:
+        return
+    budget.attempts[provider] += 1
+    if attempt_number == 1:
+        budget.calls[provider] += 1
+
+
+class StopWhenBudgetExhausted(stop_base):
+    """Stop tenacity: przerywa ponowienia, gdy budżet zadania jest pusty."""
+
+    def __init__(self, provider: str):
+        self.provider = provider
+
+    def __call__(self, retry_state: RetryCallState) -> bool:
+        return not consume_retry(self.provider)
+
+
+def budgeted_retry_kwargs(
+    provider: str, attempts: int = 3, min_wait: float = 2, max_wait: float = 10
+) -> dict:
+    """
+    Argumenty dla tenacity.retry/AsyncRetrying: limit prób per wywołanie
+    oraz wspólny budżet zadania. Po odmowie budżetu rzucany jest oryginalny wyjątek.
+    """
+    return {
+        "stop": stop_after_attempt(attempts) | StopWhenBudgetExhausted(provider),
+        "wait": wait_exponential(multiplier=1, min=min_wait, max=max_wait),
+        "before": lambda state: record_call(provider, state.attempt_number),
+        "reraise": True,
+    }
+
+
+async def get_retry_amplification() -> dict[str, dict[str, float]]:
+    """Statystyki per provider: {provider: {calls, attempts, denied, amplification}}."""
+    import redis.asyncio as aioredis
+
+    r = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        raw = await r.hgetall(_STATS_KEY)
+    finally:
+        await r.aclose()
+
+    stats: dict[str, dict[str, float]] = {}
+    for field, value in raw.items():
+        provider, _, name = field.rpartition(":")
+        stats.setdefault(provider, dict.fromkeys(_COUNTERS, 0))[name] = int(value)
+    for counters in stats.values():
+        calls = counters["calls"]
+        counters["amplification"] = round(counters["attempts"] / calls, 2) if calls else 0.0
+    return stats
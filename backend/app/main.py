@@ -14,9 +14,11 @@ from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 from slowapi.util import get_remote_address
 
+from app.api import media
 from app.api.v1.router import api_router
 from app.core.config import get_settings
-from app.core.database import close_db, init_db
+from app.core.database import async_session_factory, close_db, init_db
+from app.services.analytics.ledger import flush_ledger
 
 settings = get_settings()
 logger = structlog.get_logger()
@@ -39,6 +41,10 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    # Dopisz niezapisane rekordy ledgera wywołań API
+    async with async_session_factory() as db:
+        await flush_ledger(db)
+
     await close_db()
     logger.info("AutoShorts API zamknięte")
 
@@ -73,6 +79,12 @@ app.add_middleware(
 # Router
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
+# Lokalny storage — pliki pod tym samym kontraktem URL co bucket S3
+if settings.STORAGE_BACKEND == "local":
+    # Odtwarzacz wysyła wiele żądań Range na jeden plik — bez limitu per minuta
+    limiter.exempt(media.serve_media)
+    app.include_router(media.router, prefix=media.route_prefix())
+
 
 # ── Health Checks ──
 
@@ -4,6 +4,10 @@ from app.models.video import Video
 from app.models.subscription import Subscription
 from app.models.platform_connection import PlatformConnection
 from app.models.publish_job import PublishJob
+from app.models.llm_cache import LLMCacheEntry
+from app.models.api_call import ApiCallRecord
+from app.models.media_asset import MediaAsset
+from app.models.stored_blob import BlobReference, StoredBlob
 
 __all__ = [
     "User",
@@ -12,4 +16,9 @@ __all__ = [
     "Subscription",
     "PlatformConnection",
     "PublishJob",
+    "LLMCacheEntry",
+    "ApiCallRecord",
+    "MediaAsset",
+    "StoredBlob",
+    "BlobReference",
 ]
@@ -0,0 +1,40 @@
+"""
+Rejestr wywołań zewnętrznych API (ledger) — koszt i latencja per wideo.
+Zapisywany hurtowo z bufora w pamięci (app.services.analytics.ledger).
+"""
+
+import uuid
+
+from sqlalchemy import BigInteger, Float, ForeignKey, Index, String
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import BaseModel
+
+
+class ApiCallRecord(BaseModel):
+    __tablename__ = "api_call_records"
+
+    provider: Mapped[str] = mapped_column(String(30), nullable=False)  # openai / elevenlabs / ...
+    operation: Mapped[str] = mapped_column(String(50), nullable=False)
+    model: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    # Ścieżka wywołania LLM: primary / retry / repair_fragment / fallback
+    path: Mapped[str] = mapped_column(String(20), default="primary")
+    outcome: Mapped[str] = mapped_column(String(20), default="ok")  # ok / error
+    latency_ms: Mapped[float] = mapped_column(Float, nullable=False)
+
+    # Jednostki rozliczeniowe (zależnie od providera)
+    prompt_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    completion_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    characters: Mapped[int] = mapped_column(BigInteger, default=0)
+    payload_bytes: Mapped[int] = mapped_column(BigInteger, default=0)
+    cost_usd: Mapped[float] = mapped_column(Float, default=0.0)  # szacunek wg cennika z ustawień
+
+    video_id: Mapped[uuid.UUID | None] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("videos.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+    )
+
+    __table_args__ = (Index("ix_api_call_records_provider_created", "provider", "created_at"),)
@@ -0,0 +1,49 @@
+"""
+Semantyczny cache odpowiedzi LLM — embeddingi promptów w pgvector.
+Ulepszenie: indeks HNSW (cosine) zamiast pełnego skanu przy wyszukiwaniu podobnych tematów.
+"""
+
+import uuid
+from datetime import datetime
+from typing import Any
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.config import get_settings
+from app.models.base import BaseModel
+
+settings = get_settings()
+
+
+class LLMCacheEntry(BaseModel):
+    __tablename__ = "llm_cache_entries"
+
+    kind: Mapped[str] = mapped_column(String(20), nullable=False, index=True)  # script / hooks
+    series_id: Mapped[uuid.UUID | None] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("series.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+    )
+    language: Mapped[str] = mapped_column(String(10), default="pl")
+    prompt_text: Mapped[str] = mapped_column(Text, nullable=False)
+    embedding = mapped_column(Vector(settings.EMBEDDING_DIMENSIONS), nullable=False)
+
+    # Zwalidowana odpowiedź modelu (gotowa do ponownego użycia)
+    output: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False)
+
+    hit_count: Mapped[int] = mapped_column(Integer, default=0)
+    last_hit_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_llm_cache_entries_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ),
+    )
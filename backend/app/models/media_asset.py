@@ -0,0 +1,48 @@
+"""
+Biblioteka mediów — zasoby stockowe pobrane wcześniej, z embeddingiem opisu.
+Ulepszenie: wyszukiwanie po podobieństwie opisu sceny (pgvector, HNSW) zamiast
+kolejnego wyszukiwania i pobierania z Pexels.
+"""
+
+from datetime import datetime
+
+from pgvector.sqlalchemy import Vector
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.config import get_settings
+from app.models.base import BaseModel
+
+settings = get_settings()
+
+
+class MediaAsset(BaseModel):
+    __tablename__ = "media_assets"
+
+    source: Mapped[str] = mapped_column(String(30), default="pexels")
+    source_url: Mapped[str] = mapped_column(Text, nullable=False, unique=True)
+    description: Mapped[str] = mapped_column(Text, nullable=False)
+    embedding = mapped_column(Vector(settings.EMBEDDING_DIMENSIONS), nullable=False)
+
+    # Znormalizowana kopia (JPEG 1080x1920) w S3
+    storage_key: Mapped[str] = mapped_column(String(500), nullable=False)
+    public_url: Mapped[str] = mapped_column(Text, nullable=False)
+    content_type: Mapped[str] = mapped_column(String(50), default="image/jpeg")
+    width: Mapped[int] = mapped_column(Integer, default=0)
+    height: Mapped[int] = mapped_column(Integer, default=0)
+    size_bytes: Mapped[int] = mapped_column(BigInteger, default=0)
+    # 64-bitowy pHash kadru (int64) — deduplikacja po odległości Hamminga
+    phash: Mapped[int | None] = mapped_column(BigInteger, nullable=True, index=True)
+
+    use_count: Mapped[int] = mapped_column(Integer, default=0)
+    last_used_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_media_assets_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with={"m": 16, "ef_construction": 64},
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ),
+    )
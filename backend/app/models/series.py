@@ -32,6 +32,9 @@ class Series(BaseModel, SoftDeleteMixin):
     language: Mapped[str] = mapped_column(String(10), default="pl")
     tone: Mapped[str] = mapped_column(String(50), default="edukacyjny")
     target_duration_seconds: Mapped[int] = mapped_column(default=60)
+    # Tryb generacji: "separate" (hook + skrypt osobno), "combined" (1 wywołanie LLM),
+    # "streaming" (skrypt strumieniowo, sceny od razu do TTS/mediów)
+    generation_mode: Mapped[str] = mapped_column(String(20), default="separate")
 
     # Harmonogram (ulepszenie: pełna konfiguracja cron-like)
     schedule_config: Mapped[dict[str, Any]] = mapped_column(
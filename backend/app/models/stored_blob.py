@@ -0,0 +1,43 @@
+"""
+Magazyn treści adresowanej hashem (content-addressed storage).
+Obiekt w S3 leży pod kluczem z SHA-256 treści — identyczna narracja czy
+ponownie wyrenderowane identyczne wideo nie są zapisywane drugi raz.
+BlobReference wiąże wideo z blobami; blob bez referencji usuwa GC.
+"""
+
+import uuid
+
+from sqlalchemy import BigInteger, ForeignKey, String, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base import BaseModel
+
+
+class StoredBlob(BaseModel):
+    __tablename__ = "stored_blobs"
+
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+    storage_key: Mapped[str] = mapped_column(String(500), nullable=False)
+    content_type: Mapped[str] = mapped_column(String(100), default="application/octet-stream")
+    size_bytes: Mapped[int] = mapped_column(BigInteger, default=0)
+
+
+class BlobReference(BaseModel):
+    __tablename__ = "blob_references"
+
+    blob_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("stored_blobs.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    video_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("videos.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    role: Mapped[str] = mapped_column(String(30), nullable=False)  # voice / video / ...
+
+    __table_args__ = (UniqueConstraint("video_id", "role", name="uq_blob_references_video_role"),)
@@ -2,10 +2,14 @@
 
 import uuid
 from datetime import datetime
-from typing import Any
+from typing import Any, Literal
 
 from pydantic import BaseModel, Field
 
+# separate — hook i skrypt w osobnych wywołaniach LLM; combined — jedno wywołanie;
+# streaming — skrypt strumieniowo, sceny od razu do TTS i mediów
+GenerationMode = Literal["separate", "combined", "streaming"]
+
 
 class ScheduleConfig(BaseModel):
     frequency: str = "3_per_week"
@@ -22,6 +26,7 @@ class VisualStyle(BaseModel):
     transition: str = "fade"
     background_music: bool = True
     branding_text: str = ""
+    use_video_clips: bool = False  # klipy Pexels zamiast zdjęć (cache mezzanine)
 
 
 class PublishChannels(BaseModel):
@@ -38,6 +43,7 @@ class SeriesCreateRequest(BaseModel):
     language: str = "pl"
     tone: str = "edukacyjny"
     target_duration_seconds: int = Field(default=60, ge=15, le=180)
+    generation_mode: GenerationMode = "separate"
     schedule_config: ScheduleConfig = ScheduleConfig()
     publish_channels: PublishChannels = PublishChannels()
     visual_style: VisualStyle = VisualStyle()
@@ -53,6 +59,7 @@ class SeriesUpdateRequest(BaseModel):
     language: str | None = None
     tone: str | None = None
     target_duration_seconds: int | None = None
+    generation_mode: GenerationMode | None = None
     schedule_config: ScheduleConfig | None = None
     publish_channels: PublishChannels | None = None
     visual_style: VisualStyle | None = None
@@ -71,6 +78,7 @@ class SeriesResponse(BaseModel):
     language: str
     tone: str
     target_duration_seconds: int
+    generation_mode: str
     schedule_config: dict[str, Any]
     publish_channels: dict[str, Any]
     visual_style: dict[str, Any]
@@ -0,0 +1,394 @@
+"""
+Ledger wywołań zewnętrznych API — koszt i latencja per wideo.
+
+Każde wywołanie (OpenAI, ElevenLabs, Google TTS, Pexels, S3) jest mierzone
+przez track_call i trafia do bufora w pamięci; flush_ledger zapisuje bufor
+jednym INSERT-em (koniec zadania Celery, zamknięcie API). video_id pochodzi
+z contextvar ustawianego przez pipeline (ledger_video).
+
+Koszt to szacunek wg cennika z ustawień (COST_*), liczony w chwili wywołania.
+Wywołania LLM mają też ścieżkę (primary / retry / repair_fragment / fallback),
+więc widać, ile kosztują ścieżki naprawcze względem głównej (usage_by_path).
+"""
+
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+
+import structlog
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.exc import DataError, IntegrityError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+_current_video: ContextVar[uuid.UUID | None] = ContextVar("ledger_video_id", default=None)
+
+_buffer: list[dict] = []
+_lock = threading.Lock()
+
+
+@dataclass
+class CallRecord:
+    provider: str
+    operation: str
+    model: str | None = None
+    path: str = "primary"
+    outcome: str = "ok"
+    latency_ms: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    characters: int = 0
+    payload_bytes: int = 0
+    video_id: uuid.UUID | None = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    def set_usage(self, usage) -> None:
+        """Przepisuje `response.usage` z odpowiedzi OpenAI (może być None)."""
+        self.prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        self.completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+
+    @property
+    def cost_usd(self) -> float:
+        return _estimate_cost(self)
+
+
+def _estimate_cost(record: CallRecord) -> float:
+    if record.provider == "openai":
+        model = record.model or ""
+        if "embedding" in model:
+            return record.prompt_tokens / 1000 * settings.COST_OPENAI_EMBEDDING_PER_1K
+        if model.startswith("gpt-3.5"):
+            prompt_price = settings.COST_OPENAI_FALLBACK_PROMPT_PER_1K
+            completion_price = settings.COST_OPENAI_FALLBACK_COMPLETION_PER_1K
+        else:
+            prompt_price = settings.COST_OPENAI_PROMPT_PER_1K
+            completion_price = settings.COST_OPENAI_COMPLETION_PER_1K
+        return (
+            record.prompt_tokens / 1000 * prompt_price
+            + record.completion_tokens / 1000 * completion_price
+        )
+    if record.provider == "elevenlabs":
+        return record.characters / 1000 * settings.COST_ELEVENLABS_PER_1K_CHARS
+    if record.provider == "google_tts":
+        return record.characters / 1000 * settings.COST_GOOGLE_TTS_PER_1K_CHARS
+    return 0.0
+
+
+@contextmanager
+def ledger_video(video_id: str | uuid.UUID) -> Iterator[None]:
+    """Przypisuje wywołania w bieżącym kontekście (i tworzonych w nim taskach) do wideo."""
+    token = _current_video.set(uuid.UUID(str(video_id)))
+    try:
+        yield
+    finally:
+        _current_video.reset(token)
+
+
+@contextmanager
+def track_call(
+    provider: str,
+    operation: str,
+    *,
+    model: str | None = None,
+    path: str = "primary",
+    characters: int = 0,
+    payload_bytes: int = 0,
+) -> Iterator[CallRecord]:
+    """
+    Mierzy wywołanie i dopisuje je do bufora. Jednostki (tokeny, bajty odpowiedzi)
+    można uzupełnić na zwróconym rekordzie wewnątrz bloku.
+    """
+    record = CallRecord(
+        provider=provider,
+        operation=operation,
+        model=model,
+        path=path,
+        characters=characters,
+        payload_bytes=payload_bytes,
+        video_id=_current_video.get(),
+    )
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException:
+        record.outcome = "error"
+        raise
+    finally:
+        record.latency_ms = round((time.perf_counter() - start) * 1000, 2)
+        if settings.LEDGER_ENABLED:
+            _append(record)
+
+
+def _append(record: CallRecord) -> None:
+    row = {**asdict(record), "cost_usd": record.cost_usd}
+    with _lock:
+        if len(_buffer) >= settings.LEDGER_MAX_BUFFER:
+            # Brak flusha (np. baza niedostępna) — nie rośniemy bez końca
+            del _buffer[0]
+        _buffer.append(row)
+
+
+def pending_records() -> int:
+    return len(_buffer)
+
+
+async def flush_ledger(db: AsyncSession) -> int:
+    """
+    Zapisuje zbuforowane rekordy jednym INSERT-em. Zwraca liczbę zapisanych.
+
+    Gdy partię odrzuca sam rekord (IntegrityError / DataError — np. video_id
+    wideo usuniętego przed flushem), zapis idzie pojedynczo i tylko błędne
+    rekordy są odrzucane. Do bufora wracają rekordy wyłącznie przy awarii
+    połączenia — inaczej jeden zły wiersz blokowałby każdy kolejny flush.
+    """
+    with _lock:
+        rows = _buffer[:]
+        _buffer.clear()
+    if not rows:
+        return 0
+
+    try:
+        for start in range(0, len(rows), settings.LEDGER_FLUSH_BATCH_SIZE):
+            await _insert(db, rows[start : start + settings.LEDGER_FLUSH_BATCH_SIZE])
+        await db.commit()
+    except (IntegrityError, DataError) as e:
+        await db.rollback()
+        logger.warning("Ledger: partia odrzucona, zapis pojedynczo", error=str(e))
+        return await _flush_rows(db, rows)
+    except Exception as e:
+        await db.rollback()
+        _requeue(rows, e)
+        return 0
+
+    logger.info("Ledger zapisany", records=len(rows))
+    return len(rows)
+
+
+async def _insert(db: AsyncSession, rows: list[dict]) -> None:
+    from app.models.api_call import ApiCallRecord
+
+    await db.execute(insert(ApiCallRecord), rows)
+
+
+async def _flush_rows(db: AsyncSession, rows: list[dict]) -> int:
+    """Zapis po jednym rekordzie (savepoint na rekord); błędne rekordy są odrzucane."""
+    written = dropped = 0
+    try:
+        for row in rows:
+            try:
+                async with db.begin_nested():
+                    await _insert(db, [row])
+            except IntegrityError:
+                if row["video_id"] is None:
+                    dropped += _drop(row)
+                    continue
+                # Wideo usunięte przed flushem — koszt zostaje, bez przypisania
+                try:
+                    async with db.begin_nested():
+                        await _insert(db, [{**row, "video_id": None}])
+                except (IntegrityError, DataError):
+                    dropped += _drop(row)
+                    continue
+            except DataError:
+                dropped += _drop(row)
+                continue
+            written += 1
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        _requeue(rows, e)
+        return 0
+
+    logger.info("Ledger zapisany", records=written, dropped=dropped)
+    return written
+
+
+def _drop(row: dict) -> int:
+    logger.error(
+        "Ledger: rekord odrzucony przez bazę",
+        provider=row["provider"],
+        operation=row["operation"],
+        video_id=str(row["video_id"]) if row["video_id"] else None,
+    )
+    return 1
+
+
+def _requeue(rows: list[dict], error: Exception) -> None:
+    """Awaria połączenia — rekordy wracają na początek bufora; inne błędy je odrzucają."""
+    if not isinstance(error, OperationalError | InterfaceError | OSError):
+        logger.error(
+            "Ledger: zapis nieudany, rekordy odrzucone", records=len(rows), error=str(error)
+        )
+        return
+    with _lock:
+        _buffer[:0] = rows[-settings.LEDGER_MAX_BUFFER :]
+        del _buffer[settings.LEDGER_MAX_BUFFER :]
+    logger.warning("Ledger: zapis nieudany, rekordy wracają do bufora", error=str(error))
+
+
+async def cost_per_video(
+    db: AsyncSession, user_id: uuid.UUID, limit: int = 50
+) -> list[dict]:
+    """Koszt i zużycie per wideo użytkownika (najdroższe najpierw)."""
+    from app.models.api_call import ApiCallRecord
+    from app.models.series import Series
+    from app.models.video import Video
+
+    cost = func.sum(ApiCallRecord.cost_usd)
+    is_upload = ApiCallRecord.provider == "s3"
+    result = await db.execute(
+        select(
+            Video.id,
+            Video.title,
+            func.count(ApiCallRecord.id),
+            cost,
+            func.sum(ApiCallRecord.prompt_tokens + ApiCallRecord.completion_tokens),
+            func.sum(ApiCallRecord.characters),
+            func.sum(ApiCallRecord.latency_ms),
+            func.sum(case((is_upload, ApiCallRecord.payload_bytes), else_=0)),
+            func.sum(case((is_upload, ApiCallRecord.latency_ms), else_=0.0)),
+        )
+        .join(ApiCallRecord, ApiCallRecord.video_id == Video.id)
+        .join(Series, Video.series_id == Series.id)
+        .where(Series.user_id == user_id)
+        .group_by(Video.id, Video.title)
+        .order_by(cost.desc())
+        .limit(limit)
+    )
+    return [
+        {
+            "video_id": video_id,
+            "title": title,
+            "calls": calls,
+            "cost_usd": round(total_cost or 0.0, 4),
+            "tokens": tokens or 0,
+            "characters": characters or 0,
+            "api_time_s": round((latency or 0.0) / 1000, 2),
+            "upload_mb": round((upload_bytes or 0) / 1_048_576, 2),
+            "upload_mb_per_s": (
+                round(upload_bytes / 1_048_576 / (upload_ms / 1000), 2) if upload_ms else 0.0
+            ),
+        }
+        for (
+            video_id,
+            title,
+            calls,
+            total_cost,
+            tokens,
+            characters,
+            latency,
+            upload_bytes,
+            upload_ms,
+        ) in result.all()
+    ]
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    """Percentyl z interpolacją liniową (wartości posortowane rosnąco)."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+def _latency_stats(calls: int, errors: int, p50: float | None, p95: float | None) -> dict:
+    return {
+        "calls": calls,
+        "error_rate": round(errors / calls, 4) if calls else 0.0,
+        "p50_ms": round(p50 or 0.0, 1),
+        "p95_ms": round(p95 or 0.0, 1),
+    }
+
+
+def _latency_query(since: datetime):
+    """p50/p95 liczone w bazie (percentile_cont ... WITHIN GROUP), per provider."""
+    from app.models.api_call import ApiCallRecord
+
+    return (
+        select(
+            ApiCallRecord.provider,
+            func.count(),
+            func.sum(case((ApiCallRecord.outcome != "ok", 1), else_=0)),
+            func.percentile_cont(0.50).within_group(ApiCallRecord.latency_ms),
+            func.percentile_cont(0.95).within_group(ApiCallRecord.latency_ms),
+        )
+        .where(ApiCallRecord.created_at >= since)
+        .group_by(ApiCallRecord.provider)
+    )
+
+
+async def latency_by_provider(db: AsyncSession, hours: int = 24) -> dict[str, dict]:
+    """p50/p95 latencji i odsetek błędów per provider z ostatnich `hours` godzin."""
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    if db.get_bind().dialect.name != "postgresql":
+        return await _latency_by_provider_sampled(db, since)
+
+    result = await db.execute(_latency_query(since))
+    return {
+        provider: _latency_stats(calls, errors or 0, p50, p95)
+        for provider, calls, errors, p50, p95 in result.all()
+    }
+
+
+async def _latency_by_provider_sampled(db: AsyncSession, since: datetime) -> dict[str, dict]:
+    """Fallback dla SQLite (brak percentile_cont): ostatnie LEDGER_STATS_MAX_ROWS wierszy."""
+    from app.models.api_call import ApiCallRecord
+
+    result = await db.execute(
+        select(ApiCallRecord.provider, ApiCallRecord.latency_ms, ApiCallRecord.outcome)
+        .where(ApiCallRecord.created_at >= since)
+        .order_by(ApiCallRecord.created_at.desc())
+        .limit(settings.LEDGER_STATS_MAX_ROWS)
+    )
+
+    latencies: dict[str, list[float]] = {}
+    errors: dict[str, int] = {}
+    for provider, latency_ms, outcome in result.all():
+        latencies.setdefault(provider, []).append(latency_ms)
+        errors[provider] = errors.get(provider, 0) + (outcome != "ok")
+
+    stats = {}
+    for provider, values in latencies.items():
+        values.sort()
+        stats[provider] = _latency_stats(
+            len(values), errors[provider], _percentile(values, 0.50), _percentile(values, 0.95)
+        )
+    return stats
+
+
+async def usage_by_path(db: AsyncSession, hours: int = 24) -> dict[str, dict[str, dict]]:
+    """Tokeny i koszt LLM per operacja i ścieżka: {operation: {path: {calls, tokens, cost_usd}}}."""
+    from app.models.api_call import ApiCallRecord
+
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    result = await db.execute(
+        select(
+            ApiCallRecord.operation,
+            ApiCallRecord.path,
+            func.count(),
+            func.sum(ApiCallRecord.prompt_tokens + ApiCallRecord.completion_tokens),
+            func.sum(ApiCallRecord.cost_usd),
+        )
+        .where(ApiCallRecord.provider == "openai", ApiCallRecord.created_at >= since)
+        .group_by(ApiCallRecord.operation, ApiCallRecord.path)
+    )
+
+    totals: dict[str, dict[str, dict]] = {}
+    for operation, path, calls, tokens, cost in result.all():
+        totals.setdefault(operation, {})[path] = {
+            "calls": calls,
+            "tokens": tokens or 0,
+            "cost_usd": round(cost or 0.0, 4),
+        }
+    return totals
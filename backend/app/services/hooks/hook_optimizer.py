@@ -3,17 +3,24 @@ Hook Optimizer — generowanie chwytliwych hooków (pierwszych 3 sekund).
 Ulepszenie: osobny agent z analizą trendów + ranking wariantów.
 """
 
-import json
 import structlog
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry
 
 from openai import AsyncOpenAI
 
 from app.core.config import get_settings
+from app.core.http_replay import openai_http_client
+from app.core.rate_limiter import provider_slot
+from app.core.retry_budget import budgeted_retry_kwargs
+from app.services.analytics.ledger import track_call
+from app.services.llm.json_repair import repair_json
+from app.services.llm.semantic_cache import few_shot_message
 
 settings = get_settings()
 logger = structlog.get_logger()
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY, max_retries=0, http_client=openai_http_client()
+)
 
 HOOK_SYSTEM_PROMPT = """Jesteś ekspertem od tworzenia hooków do krótkich filmów wideo.
 Hook to pierwsze 1-3 sekundy filmu, które MUSZĄ zatrzymać widzów przewijających feed.
@@ -39,11 +46,12 @@ Odpowiadaj TYLKO w formacie JSON:
 }"""
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=5))
+@retry(**budgeted_retry_kwargs("openai", min_wait=1, max_wait=5))
 async def generate_hooks(
     topic: str,
     language: str = "pl",
     count: int = 3,
+    few_shot_examples: list[dict] | None = None,
 ) -> dict:
     """
     Generuje kilka wariantów hooków dla danego tematu.
@@ -58,25 +66,36 @@ async def generate_hooks(
         f"Odpowiedz w formacie JSON."
     )
 
-    response = await client.chat.completions.create(
-        model=settings.OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": HOOK_SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ],
-        max_tokens=1000,
-        temperature=0.9,
-        response_format={"type": "json_object"},
+    async with provider_slot("openai", settings.OPENAI_API_KEY):
+        with track_call("openai", "generate_hooks", model=settings.OPENAI_MODEL) as call:
+            response = await client.chat.completions.create(
+                model=settings.OPENAI_MODEL,
+                messages=[
+                    {"role": "system", "content": HOOK_SYSTEM_PROMPT},
+                    *few_shot_message(few_shot_examples),
+                    {"role": "user", "content": user_prompt},
+                ],
+                max_tokens=1000,
+                temperature=0.9,
+                response_format={"type": "json_object"},
+            )
+            call.set_usage(response.usage)
+
+    data = repair_json(response.choices[0].message.content)
+
+    result = summarize_hooks(data)
+    logger.info(
+        "Hooki wygenerowane",
+        count=len(result["hooks"]),
+        recommended=result["recommended_index"],
     )
+    return result
 
-    content = response.choices[0].message.content
-    data = json.loads(content)
 
+def summarize_hooks(data: dict) -> dict:
+    """Normalizuje odpowiedź z hookami: {hooks, recommended_index, best_hook}."""
     hooks = data.get("hooks", [])
     recommended = data.get("recommended_index", 0)
-
-    logger.info("Hooki wygenerowane", count=len(hooks), recommended=recommended)
-
     return {
         "hooks": hooks,
         "recommended_index": min(recommended, len(hooks) - 1) if hooks else 0,
@@ -0,0 +1,41 @@
+"""
+Embeddingi tekstu (OpenAI) — wspólne dla semantycznego cache i wyszukiwania podobieństw.
+"""
+
+import structlog
+from openai import AsyncOpenAI
+
+from app.core.config import get_settings
+from app.core.http_replay import openai_http_client
+from app.services.analytics.ledger import track_call
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=openai_http_client())
+
+
+async def embed_text(text: str) -> list[float]:
+    """Zwraca wektor embeddingu tekstu (wymiar = EMBEDDING_DIMENSIONS)."""
+    with track_call("openai", "embedding", model=settings.OPENAI_EMBEDDING_MODEL) as call:
+        response = await client.embeddings.create(
+            model=settings.OPENAI_EMBEDDING_MODEL,
+            input=text[:8000],
+            dimensions=settings.EMBEDDING_DIMENSIONS,
+        )
+        call.set_usage(response.usage)
+    return response.data[0].embedding
+
+
+async def embed_texts(texts: list[str]) -> list[list[float]]:
+    """Embeddingi wielu tekstów w jednym wywołaniu (kolejność zachowana)."""
+    if not texts:
+        return []
+    with track_call("openai", "embedding", model=settings.OPENAI_EMBEDDING_MODEL) as call:
+        response = await client.embeddings.create(
+            model=settings.OPENAI_EMBEDDING_MODEL,
+            input=[t[:8000] for t in texts],
+            dimensions=settings.EMBEDDING_DIMENSIONS,
+        )
+        call.set_usage(response.usage)
+    return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
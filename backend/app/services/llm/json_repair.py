@@ -0,0 +1,155 @@
+"""
+Lokalna naprawa uszkodzonego JSON-a z odpowiedzi LLM.
+
+Typowe defekty:
+- blok ```json ... ``` lub tekst wokół obiektu,
+- przecinki przed `}` / `]`,
+- ucięcie przez max_tokens (niedomknięte stringi, tablice i obiekty).
+
+Ucięty element tablicy/obiektu jest odrzucany w całości (cięcie na ostatnim
+przecinku danego poziomu), żeby nie przepuszczać scen z urwanym tekstem.
+"""
+
+import json
+from collections.abc import Iterator
+
+
+class JSONRepairError(ValueError):
+    """Nie udało się odzyskać obiektu JSON z odpowiedzi."""
+
+
+def repair_json(text: str) -> dict:
+    """Parsuje odpowiedź LLM jako obiekt JSON, naprawiając typowe defekty."""
+    body = _extract_object(text)
+    candidates = [body]
+    end = _object_end(body)
+    if end is not None and end < len(body) - 1:
+        candidates.append(body[: end + 1])  # tekst doklejony za obiektem
+
+    for candidate in candidates:
+        for attempt in (candidate, _strip_trailing_commas(candidate)):
+            value = _loads_object(attempt)
+            if value is not None:
+                return value
+
+    for attempt in _truncation_candidates(_strip_trailing_commas(body)):
+        value = _loads_object(_strip_trailing_commas(attempt))
+        if value is not None:
+            return value
+
+    raise JSONRepairError("Nie można naprawić JSON-a odpowiedzi")
+
+
+def _loads_object(text: str) -> dict | None:
+    try:
+        value = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def _extract_object(text: str) -> str:
+    """Wycina obiekt od pierwszego `{` i zdejmuje zamykający fence markdown."""
+    start = text.find("{")
+    if start == -1:
+        raise JSONRepairError("Brak obiektu JSON w odpowiedzi")
+    body = text[start:].rstrip()
+    if body.endswith("```"):
+        body = body[:-3].rstrip()
+    return body
+
+
+def _object_end(text: str) -> int | None:
+    """Pozycja `}` domykającego obiekt zaczynający się na text[0] (None, gdy ucięty)."""
+    depth = 0
+    in_string = escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return i
+    return None
+
+
+def _strip_trailing_commas(text: str) -> str:
+    """Usuwa przecinki przed `}`/`]` (poza literałami stringów)."""
+    out: list[str] = []
+    in_string = escape = False
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "}]":
+            # Cofnij się przez białe znaki do ewentualnego przecinka
+            j = len(out) - 1
+            while j >= 0 and out[j].isspace():
+                j -= 1
+            if j >= 0 and out[j] == ",":
+                del out[j]
+        out.append(ch)
+    return "".join(out)
+
+
+def _truncation_candidates(text: str) -> Iterator[str]:
+    """
+    Warianty domknięcia uciętego JSON-a — od zachowującego najwięcej danych.
+    Dla każdego otwartego kontenera (od najgłębszego) tnie na ostatnim
+    kompletnym elemencie i domyka pozostałe nawiasy.
+    """
+    stack: list[list] = []  # [znak otwierający, pozycja bezpiecznego cięcia]
+    in_string = escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append([ch, i + 1])
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+        elif ch == "," and stack:
+            stack[-1][1] = i
+
+    if not stack and not in_string:
+        return
+
+    if not in_string:
+        # 1. Domknij wszystko bez cięcia (np. brakuje tylko końcowych nawiasów)
+        yield text + "".join("}" if opener == "{" else "]" for opener, _ in reversed(stack))
+
+    # 2. Tnij na ostatnim kompletnym elemencie, od najgłębszego kontenera
+    for depth in range(len(stack) - 1, -1, -1):
+        opener, cut = stack[depth]
+        if depth and opener == "{" and text[cut - 1] == "{":
+            continue  # pusty obiekt zagnieżdżony — lepiej odrzucić go w rodzicu
+        remaining = "".join(
+            "}" if opener == "{" else "]" for opener, _ in reversed(stack[: depth + 1])
+        )
+        yield text[:cut] + remaining
@@ -2,20 +2,38 @@
 Serwis generowania skryptów wideo (LLM).
 Ulepszenie: structured output (JSON) + retry z exponential backoff +
 moderacja treści + fallback na tańszy model.
+Niepoprawny JSON jest najpierw naprawiany lokalnie i walidowany schematem;
+model dopytujemy tylko o brakujący fragment (sceny), a tańszy model
+to ostatnia deska ratunku. Tokeny i koszt każdej ścieżki zapisuje ledger (path).
 """
 
 import json
-import structlog
-from tenacity import retry, stop_after_attempt, wait_exponential
+from collections.abc import Callable
 
-from openai import AsyncOpenAI
+import structlog
+from openai import APIError, AsyncOpenAI
+from tenacity import AsyncRetrying, retry_if_exception_type
 
 from app.core.config import get_settings
+from app.core.http_replay import openai_http_client
+from app.core.rate_limiter import provider_slot
+from app.core.retry_budget import budgeted_retry_kwargs, consume_retry, record_call
+from app.services.analytics.ledger import track_call
+from app.services.llm.json_repair import JSONRepairError, repair_json
+from app.services.llm.script_schema import (
+    SceneSchema,
+    validate_script_data,
+)
+from app.services.llm.semantic_cache import few_shot_message
+from app.services.llm.stream_parser import SceneStreamParser
 
 settings = get_settings()
 logger = structlog.get_logger()
 
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+# Ponowienia wyłącznie przez tenacity (budżet zadania), bez wbudowanych w SDK
+client = AsyncOpenAI(
+    api_key=settings.OPENAI_API_KEY, max_retries=0, http_client=openai_http_client()
+)
 
 SYSTEM_PROMPT = """Jesteś profesjonalnym scenarzystą krótkich filmów wideo (shorts/reels/TikTok).
 Tworzysz angażujące, dynamiczne scenariusze, które przyciągają uwagę widza od pierwszej sekundy.
@@ -36,11 +54,42 @@ Zawsze odpowiadaj w formacie JSON z następującą strukturą:
   "tags": ["tag1", "tag2", "tag3"]
 }"""
 
+COMBINED_SYSTEM_PROMPT = """Jesteś profesjonalnym scenarzystą krótkich filmów wideo
+(shorts/reels/TikTok) i ekspertem od hooków — pierwszych 1-3 sekund,
+które MUSZĄ zatrzymać przewijanie feedu (szokujący fakt, kontrowersyjne pytanie,
+pattern interrupt, „99% ludzi nie wie, że...", bezpośredni apel, niedopowiedzenie).
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10),
+Zawsze odpowiadaj w formacie JSON z następującą strukturą:
+{
+  "hooks": [
+    {
+      "text": "Treść hooka",
+      "technique": "nazwa użytej techniki",
+      "estimated_retention_score": 1-10
+    }
+  ],
+  "recommended_index": 0,
+  "title": "Tytuł filmu (max 100 znaków, chwytliwy)",
+  "scenes": [
+    {
+      "text": "Tekst narracji dla tej sceny (bez hooka — hook jest osobno)",
+      "visual_description": "Opis wizualny — co powinno być na ekranie",
+      "duration_hint": "czas w sekundach (orientacyjny)"
+    }
+  ],
+  "call_to_action": "Wezwanie do działania na końcu filmu",
+  "description": "Opis filmu do publikacji (max 300 znaków)",
+  "tags": ["tag1", "tag2", "tag3"]
+}"""
+
+
+FRAGMENT_PROMPT = (
+    "Poprzednia odpowiedź była niekompletna — brakuje scen. "
+    'Zwróć TYLKO obiekt JSON {"scenes": [...]} ze scenami w tym samym formacie '
+    "(text, visual_description, duration_hint), spójnymi z tytułem i hookiem powyżej."
 )
+
+
 async def generate_script(
     topic: str,
     language: str = "pl",
@@ -48,99 +97,291 @@ async def generate_script(
     duration_seconds: int = 60,
     custom_prompt: str | None = None,
     prompt_template: str | None = None,
+    few_shot_examples: list[dict] | None = None,
 ) -> dict:
     """
     Generuje pełny scenariusz wideo na podstawie tematu.
     Zwraca strukturę: {title, hook, scenes, call_to_action, description, tags}.
+    few_shot_examples — podobne wcześniejsze scenariusze (semantyczny cache).
     """
+    user_prompt = _build_user_prompt(
+        topic, language, tone, duration_seconds, custom_prompt, prompt_template
+    )
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *few_shot_message(few_shot_examples),
+        {"role": "user", "content": user_prompt},
+    ]
+
+    logger.info("Generowanie skryptu LLM", topic=topic, model=settings.OPENAI_MODEL)
+
+    response = await _chat_completion("generate_script", messages)
+    _, script_data = await _parse_and_repair(
+        "generate_script", response.choices[0].message.content, messages
+    )
+
+    logger.info(
+        "Skrypt wygenerowany",
+        title=script_data.get("title", ""),
+        scenes_count=len(script_data["scenes"]),
+    )
+    return script_data
+
+
+def _build_user_prompt(
+    topic: str,
+    language: str,
+    tone: str,
+    duration_seconds: int,
+    custom_prompt: str | None,
+    prompt_template: str | None,
+) -> str:
     if custom_prompt:
-        user_prompt = custom_prompt
-    elif prompt_template:
-        user_prompt = prompt_template.format(
+        return custom_prompt
+    if prompt_template:
+        return prompt_template.format(
             topic=topic,
             language=language,
             tone=tone,
             duration=duration_seconds,
         )
-    else:
-        user_prompt = (
-            f"Napisz {duration_seconds}-sekundowy scenariusz filmiku o: {topic}.\n"
-            f"Język: {language}. Ton: {tone}.\n"
-            f"Zaczynaj intrygującym hookiem (3 sekundy).\n"
-            f"Uwzględnij 2-4 kluczowe sceny z opisami wizualnymi.\n"
-            f"Zakończ wezwaniem do subskrypcji/obserwowania.\n"
-            f"Odpowiedz w formacie JSON."
-        )
+    return (
+        f"Napisz {duration_seconds}-sekundowy scenariusz filmiku o: {topic}.\n"
+        f"Język: {language}. Ton: {tone}.\n"
+        f"Zaczynaj intrygującym hookiem (3 sekundy).\n"
+        f"Uwzględnij 2-4 kluczowe sceny z opisami wizualnymi.\n"
+        f"Zakończ wezwaniem do subskrypcji/obserwowania.\n"
+        f"Odpowiedz w formacie JSON."
+    )
 
-    logger.info("Generowanie skryptu LLM", topic=topic, model=settings.OPENAI_MODEL)
 
+async def generate_hook_and_script(
+    topic: str,
+    language: str = "pl",
+    tone: str = "edukacyjny",
+    duration_seconds: int = 60,
+    custom_prompt: str | None = None,
+    prompt_template: str | None = None,
+    hook_count: int = 3,
+    few_shot_examples: list[dict] | None = None,
+) -> dict:
+    """
+    Tryb połączony — warianty hooka i pełny scenariusz w jednym wywołaniu LLM.
+    Zwraca strukturę scenariusza uzupełnioną o {hooks, recommended_index, best_hook};
+    pole "hook" scenariusza = najlepszy wariant.
+    """
+    from app.services.hooks.hook_optimizer import summarize_hooks
+
+    user_prompt = _build_user_prompt(
+        topic, language, tone, duration_seconds, custom_prompt, prompt_template
+    )
+    user_prompt += (
+        f"\nDodatkowo zaproponuj {hook_count} warianty hooka (każdy max 15 słów) "
+        f"i wskaż najlepszy."
+    )
+    messages = [
+        {"role": "system", "content": COMBINED_SYSTEM_PROMPT},
+        *few_shot_message(few_shot_examples),
+        {"role": "user", "content": user_prompt},
+    ]
+
+    logger.info(
+        "Generowanie hooka i skryptu (1 wywołanie)", topic=topic, model=settings.OPENAI_MODEL
+    )
+
+    response = await _chat_completion("generate_hook_and_script", messages)
+    raw, script_data = await _parse_and_repair(
+        "generate_hook_and_script", response.choices[0].message.content, messages
+    )
+    hooks = summarize_hooks(raw)
+    script_data.update(hooks)
+    script_data["hook"] = hooks["best_hook"]
+
+    logger.info(
+        "Hook i skrypt wygenerowane",
+        title=script_data.get("title", ""),
+        hooks_count=len(hooks["hooks"]),
+        scenes_count=len(script_data["scenes"]),
+    )
+    return script_data
+
+
+async def stream_script(
+    topic: str,
+    on_scene: Callable[[dict], None],
+    language: str = "pl",
+    tone: str = "edukacyjny",
+    duration_seconds: int = 60,
+    custom_prompt: str | None = None,
+    prompt_template: str | None = None,
+    few_shot_examples: list[dict] | None = None,
+) -> dict:
+    """
+    Tryb strumieniowy — scenariusz generowany token po tokenie.
+    Każda kompletna scena trafia do `on_scene` od razu po domknięciu w strumieniu,
+    więc TTS i wyszukiwanie mediów startują równolegle z generacją reszty.
+    Zwraca pełny, zwalidowany scenariusz (jak generate_script).
+    """
+    user_prompt = _build_user_prompt(
+        topic, language, tone, duration_seconds, custom_prompt, prompt_template
+    )
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        *few_shot_message(few_shot_examples),
+        {"role": "user", "content": user_prompt},
+    ]
+    logger.info("Strumieniowe generowanie skryptu", topic=topic, model=settings.OPENAI_MODEL)
+
+    parser = SceneStreamParser()
+    record_call("openai")
     try:
-        response = await client.chat.completions.create(
-            model=settings.OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-            max_tokens=settings.OPENAI_MAX_TOKENS,
-            temperature=settings.OPENAI_TEMPERATURE,
-            response_format={"type": "json_object"},
+        async with provider_slot("openai", settings.OPENAI_API_KEY):
+            # Latencja = cały strumień (do ostatniego tokena)
+            with track_call("openai", "stream_script", model=settings.OPENAI_MODEL) as call:
+                stream = await client.chat.completions.create(
+                    model=settings.OPENAI_MODEL,
+                    messages=messages,
+                    max_tokens=settings.OPENAI_MAX_TOKENS,
+                    temperature=settings.OPENAI_TEMPERATURE,
+                    response_format={"type": "json_object"},
+                    stream=True,
+                    stream_options={"include_usage": True},
+                )
+                async for chunk in stream:
+                    if chunk.usage:
+                        call.set_usage(chunk.usage)
+                    if not chunk.choices:
+                        continue
+                    for scene in parser.feed(chunk.choices[0].delta.content or ""):
+                        on_scene(SceneSchema.model_validate(scene).model_dump())
+    except APIError as e:
+        # Sceny już wysłane dalej zostaną dopasowane po treści — fallback bez strumienia
+        logger.warning("Strumień skryptu przerwany, fallback", error=str(e))
+        if not consume_retry("openai"):
+            raise
+        return await generate_script(
+            topic=topic,
+            language=language,
+            tone=tone,
+            duration_seconds=duration_seconds,
+            custom_prompt=custom_prompt,
+            prompt_template=prompt_template,
+            few_shot_examples=few_shot_examples,
         )
 
-        content = response.choices[0].message.content
-        script_data = json.loads(content)
+    _, script_data = await _parse_and_repair("stream_script", parser.text, messages)
+    logger.info(
+        "Skrypt wygenerowany (stream)",
+        title=script_data.get("title", ""),
+        scenes_count=len(script_data["scenes"]),
+    )
+    return script_data
+
+
+async def _chat_completion(
+    operation: str,
+    messages: list[dict],
+    model: str | None = None,
+    temperature: float | None = None,
+):
+    """
+    Wywołanie chat completion z ponowieniami wyłącznie dla błędów API
+    (sieć, 429, 5xx), w ramach budżetu ponowień zadania.
+    Błędy parsowania obsługuje _parse_and_repair.
+    """
+    async for attempt in AsyncRetrying(
+        retry=retry_if_exception_type(APIError), **budgeted_retry_kwargs("openai")
+    ):
+        with attempt:
+            path = "primary" if attempt.retry_state.attempt_number == 1 else "retry"
+            response = await _create(
+                operation,
+                path,
+                model=model or settings.OPENAI_MODEL,
+                messages=messages,
+                temperature=settings.OPENAI_TEMPERATURE if temperature is None else temperature,
+            )
+    return response
+
+
+async def _create(
+    operation: str, path: str, *, model: str, messages: list[dict], temperature: float
+):
+    """Pojedyncze wywołanie chat completion: slot limitera i ledger (tokeny per ścieżka)."""
+    async with provider_slot("openai", settings.OPENAI_API_KEY):
+        with track_call("openai", operation, model=model, path=path) as call:
+            response = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=settings.OPENAI_MAX_TOKENS,
+                temperature=temperature,
+                response_format={"type": "json_object"},
+            )
+            call.set_usage(response.usage)
+    return response
 
-        logger.info(
-            "Skrypt wygenerowany",
-            title=script_data.get("title", ""),
-            scenes_count=len(script_data.get("scenes", [])),
-        )
 
-        return _validate_script(script_data)
+async def _parse_and_repair(
+    operation: str, content: str, messages: list[dict]
+) -> tuple[dict, dict]:
+    """
+    Dekoduje odpowiedź (z lokalną naprawą) i waliduje schematem.
+    Zwraca (surowy obiekt, zwalidowany scenariusz).
+    Ostatnia deska ratunku: dopytanie o brakujące sceny, potem tańszy model.
+    """
+    try:
+        raw = repair_json(content)
+    except JSONRepairError:
+        logger.warning("LLM zwrócił JSON nie do naprawy, fallback na tańszy model")
+        return await _fallback_generate(operation, messages)
+    return await _validate(operation, messages, raw)
+
+
+async def _validate(operation: str, messages: list[dict], raw: dict) -> tuple[dict, dict]:
+    """Walidacja schematem; przy braku scen dopytuje model o sam fragment."""
+    result = validate_script_data(raw)
+    if result.missing:
+        logger.info("Skrypt uzupełniony lokalnie", operation=operation, missing=result.missing)
+
+    if result.needs_scenes:
+        scenes = await _request_scenes_fragment(operation, messages, result.data)
+        result = validate_script_data({**raw, "scenes": scenes})
 
-    except json.JSONDecodeError:
-        logger.warning("LLM zwrócił nieprawidłowy JSON, próba naprawy")
-        # Fallback: retry z mniejszym modelem
-        return await _fallback_generate(user_prompt)
+    return raw, result.data
 
 
-async def _fallback_generate(user_prompt: str) -> dict:
-    """Fallback na tańszy model."""
-    response = await client.chat.completions.create(
-        model="gpt-3.5-turbo",
+async def _request_scenes_fragment(
+    operation: str, messages: list[dict], partial: dict
+) -> list[dict]:
+    """Dopytuje model wyłącznie o brakującą tablicę scen (mniej tokenów niż pełna generacja)."""
+    logger.warning("Brak scen po naprawie — dopytanie o fragment", operation=operation)
+    if not consume_retry("openai"):
+        return []
+    record_call("openai")
+    response = await _create(
+        operation,
+        "repair_fragment",
+        model=settings.OPENAI_MODEL,
         messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
+            *messages,
+            {"role": "assistant", "content": json.dumps(partial, ensure_ascii=False)},
+            {"role": "user", "content": FRAGMENT_PROMPT},
         ],
-        max_tokens=settings.OPENAI_MAX_TOKENS,
-        temperature=0.5,
-        response_format={"type": "json_object"},
+        temperature=settings.OPENAI_TEMPERATURE,
     )
-    content = response.choices[0].message.content
-    return _validate_script(json.loads(content))
-
-
-def _validate_script(data: dict) -> dict:
-    """Walidacja i uzupełnienie brakujących pól."""
-    defaults = {
-        "title": "Bez tytułu",
-        "hook": "",
-        "scenes": [],
-        "call_to_action": "Obserwuj, aby nie przegapić!",
-        "description": "",
-        "tags": [],
-    }
-    for key, default in defaults.items():
-        if key not in data:
-            data[key] = default
-
-    # Walidacja scen
-    validated_scenes = []
-    for scene in data.get("scenes", []):
-        validated_scenes.append({
-            "text": scene.get("text", ""),
-            "visual_description": scene.get("visual_description", ""),
-            "duration_hint": scene.get("duration_hint", "5"),
-        })
-    data["scenes"] = validated_scenes
-
-    return data
+    try:
+        return repair_json(response.choices[0].message.content).get("scenes", [])
+    except JSONRepairError:
+        return []
+
+
+async def _fallback_generate(operation: str, messages: list[dict]) -> tuple[dict, dict]:
+    """Fallback na tańszy model (zużywa żeton budżetu ponowień)."""
+    if not consume_retry("openai"):
+        raise JSONRepairError("Budżet ponowień wyczerpany — brak fallbacku")
+    record_call("openai")
+    response = await _create(
+        operation, "fallback", model="gpt-3.5-turbo", messages=messages, temperature=0.5
+    )
+    raw = repair_json(response.choices[0].message.content)
+    return await _validate(operation, messages, raw)
@@ -0,0 +1,72 @@
+"""
+Typowany schemat scenariusza — walidacja odpowiedzi LLM po naprawie JSON-a.
+Brakujące pola dostają wartości domyślne; brak scen to jedyny defekt,
+którego nie da się naprawić lokalnie (wtedy dopytujemy model o sam fragment).
+"""
+
+from dataclasses import dataclass, field
+from typing import Any
+
+from pydantic import BaseModel, ConfigDict, field_validator
+
+from app.services.llm.json_repair import repair_json
+
+
+class SceneSchema(BaseModel):
+    model_config = ConfigDict(extra="ignore", coerce_numbers_to_str=True)
+
+    text: str = ""
+    visual_description: str = ""
+    duration_hint: str = "5"
+
+
+class ScriptSchema(BaseModel):
+    model_config = ConfigDict(extra="ignore", coerce_numbers_to_str=True)
+
+    title: str = "Bez tytułu"
+    hook: str = ""
+    scenes: list[SceneSchema] = []
+    call_to_action: str = "Obserwuj, aby nie przegapić!"
+    description: str = ""
+    tags: list[str] = []
+
+    @field_validator("scenes", mode="before")
+    @classmethod
+    def drop_empty_scenes(cls, v: Any) -> list:
+        if not isinstance(v, list):
+            return []
+        return [s for s in v if isinstance(s, dict) and str(s.get("text", "")).strip()]
+
+    @field_validator("tags", mode="before")
+    @classmethod
+    def split_tags(cls, v: Any) -> list:
+        if isinstance(v, str):
+            return [t.strip() for t in v.split(",") if t.strip()]
+        return v if isinstance(v, list) else []
+
+
+@dataclass
+class ScriptParseResult:
+    data: dict
+    missing: list[str] = field(default_factory=list)  # pola uzupełnione domyślnymi
+
+    @property
+    def needs_scenes(self) -> bool:
+        return not self.data["scenes"]
+
+
+def validate_script_data(raw: dict) -> ScriptParseResult:
+    """Waliduje zdekodowany obiekt względem schematu scenariusza."""
+    missing = [name for name in ScriptSchema.model_fields if not raw.get(name)]
+    data = ScriptSchema.model_validate(raw).model_dump()
+    if not data["scenes"] and "scenes" not in missing:
+        missing.append("scenes")
+    return ScriptParseResult(data=data, missing=missing)
+
+
+def parse_script_response(content: str) -> ScriptParseResult:
+    """
+    Dekoduje (z lokalną naprawą) i waliduje odpowiedź LLM.
+    Rzuca JSONRepairError, gdy w odpowiedzi nie da się odzyskać obiektu JSON.
+    """
+    return validate_script_data(repair_json(content))
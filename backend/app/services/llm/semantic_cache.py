@@ -0,0 +1,183 @@
+"""
+Semantyczny cache skryptów i hooków — wyszukiwanie podobnych promptów w pgvector.
+
+Tryby (LLM_CACHE_MODE):
+- off      — cache wyłączony, każde wywołanie idzie do LLM,
+- reuse    — odpowiedź dla prawie identycznego promptu (podobieństwo ≥ próg)
+             jest zwracana bez wywołania LLM,
+- few_shot — podobne wcześniejsze odpowiedzi trafiają do promptu jako przykłady.
+
+Zakres wyszukiwania (LLM_CACHE_SCOPE): ta sama seria albo ten sam język.
+W trybie reuse wpisy bieżącej serii są zawsze pomijane — prompty kolejnych
+odcinków są niemal identyczne, więc odcinek dostałby treść poprzedniego.
+Zakres "series" ma więc sens tylko dla few_shot; reuse przeszukuje inne serie
+w tym samym języku.
+Statystyki trafień (hit/few_shot/miss per rodzaj) zliczane są w Redis.
+"""
+
+import copy
+import json
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+
+import structlog
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.models.llm_cache import LLMCacheEntry
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+_STATS_KEY = "llm_cache_stats"
+_OUTCOMES = ("hit", "few_shot", "miss")
+
+
+async def _find_similar(
+    db: AsyncSession,
+    kind: str,
+    embedding: list[float],
+    series_id: uuid.UUID | None,
+    language: str,
+    min_similarity: float,
+    limit: int,
+    exclude_series: bool = False,
+) -> list[tuple[LLMCacheEntry, float]]:
+    """
+    Najbliżsi sąsiedzi (cosine) w zakresie serii/języka, powyżej progu podobieństwa.
+    exclude_series=True pomija wpisy serii series_id (zamiast zawężać do niej).
+    """
+    distance = LLMCacheEntry.embedding.cosine_distance(embedding)
+    query = select(LLMCacheEntry, distance.label("distance")).where(
+        LLMCacheEntry.kind == kind,
+        LLMCacheEntry.language == language,
+        distance <= 1.0 - min_similarity,
+    )
+    if series_id is not None:
+        if exclude_series:
+            query = query.where(
+                or_(LLMCacheEntry.series_id.is_(None), LLMCacheEntry.series_id != series_id)
+            )
+        elif settings.LLM_CACHE_SCOPE == "series":
+            query = query.where(LLMCacheEntry.series_id == series_id)
+
+    result = await db.execute(query.order_by(distance).limit(limit))
+    return [(entry, 1.0 - dist) for entry, dist in result.all()]
+
+
+async def _record_event(kind: str, outcome: str) -> None:
+    try:
+        import redis.asyncio as aioredis
+
+        r = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+        try:
+            await r.hincrby(_STATS_KEY, f"{kind}:{outcome}", 1)
+        finally:
+            await r.aclose()
+    except Exception as e:
+        logger.debug("LLM cache: zapis statystyk nieudany", error=str(e))
+
+
+async def get_cache_stats() -> dict[str, dict[str, float]]:
+    """Statystyki cache per rodzaj: {kind: {hit, few_shot, miss, hit_rate}}."""
+    import redis.asyncio as aioredis
+
+    r = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        raw = await r.hgetall(_STATS_KEY)
+    finally:
+        await r.aclose()
+
+    stats: dict[str, dict[str, float]] = {}
+    for field, value in raw.items():
+        kind, _, outcome = field.partition(":")
+        stats.setdefault(kind, dict.fromkeys(_OUTCOMES, 0))[outcome] = int(value)
+    for counters in stats.values():
+        total = sum(counters[o] for o in _OUTCOMES)
+        counters["hit_rate"] = round(counters["hit"] / total, 4) if total else 0.0
+    return stats
+
+
+async def cached_generate(
+    db: AsyncSession,
+    *,
+    kind: str,
+    prompt_text: str,
+    series_id: uuid.UUID | None,
+    language: str,
+    generate: Callable[[list[dict] | None], Awaitable[dict]],
+) -> dict:
+    """
+    Generuje odpowiedź przez `generate(few_shot_examples)` z użyciem semantycznego cache.
+    Awaria embeddingów/bazy nie blokuje generacji — wtedy cache jest pomijany.
+    """
+    mode = settings.LLM_CACHE_MODE
+    if mode == "off":
+        return await generate(None)
+
+    from app.services.llm.embeddings import embed_text
+
+    try:
+        embedding = await embed_text(prompt_text)
+    except Exception as e:
+        logger.warning("LLM cache: embedding nieudany, pomijam cache", kind=kind, error=str(e))
+        return await generate(None)
+
+    examples: list[dict] | None = None
+    if mode == "reuse":
+        matches = await _find_similar(
+            db, kind, embedding, series_id, language,
+            min_similarity=settings.LLM_CACHE_SIMILARITY_THRESHOLD,
+            limit=1,
+            exclude_series=True,
+        )
+        if matches:
+            entry, similarity = matches[0]
+            entry.hit_count += 1
+            entry.last_hit_at = datetime.now(timezone.utc)
+            db.add(entry)
+            await db.flush()
+            await _record_event(kind, "hit")
+            logger.info("LLM cache: trafienie", kind=kind, similarity=round(similarity, 4))
+            return copy.deepcopy(entry.output)
+    else:
+        matches = await _find_similar(
+            db, kind, embedding, series_id, language,
+            min_similarity=settings.LLM_CACHE_FEW_SHOT_THRESHOLD,
+            limit=settings.LLM_CACHE_FEW_SHOT_EXAMPLES,
+        )
+        examples = [entry.output for entry, _ in matches] or None
+
+    await _record_event(kind, "few_shot" if examples else "miss")
+    output = await generate(examples)
+
+    db.add(
+        LLMCacheEntry(
+            kind=kind,
+            series_id=series_id,
+            language=language,
+            prompt_text=prompt_text,
+            embedding=embedding,
+            output=copy.deepcopy(output),
+        )
+    )
+    await db.flush()
+    return output
+
+
+def few_shot_message(examples: list[dict] | None) -> list[dict]:
+    """Wiadomość z przykładami (few-shot) do wstawienia przed promptem użytkownika."""
+    if not examples:
+        return []
+    rendered = "\n\n".join(json.dumps(e, ensure_ascii=False) for e in examples)
+    return [
+        {
+            "role": "user",
+            "content": (
+                "Przykłady wcześniejszych odpowiedzi na podobne tematy "
+                "(traktuj jako wzorzec stylu i struktury, nie kopiuj treści):\n\n" + rendered
+            ),
+        }
+    ]
@@ -0,0 +1,98 @@
+"""
+Inkrementalny parser tablicy "scenes" ze strumienia tokenów LLM.
+
+Model zwraca jeden obiekt JSON, ale sceny są niezależne — każdą kompletną scenę
+można przekazać dalej (TTS, media stockowe), zanim model skończy generować resztę.
+Parser śledzi zagnieżdżenie i literały stringów, więc nawiasy wewnątrz tekstu
+narracji nie psują detekcji granic obiektów.
+"""
+
+import json
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+class SceneStreamParser:
+    def __init__(self, array_key: str = "scenes"):
+        self.array_key = array_key
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: str | None = None
+        self._array_depth: int | None = None  # głębokość wewnątrz tablicy scen
+        self._object_start: int | None = None
+        self._done = False
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, chunk: str) -> list[dict]:
+        """Dokłada fragment strumienia; zwraca sceny, które właśnie się domknęły."""
+        if not chunk:
+            return []
+        self._text += chunk
+        text = self._text
+
+        completed: list[dict] = []
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = text[self._string_start + 1 : i]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                if (
+                    ch == "["
+                    and not self._done
+                    and self._array_depth is None
+                    and self._depth == 1
+                    and self._last_string == self.array_key
+                ):
+                    self._array_depth = self._depth + 1
+                elif ch == "{" and self._array_depth == self._depth:
+                    self._object_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                closes_scene = ch == "}" and self._depth == self._array_depth
+                closes_array = (
+                    ch == "]"
+                    and self._array_depth is not None
+                    and self._depth == self._array_depth - 1
+                )
+                if closes_scene and self._object_start is not None:
+                    scene = self._decode(text[self._object_start : i + 1])
+                    if scene is not None:
+                        completed.append(scene)
+                    self._object_start = None
+                elif closes_array:
+                    self._array_depth = None
+                    self._done = True
+
+        self._pos = len(text)
+        return completed
+
+    @staticmethod
+    def _decode(fragment: str) -> dict | None:
+        try:
+            value = json.loads(fragment)
+        except json.JSONDecodeError:
+            logger.warning("Stream: nie udało się zdekodować sceny", fragment=fragment[:100])
+            return None
+        return value if isinstance(value, dict) else None
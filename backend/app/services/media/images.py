@@ -0,0 +1,45 @@
+"""
+Dekodowanie zdjęć prosto do kadru wideo (cover + środek).
+
+JPEG jest dekodowany w trybie draft — libjpeg skaluje w dziedzinie DCT
+(1/2, 1/4, 1/8), więc zdjęcie 6000x4000 nie trafia w całości do pamięci.
+Dalsze zmniejszenie idzie przez reduce (reducing_gap) i dopiero końcówka
+przez LANCZOS, wyłącznie na wycinku, który zostaje w kadrze.
+"""
+
+import io
+import math
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+# Orientacje EXIF z zamianą osi (obrót o 90°/270°)
+_TRANSPOSED = {5, 6, 7, 8}
+
+
+def cover_size(source: tuple[int, int], target: tuple[int, int]) -> tuple[int, int]:
+    """Najmniejszy rozmiar źródła (z zachowaniem proporcji) pokrywający target."""
+    scale = max(target[0] / source[0], target[1] / source[1])
+    return math.ceil(source[0] * scale), math.ceil(source[1] * scale)
+
+
+def fit_to_frame(source: bytes | str | Path, size: tuple[int, int]) -> Image.Image:
+    """Dekoduje zdjęcie i kadruje do size (jak ImageOps.fit), oszczędzając pamięć."""
+    fp = io.BytesIO(source) if isinstance(source, bytes) else source
+    with Image.open(fp) as img:
+        target = size
+        if img.getexif().get(0x0112) in _TRANSPOSED:
+            target = (size[1], size[0])
+        img.draft("RGB", cover_size(img.size, target))
+        img = ImageOps.exif_transpose(img).convert("RGB")
+
+    width, height = img.size
+    scale = max(size[0] / width, size[1] / height)
+    crop_w, crop_h = size[0] / scale, size[1] / scale
+    left, top = (width - crop_w) / 2, (height - crop_h) / 2
+    return img.resize(
+        size,
+        Image.Resampling.LANCZOS,
+        box=(left, top, left + crop_w, top + crop_h),
+        reducing_gap=3.0,
+    )
@@ -0,0 +1,363 @@
+"""
+Lokalna biblioteka mediów — ponowne użycie zdjęć pobranych dla podobnych scen.
+
+Dla każdej sceny najpierw szukamy w bibliotece (pgvector, cosine) zasobu
+o opisie podobnym do visual_description (≥ MEDIA_LIBRARY_SIMILARITY_THRESHOLD).
+Dopiero sceny bez dopasowania idą do Pexels; nowe zdjęcia są pobierane,
+normalizowane (JPEG 1080x1920), zapisywane w S3 i dopisywane do biblioteki.
+Perceptual hash (pHash) kadru odrzuca blisko-duplikaty w obrębie wideo
+i nie pozwala zapisać w S3 drugi raz tego samego zdjęcia z innego URL-a.
+Scena dostaje URL kopii z S3, więc render nie sięga już do CDN Pexels.
+Indeks pHash biblioteki jest trzymany w pamięci procesu (ładowany raz,
+rozszerzany o zasoby dopisane w tym procesie), a nie czytany z bazy przy
+każdym ingeście.
+
+Awaria embeddingów lub bazy nie blokuje pipeline'u — wtedy działa samo Pexels.
+"""
+
+import asyncio
+import io
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from typing import Any
+
+import httpx
+import structlog
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.core.http_replay import replay_transport
+from app.models.media_asset import MediaAsset
+from app.services.media.phash import HashIndex, phash, to_signed
+from app.services.media.stock_provider import find_media_for_scenes, scene_query
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+# Ile razy szukać zamiennika dla kadru, który już jest w wideo
+_DUPLICATE_ROUNDS = 3
+_NEAREST_CANDIDATES = 5
+
+
+class _LibraryHashes:
+    """
+    pHash zasobów biblioteki w pamięci procesu. Zasoby dopisane przez inne
+    workery pojawiają się po przeładowaniu (MEDIA_PHASH_INDEX_REFRESH_SECONDS) —
+    do tego czasu grozi im najwyżej druga kopia w S3, nie błąd.
+    """
+
+    def __init__(self) -> None:
+        self.index: HashIndex | None = None
+        self.loaded_at = 0.0
+
+    async def get(self, db: AsyncSession) -> HashIndex:
+        age = time.monotonic() - self.loaded_at
+        if self.index is None or age > settings.MEDIA_PHASH_INDEX_REFRESH_SECONDS:
+            rows = await db.execute(
+                select(MediaAsset.id, MediaAsset.phash).where(MediaAsset.phash.isnot(None))
+            )
+            self.index = HashIndex((asset_id, h) for asset_id, h in rows.all())
+            self.loaded_at = time.monotonic()
+            logger.info("Biblioteka mediów: indeks pHash wczytany", assets=len(self.index))
+        return self.index
+
+    def reset(self) -> None:
+        self.index = None
+
+
+_library_hashes = _LibraryHashes()
+
+
+async def find_scene_media(
+    scenes: list[dict[str, Any]],
+    exclude_urls: set[str] | None = None,
+    session_factory: Callable[[], AsyncSession] | None = None,
+    frames: HashIndex | None = None,
+    lock: asyncio.Lock | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Media dla scen: biblioteka → Pexels. Semantyka jak find_media_for_scenes
+    (exclude_urls jest uzupełniany o wybrane URL-e).
+    session_factory — osobna sesja na wywołanie (bezpieczne przy równoległych scenach).
+    frames / lock — wspólne dla wywołań z tego samego wideo (tryb strumieniowy):
+    pHash wybranych kadrów i lock na wybór, żeby równoległe sceny nie dostały
+    tego samego zasobu ani blisko-duplikatu.
+    """
+    used = exclude_urls if exclude_urls is not None else set()
+    frames = frames if frames is not None else HashIndex()  # pusty indeks jest falsy
+    lock = lock if lock is not None else asyncio.Lock()
+    if not settings.MEDIA_LIBRARY_ENABLED or session_factory is None:
+        return await find_media_for_scenes(scenes, used)
+
+    from app.services.llm.embeddings import embed_texts
+
+    queries = [scene_query(s) for s in scenes]
+    unique = list(dict.fromkeys(q for q in queries if q))
+    try:
+        embeddings = dict(zip(unique, await embed_texts(unique), strict=True))
+    except Exception as e:
+        logger.warning("Biblioteka mediów: embedding nieudany, tylko Pexels", error=str(e))
+        return await find_media_for_scenes(scenes, used)
+
+    async with session_factory() as db:
+        try:
+            return await _resolve(db, scenes, queries, embeddings, used, frames, lock)
+        except Exception as e:
+            await db.rollback()
+            logger.warning("Biblioteka mediów: błąd, tylko Pexels", error=str(e))
+            return await find_media_for_scenes(scenes, used)
+
+
+async def _resolve(
+    db: AsyncSession,
+    scenes: list[dict[str, Any]],
+    queries: list[str],
+    embeddings: dict[str, list[float]],
+    used: set[str],
+    frames: HashIndex,
+    lock: asyncio.Lock,
+) -> list[dict[str, Any]]:
+    """
+    frames — hashe kadrów już wybranych do tego wideo (blisko-duplikaty odrzucamy).
+    Sprawdzenie i zajęcie zasobu (used, frames) odbywa się pod lockiem; pobieranie
+    i zapis nowych zdjęć — poza nim.
+    """
+    now = datetime.now(timezone.utc)
+    result: list[dict[str, Any] | None] = [None] * len(scenes)
+
+    async with lock:
+        for i, (scene, query) in enumerate(zip(scenes, queries, strict=True)):
+            if not query:
+                continue
+            asset = await _nearest_asset(db, embeddings[query], used, frames)
+            if asset is None:
+                continue
+            asset.use_count += 1
+            asset.last_used_at = now
+            used.update((asset.public_url, asset.source_url))
+            _add_frame(frames, asset)
+            result[i] = {**scene, "media_url": asset.public_url, "media_asset_id": str(asset.id)}
+
+    misses = [i for i, r in enumerate(result) if r is None]
+    logger.info("Biblioteka mediów", hits=len(scenes) - len(misses), misses=len(misses))
+
+    for attempt in range(_DUPLICATE_ROUNDS):
+        if not misses:
+            break
+        fetched = await find_media_for_scenes([scenes[i] for i in misses], used)
+        ingested = await _ingest(
+            db,
+            [
+                (queries[i], embeddings.get(queries[i]), scene.get("media_url"))
+                for i, scene in zip(misses, fetched, strict=True)
+            ],
+        )
+        retry: list[int] = []
+        async with lock:
+            for i, scene, asset in zip(misses, fetched, ingested, strict=True):
+                last = attempt == _DUPLICATE_ROUNDS - 1
+                if asset is not None and not last and _is_duplicate(frames, asset):
+                    # Ten sam kadr już jest w wideo — kolejny kandydat z Pexels
+                    used.add(asset.public_url)
+                    retry.append(i)
+                    continue
+                result[i] = scene
+                if asset is not None:
+                    used.add(asset.public_url)
+                    _add_frame(frames, asset)
+                    result[i] = {
+                        **scene,
+                        "media_url": asset.public_url,
+                        "media_asset_id": str(asset.id),
+                    }
+        if retry:
+            logger.info("Biblioteka mediów: odrzucone duplikaty w wideo", count=len(retry))
+        misses = retry
+
+    await db.commit()
+    return result
+
+
+def _add_frame(frames: HashIndex, asset: MediaAsset) -> None:
+    if asset.phash is not None:
+        frames.add(asset.id, asset.phash)
+
+
+def _is_duplicate(frames: HashIndex, asset: MediaAsset) -> bool:
+    return (
+        asset.phash is not None
+        and frames.nearest(asset.phash, settings.MEDIA_PHASH_MAX_DISTANCE) is not None
+    )
+
+
+async def _nearest_asset(
+    db: AsyncSession, embedding: list[float], exclude: set[str], frames: HashIndex
+) -> MediaAsset | None:
+    """Najbliższy opisowo zasób, pomijając użyte URL-e i kadry bliskie już wybranym."""
+    distance = MediaAsset.embedding.cosine_distance(embedding)
+    query = select(MediaAsset).where(
+        distance <= 1.0 - settings.MEDIA_LIBRARY_SIMILARITY_THRESHOLD
+    )
+    if exclude:
+        query = query.where(
+            MediaAsset.public_url.notin_(exclude), MediaAsset.source_url.notin_(exclude)
+        )
+    result = await db.execute(query.order_by(distance).limit(_NEAREST_CANDIDATES))
+    return next((a for a in result.scalars() if not _is_duplicate(frames, a)), None)
+
+
+async def _ingest(
+    db: AsyncSession, items: list[tuple[str, list[float] | None, str | None]]
+) -> list[MediaAsset | None]:
+    """
+    Dopisuje nowe zdjęcia do biblioteki (pobranie → normalizacja → pHash → S3).
+    Zdjęcie bliskie (Hamming) zasobowi z biblioteki nie jest zapisywane drugi raz —
+    pozycja dostaje istniejący zasób.
+    Zwraca zasób per pozycja albo None (brak URL-a, błąd — scena zostaje z URL-em Pexels).
+    """
+    urls = {url for _, embedding, url in items if url and embedding is not None}
+    if not urls:
+        return [None] * len(items)
+
+    existing = await db.execute(select(MediaAsset).where(MediaAsset.source_url.in_(urls)))
+    by_url: dict[str, MediaAsset] = {a.source_url: a for a in existing.scalars()}
+
+    new_urls = sorted(urls - by_url.keys())
+    semaphore = asyncio.Semaphore(settings.MEDIA_LIBRARY_INGEST_CONCURRENCY)
+
+    async def fetch(client: httpx.AsyncClient, url: str) -> tuple[str, dict | None]:
+        async with semaphore:
+            try:
+                return url, await _download(client, url)
+            except Exception as e:
+                logger.warning("Biblioteka mediów: pobranie nieudane", url=url, error=str(e))
+                return url, None
+
+    async with httpx.AsyncClient(timeout=30.0, transport=replay_transport("stock_media")) as client:
+        downloaded = dict(await asyncio.gather(*(fetch(client, url) for url in new_urls)))
+
+    library = await _library_hashes.get(db)
+    batch = HashIndex()  # zdjęcia z tej partii, jeszcze bez wpisu w bibliotece
+    unique: dict[str, dict] = {}
+    duplicates = 0
+    for url, image in downloaded.items():
+        if image is None:
+            continue
+        match = library.nearest(image["phash"], settings.MEDIA_PHASH_MAX_DISTANCE)
+        if match is not None and (original := await db.get(MediaAsset, match[0])) is not None:
+            duplicates += 1
+            by_url[url] = original
+            continue
+        match = batch.nearest(image["phash"], settings.MEDIA_PHASH_MAX_DISTANCE)
+        if match is not None:
+            duplicates += 1
+            unique[url] = unique[match[0]]
+            continue
+        batch.add(url, image["phash"])
+        unique[url] = image
+
+    stored = await _upload_unique(unique, semaphore)
+    descriptions = {url: (query, embedding) for query, embedding, url in items if url}
+    created: dict[int, MediaAsset] = {}
+    for url, meta in stored.items():
+        if meta is None:
+            continue
+        if id(meta) in created:
+            by_url[url] = created[id(meta)]
+            continue
+        description, embedding = descriptions[url]
+        asset = MediaAsset(
+            source="pexels",
+            source_url=url,
+            description=description,
+            embedding=embedding,
+            use_count=1,
+            last_used_at=datetime.now(timezone.utc),
+            **meta,
+        )
+        try:
+            async with db.begin_nested():
+                db.add(asset)
+        except IntegrityError:
+            # Inny worker dopisał to samo zdjęcie równolegle — bierzemy jego wpis
+            existing_asset = await db.scalar(
+                select(MediaAsset).where(MediaAsset.source_url == url)
+            )
+            if existing_asset is not None:
+                by_url[url] = existing_asset
+            continue
+        by_url[url] = created[id(meta)] = asset
+        if asset.phash is not None:
+            library.add(asset.id, asset.phash)
+
+    if downloaded:
+        logger.info(
+            "Biblioteka mediów: nowe zasoby",
+            count=len(created),
+            duplicates=duplicates,
+            bytes=sum(a.size_bytes for a in created.values()),
+        )
+    return [by_url.get(url) if url else None for _, _, url in items]
+
+
+async def _upload_unique(
+    images: dict[str, dict], semaphore: asyncio.Semaphore
+) -> dict[str, dict | None]:
+    """Wysyła do S3 każde unikalne zdjęcie raz; URL-e duplikatów dostają ten sam wynik."""
+
+    async def upload(image: dict) -> dict | None:
+        async with semaphore:
+            try:
+                return await _store(image)
+            except Exception as e:
+                logger.warning("Biblioteka mediów: zapis do S3 nieudany", error=str(e))
+                return None
+
+    distinct = list({id(image): image for image in images.values()}.values())
+    results = await asyncio.gather(*(upload(image) for image in distinct))
+    by_image = {id(image): meta for image, meta in zip(distinct, results, strict=True)}
+    return {url: by_image[id(image)] for url, image in images.items()}
+
+
+async def _download(client: httpx.AsyncClient, url: str) -> dict:
+    from app.services.analytics.ledger import track_call
+
+    with track_call("pexels", "download_photo") as call:
+        resp = await client.get(url)
+        resp.raise_for_status()
+        call.payload_bytes = len(resp.content)
+
+    data, width, height, image_hash = await asyncio.to_thread(normalize_image, resp.content)
+    return {"data": data, "width": width, "height": height, "phash": image_hash}
+
+
+async def _store(image: dict) -> dict:
+    from app.services.video.storage import AsyncStorageService
+
+    storage = AsyncStorageService()
+    key = storage.generate_key("media/library", "jpg")
+    public_url = await storage.upload_bytes(image["data"], key, "image/jpeg")
+    return {
+        "storage_key": key,
+        "public_url": public_url,
+        "content_type": "image/jpeg",
+        "width": image["width"],
+        "height": image["height"],
+        "size_bytes": len(image["data"]),
+        "phash": to_signed(image["phash"]),
+    }
+
+
+def normalize_image(data: bytes) -> tuple[bytes, int, int, int]:
+    """Kadrowanie do 1080x1920 (cover + środek), RGB, progresywny JPEG + pHash kadru."""
+    from app.services.media.images import fit_to_frame
+    from app.services.video.renderer import VideoRenderer
+
+    size = (VideoRenderer.OUTPUT_WIDTH, VideoRenderer.OUTPUT_HEIGHT)
+    fitted = fit_to_frame(data, size)
+    out = io.BytesIO()
+    fitted.save(out, "JPEG", quality=88, optimize=True, progressive=True)
+    return out.getvalue(), *size, phash(fitted)
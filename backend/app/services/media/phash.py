@@ -0,0 +1,106 @@
+"""
+Perceptual hash zdjęć (dHash / pHash) i indeks odległości Hamminga.
+
+Hashe są 64-bitowe, liczone w NumPy (DCT jako mnożenie macierzy, bez pętli
+po pikselach). HashIndex trzyma hashe w tablicy uint64 — zapytanie to jeden
+XOR + popcount po całej tablicy, więc kilka tysięcy zasobów sprawdzamy
+w ułamku milisekundy.
+
+Odległość ≤ ~6 bitów (z 64) to w praktyce to samo zdjęcie po przeskalowaniu,
+rekompresji lub lekkim kadrze.
+"""
+
+from collections.abc import Hashable, Iterable
+from functools import cache
+
+import numpy as np
+
+HASH_BITS = 64
+_INT64_OFFSET = 1 << 64
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+@cache
+def _dct_matrix(n: int) -> np.ndarray:
+    """Ortonormalna macierz DCT-II n×n (dct(x) = M @ x)."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    m[0] /= np.sqrt(2)
+    return m
+
+
+def _pack(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def _gray(image, size: tuple[int, int]) -> np.ndarray:
+    from PIL import Image
+
+    small = image.convert("L").resize(size, Image.Resampling.LANCZOS)
+    return np.asarray(small, dtype=np.float32)
+
+
+def dhash(image) -> int:
+    """Difference hash: gradient jasności w poziomie na siatce 9x8."""
+    pixels = _gray(image, (9, 8))
+    return _pack(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(image) -> int:
+    """DCT hash: niskie częstotliwości 8x8 obrazu 32x32 względem mediany (bez DC)."""
+    m = _dct_matrix(32)
+    low = (m @ _gray(image, (32, 32)) @ m.T)[:8, :8]
+    median = np.median(low.ravel()[1:])
+    return _pack(low > median)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def to_signed(h: int) -> int:
+    """Hash uint64 → int64 (kolumna BIGINT)."""
+    return h - _INT64_OFFSET if h >= 1 << 63 else h
+
+
+def to_unsigned(h: int) -> int:
+    return h + _INT64_OFFSET if h < 0 else h
+
+
+class HashIndex:
+    """
+    Indeks hashy 64-bit z wyszukiwaniem po odległości Hamminga.
+    Tablica rośnie geometrycznie (podwojenie pojemności), więc add() jest O(1) zamortyzowane.
+    """
+
+    def __init__(self, items: Iterable[tuple[Hashable, int]] = ()):
+        pairs = list(items)
+        self._keys: list[Hashable] = [key for key, _ in pairs]
+        self._hashes = np.array([to_unsigned(h) for _, h in pairs], dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: Hashable, h: int) -> None:
+        size = len(self._keys)
+        if size == len(self._hashes):
+            grown = np.empty(max(16, 2 * size), dtype=np.uint64)
+            grown[:size] = self._hashes
+            self._hashes = grown
+        self._hashes[size] = to_unsigned(h)
+        self._keys.append(key)
+
+    def distances(self, h: int) -> np.ndarray:
+        xor = self._hashes[: len(self._keys)] ^ np.uint64(to_unsigned(h))
+        return _POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+    def nearest(self, h: int, max_distance: int) -> tuple[Hashable, int] | None:
+        """Najbliższy klucz w odległości ≤ max_distance albo None."""
+        if not self._keys:
+            return None
+        dist = self.distances(h)
+        best = int(dist.argmin())
+        if dist[best] > max_distance:
+            return None
+        return self._keys[best], int(dist[best])
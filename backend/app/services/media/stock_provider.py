@@ -2,24 +2,83 @@
 Stock media provider — pobieranie zasobów wizualnych do scen wideo.
 Używa Pexels API jako głównego dostawcy mediów stockowych.
 Gdy brak klucza API, sceny są zwracane bez pola media_url (pipeline działa dalej).
+
+Wyszukiwania idą równolegle (semafor + limiter klastra), identyczne opisy
+w obrębie wideo są wyszukiwane raz, a wyniki (kilku kandydatów na zapytanie)
+trzymamy w Redis per znormalizowane zapytanie i orientacja. Dzięki temu stałe
+sceny (np. CTA) nie generują wywołań API, a powtórki zdjęć w serii można
+ominąć bez ponownego wyszukiwania.
+
+Z rendycji zwracanych przez Pexels (src.*) wybieramy najmniejszą, która po
+przycięciu pokrywa kadr 1080x1920 — zamiast zawsze large2x, które bywa
+za duże (pobieramy zbędne bajty) albo za niskie dla pionowego kadru.
+Klipy wideo (Pexels Videos API) idą tą samą ścieżką z osobnym cache.
 """
 
+import asyncio
+import hashlib
+import json
+import math
+import re
 from typing import Any
+from urllib.parse import parse_qs, urlsplit
 
 import httpx
 import structlog
 
+from app.core.http_replay import replay_transport
+
 logger = structlog.get_logger()
 
 _PEXELS_API_BASE = "https://api.pexels.com/v1"
+_PEXELS_VIDEOS_API_BASE = "https://api.pexels.com/videos"
+_CACHE_PREFIX = "pexels_search:v2:"
+
+
+def normalize_query(text: str) -> str:
+    """Klucz zapytania: małe litery, bez interpunkcji, pojedyncze spacje, max 80 znaków."""
+    words = re.sub(r"[^\w\s]", " ", text.lower()).split()
+    return " ".join(words)[:80].strip()
+
+
+def scene_query(scene: dict[str, Any]) -> str:
+    return normalize_query(scene.get("visual_description") or scene.get("text", ""))
 
 
-async def find_media_for_scenes(scenes: list[dict[str, Any]]) -> list[dict[str, Any]]:
+async def find_media_for_scenes(
+    scenes: list[dict[str, Any]],
+    exclude_urls: set[str] | None = None,
+    orientation: str = "portrait",
+) -> list[dict[str, Any]]:
     """
     Dla każdej sceny wyszukuje pasujące zdjęcie stockowe przez Pexels API.
     Zwraca sceny wzbogacone o pole 'media_url'.
+    exclude_urls — URL-e już użyte (wideo / seria); wybrane URL-e są do niego
+    dopisywane, więc kolejne wywołania z tym samym zbiorem unikają powtórek.
     Gdy klucz API nie jest skonfigurowany, zwraca oryginalne sceny bez zmian.
     """
+    return await _enrich_scenes(scenes, exclude_urls, orientation, "photos")
+
+
+async def find_clips_for_scenes(
+    scenes: list[dict[str, Any]],
+    exclude_urls: set[str] | None = None,
+    orientation: str = "portrait",
+) -> list[dict[str, Any]]:
+    """
+    Jak find_media_for_scenes, ale z Pexels Videos API — sceny dostają pole
+    'clip_url' (plik MP4 najmniejszy pokrywający kadr). 'media_url' zostaje
+    jako zapas dla scen bez klipu.
+    """
+    return await _enrich_scenes(scenes, exclude_urls, orientation, "videos")
+
+
+async def _enrich_scenes(
+    scenes: list[dict[str, Any]],
+    exclude_urls: set[str] | None,
+    orientation: str,
+    kind: str,
+) -> list[dict[str, Any]]:
     from app.core.config import get_settings
 
     settings = get_settings()
@@ -29,32 +88,229 @@ async def find_media_for_scenes(scenes: list[dict[str, Any]]) -> list[dict[str,
         logger.warning("Brak PEXELS_API_KEY — sceny bez mediów stockowych")
         return scenes
 
+    used = exclude_urls if exclude_urls is not None else set()
+    queries = list(dict.fromkeys(q for q in map(scene_query, scenes) if q))
+    candidates = await _get_cached_candidates(queries, orientation, kind)
+    search_fn = _search_pexels_videos if kind == "videos" else _search_pexels_photos
+    field = "clip_url" if kind == "videos" else "media_url"
+
+    missing = [q for q in queries if q not in candidates]
+    if missing:
+        semaphore = asyncio.Semaphore(settings.PEXELS_SEARCH_CONCURRENCY)
+
+        async def search(query: str) -> list[str]:
+            async with semaphore:
+                return await search_fn(client, api_key, query, orientation)
+
+        async with httpx.AsyncClient(timeout=15, transport=replay_transport("pexels")) as client:
+            results = await asyncio.gather(*(search(q) for q in missing))
+        fetched = dict(zip(missing, results, strict=True))
+        candidates.update(fetched)
+        # Błędy wyszukiwania (pusta lista) nie trafiają do cache
+        await _store_candidates(
+            {q: urls for q, urls in fetched.items() if urls},
+            orientation,
+            kind,
+            settings.PEXELS_CACHE_TTL_SECONDS,
+        )
+
+    logger.info(
+        "Media stockowe",
+        kind=kind,
+        scenes=len(scenes),
+        queries=len(queries),
+        cache_hits=len(queries) - len(missing),
+    )
+
     enriched: list[dict[str, Any]] = []
-    async with httpx.AsyncClient(timeout=15) as client:
-        for scene in scenes:
-            query = (scene.get("visual_description") or scene.get("text", ""))[:80]
-            media_url = await _search_pexels_photo(client, api_key, query)
-            enriched.append({**scene, "media_url": media_url})
+    for scene in scenes:
+        options = candidates.get(scene_query(scene), [])
+        fresh = [url for url in options if url not in used]
+        # Gdy wszyscy kandydaci już użyci — lepsza powtórka niż placeholder
+        url = fresh[0] if fresh else (options[0] if options else None)
+        if url:
+            used.add(url)
+        enriched.append({**scene, field: url})
 
     return enriched
 
 
-async def _search_pexels_photo(
-    client: httpx.AsyncClient, api_key: str, query: str
-) -> str | None:
-    """Wyszukuje jedno zdjęcie portretowe z Pexels pasujące do opisu sceny."""
+def _cache_key(query: str, orientation: str, kind: str = "photos") -> str:
+    digest = hashlib.sha1(query.encode(), usedforsecurity=False).hexdigest()
+    prefix = _CACHE_PREFIX if kind == "photos" else f"{_CACHE_PREFIX}{kind}:"
+    return f"{prefix}{orientation}:{digest}"
+
+
+async def _get_redis():
+    import redis.asyncio as aioredis
+
+    from app.core.config import get_settings
+
+    return aioredis.from_url(
+        get_settings().REDIS_URL, decode_responses=True, socket_connect_timeout=2
+    )
+
+
+async def _get_cached_candidates(
+    queries: list[str], orientation: str, kind: str = "photos"
+) -> dict[str, list[str]]:
+    """Jedno MGET dla wszystkich zapytań; przy błędzie Redis — pusty wynik (fail-open)."""
+    if not queries:
+        return {}
+    try:
+        r = await _get_redis()
+        try:
+            raw = await r.mget([_cache_key(q, orientation, kind) for q in queries])
+        finally:
+            await r.aclose()
+    except Exception as e:
+        logger.warning("Pexels cache: Redis niedostępny", error=str(e))
+        return {}
+    return {q: json.loads(v) for q, v in zip(queries, raw, strict=True) if v is not None}
+
+
+async def _store_candidates(
+    candidates: dict[str, list[str]], orientation: str, kind: str, ttl: int
+) -> None:
+    if not candidates:
+        return
+    try:
+        r = await _get_redis()
+        try:
+            async with r.pipeline(transaction=False) as pipe:
+                for query, urls in candidates.items():
+                    pipe.setex(_cache_key(query, orientation, kind), ttl, json.dumps(urls))
+                await pipe.execute()
+        finally:
+            await r.aclose()
+    except Exception as e:
+        logger.warning("Pexels cache: zapis nieudany", error=str(e))
+
+
+async def _search_pexels_photos(
+    client: httpx.AsyncClient, api_key: str, query: str, orientation: str = "portrait"
+) -> list[str]:
+    """Wyszukuje kilka zdjęć z Pexels pasujących do opisu sceny (URL-e rendycji pod kadr)."""
+    from app.core.config import get_settings
+    from app.core.rate_limiter import provider_slot
+    from app.services.analytics.ledger import track_call
+    from app.services.video.renderer import VideoRenderer
+
     if not query.strip():
-        return None
+        return []
     try:
-        resp = await client.get(
-            f"{_PEXELS_API_BASE}/search",
-            headers={"Authorization": api_key},
-            params={"query": query, "per_page": 1, "orientation": "portrait"},
-        )
-        resp.raise_for_status()
-        photos = resp.json().get("photos", [])
-        if photos:
-            return photos[0]["src"]["large2x"]
+        async with provider_slot("pexels", api_key):
+            with track_call("pexels", "search_photo") as call:
+                resp = await client.get(
+                    f"{_PEXELS_API_BASE}/search",
+                    headers={"Authorization": api_key},
+                    params={
+                        "query": query,
+                        "per_page": get_settings().PEXELS_CANDIDATES_PER_QUERY,
+                        "orientation": orientation,
+                    },
+                )
+                resp.raise_for_status()
+                call.payload_bytes = len(resp.content)
+        frame = (VideoRenderer.OUTPUT_WIDTH, VideoRenderer.OUTPUT_HEIGHT)
+        return [select_rendition(photo, frame) for photo in resp.json().get("photos", [])]
     except Exception as exc:
         logger.warning("Pexels błąd wyszukiwania", query=query, error=str(exc))
-    return None
+    return []
+
+
+async def _search_pexels_videos(
+    client: httpx.AsyncClient, api_key: str, query: str, orientation: str = "portrait"
+) -> list[str]:
+    """Wyszukuje klipy z Pexels Videos API (URL-e plików MP4 dobranych pod kadr)."""
+    from app.core.config import get_settings
+    from app.core.rate_limiter import provider_slot
+    from app.services.analytics.ledger import track_call
+    from app.services.video.renderer import VideoRenderer
+
+    if not query.strip():
+        return []
+    settings = get_settings()
+    try:
+        async with provider_slot("pexels", api_key):
+            with track_call("pexels", "search_video") as call:
+                resp = await client.get(
+                    f"{_PEXELS_VIDEOS_API_BASE}/search",
+                    headers={"Authorization": api_key},
+                    params={
+                        "query": query,
+                        "per_page": settings.PEXELS_CANDIDATES_PER_QUERY,
+                        "orientation": orientation,
+                        "max_duration": settings.PEXELS_CLIP_MAX_DURATION_SECONDS,
+                    },
+                )
+                resp.raise_for_status()
+                call.payload_bytes = len(resp.content)
+        frame = (VideoRenderer.OUTPUT_WIDTH, VideoRenderer.OUTPUT_HEIGHT)
+        files = (select_video_file(video, frame) for video in resp.json().get("videos", []))
+        return [url for url in files if url]
+    except Exception as exc:
+        logger.warning("Pexels błąd wyszukiwania klipów", query=query, error=str(exc))
+    return []
+
+
+def select_video_file(video: dict[str, Any], frame: tuple[int, int]) -> str | None:
+    """Najmniejszy plik MP4 klipu pokrywający kadr; gdy żaden — największy."""
+    files = [
+        f for f in video.get("video_files", [])
+        if f.get("file_type") == "video/mp4" and f.get("width") and f.get("height")
+    ]
+    if not files:
+        return None
+    covering = [f for f in files if f["width"] >= frame[0] and f["height"] >= frame[1]]
+    if covering:
+        return min(covering, key=lambda f: f["width"] * f["height"])["link"]
+    return max(files, key=lambda f: f["width"] * f["height"])["link"]
+
+
+def _rendition_size(url: str, original: tuple[int, int]) -> tuple[int, int] | None:
+    """
+    Wymiary rendycji wg parametrów CDN Pexels (w, h, dpr, fit).
+    fit=crop daje dokładnie w×h; bez fit obraz mieści się w ramce w×h
+    (bez powiększania). None, gdy crop wymagałby powiększenia oryginału.
+    """
+    params = {k: v[0] for k, v in parse_qs(urlsplit(url).query).items()}
+    dpr = float(params.get("dpr", 1))
+    w = float(params["w"]) * dpr if "w" in params else None
+    h = float(params["h"]) * dpr if "h" in params else None
+    if w is None and h is None:
+        return original
+    if params.get("fit") == "crop" and w and h:
+        if w > original[0] or h > original[1]:
+            return None
+        return int(w), int(h)
+    scale = min(w / original[0] if w else math.inf, h / original[1] if h else math.inf, 1.0)
+    return round(original[0] * scale), round(original[1] * scale)
+
+
+def select_rendition(photo: dict[str, Any], frame: tuple[int, int]) -> str:
+    """
+    Najmniejsza rendycja zdjęcia, która po przycięciu (cover) pokrywa kadr.
+    Gotowe rendycje mają pierwszeństwo (zwykle są już w cache CDN); gdy żadna
+    nie wystarcza — oryginał przycięty przez CDN do kadru;
+    gdy sam oryginał jest mniejszy od kadru — oryginał.
+    """
+    src: dict[str, str] = photo.get("src", {})
+    original_url = src.get("original")
+    size = (photo.get("width") or 0, photo.get("height") or 0)
+    if not original_url or not all(size):
+        return src.get("large2x") or original_url or ""
+
+    covering = []
+    for name, url in src.items():
+        if name == "original":
+            continue
+        dims = _rendition_size(url, size)
+        if dims and dims[0] >= frame[0] and dims[1] >= frame[1]:
+            covering.append((dims[0] * dims[1], url))
+    if covering:
+        return min(covering)[1]
+    if size[0] >= frame[0] and size[1] >= frame[1]:
+        base = original_url.split("?", 1)[0]
+        return f"{base}?auto=compress&cs=tinysrgb&fit=crop&w={frame[0]}&h={frame[1]}"
+    return original_url
@@ -1,38 +1,43 @@
 """
 Publikacja Reels na Instagram — Graph API.
 Ulepszenie: dwuetapowy process (create container -> publish) + polling statusu.
-"""
 
-import asyncio
+Przetwarzanie kontenera trwa od kilkunastu sekund do kilku minut, więc
+zadanie publikacji tylko tworzy kontener (PublishJob → PROCESSING) i zwalnia
+workera. Statusy sprawdza okresowe zadanie poll_instagram_containers — jednym
+zapytaniem ?ids= na 50 kontenerów danego konta — i woła media_publish, gdy
+kontener jest gotowy.
+"""
 
 import httpx
 import structlog
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry
+
+from app.core.retry_budget import budgeted_retry_kwargs
 
 logger = structlog.get_logger()
 
 
 class InstagramPublisher:
     GRAPH_URL = "https://graph.facebook.com/v19.0"
+    STATUS_BATCH_SIZE = 50  # limit ID w jednym zapytaniu ?ids=
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=2, max=15))
-    async def upload(
+    @retry(**budgeted_retry_kwargs("instagram", max_wait=15))
+    async def create_container(
         self,
         access_token: str,
         ig_user_id: str,
         video_url: str,  # Publiczny URL do wideo (S3 presigned)
         caption: str,
         share_to_feed: bool = True,
-    ) -> dict:
+    ) -> str:
         """
-        Publikuje Reel na Instagram.
-        Wymaga publicznego URL wideo (presigned S3 lub CDN).
-        Zwraca {media_id, url}.
+        Tworzy kontener Reela — Instagram sam pobiera wideo z video_url
+        (presigned S3 lub CDN). Zwraca ID kontenera.
         """
         logger.info("Instagram Reel upload start", ig_user_id=ig_user_id)
 
         async with httpx.AsyncClient(timeout=120.0) as client:
-            # Krok 1: Utwórz media container
             create_resp = await client.post(
                 f"{self.GRAPH_URL}/{ig_user_id}/media",
                 params={
@@ -44,12 +49,37 @@ class InstagramPublisher:
                 },
             )
             create_resp.raise_for_status()
-            container_id = create_resp.json()["id"]
+            return create_resp.json()["id"]
 
-            # Krok 2: Poll — czekaj aż wideo będzie gotowe
-            await self._wait_for_processing(client, container_id, access_token)
+    async def container_statuses(
+        self, access_token: str, container_ids: list[str]
+    ) -> dict[str, dict]:
+        """
+        Statusy wielu kontenerów jednego konta: {id: {status_code, status}}.
+        status_code: IN_PROGRESS | FINISHED | ERROR | EXPIRED | PUBLISHED.
+        """
+        statuses: dict[str, dict] = {}
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            for i in range(0, len(container_ids), self.STATUS_BATCH_SIZE):
+                batch = container_ids[i : i + self.STATUS_BATCH_SIZE]
+                resp = await client.get(
+                    f"{self.GRAPH_URL}/",
+                    params={
+                        "ids": ",".join(batch),
+                        "fields": "status_code,status",
+                        "access_token": access_token,
+                    },
+                )
+                resp.raise_for_status()
+                statuses.update(resp.json())
+        return statuses
 
-            # Krok 3: Publikuj
+    @retry(**budgeted_retry_kwargs("instagram", max_wait=15))
+    async def publish_container(
+        self, access_token: str, ig_user_id: str, container_id: str
+    ) -> dict:
+        """Publikuje przetworzony kontener. Zwraca {media_id, url}."""
+        async with httpx.AsyncClient(timeout=60.0) as client:
             publish_resp = await client.post(
                 f"{self.GRAPH_URL}/{ig_user_id}/media_publish",
                 params={
@@ -60,30 +90,6 @@ class InstagramPublisher:
             publish_resp.raise_for_status()
             media_id = publish_resp.json()["id"]
 
-            url = f"https://www.instagram.com/reel/{media_id}/"
-            logger.info("Instagram Reel opublikowany", media_id=media_id)
-            return {"media_id": media_id, "url": url}
-
-    async def _wait_for_processing(
-        self, client: httpx.AsyncClient, container_id: str, access_token: str
-    ):
-        """Czeka na przetworzenie wideo przez Instagram (max 60s)."""
-        for _ in range(12):  # 12 * 5s = 60s
-            resp = await client.get(
-                f"{self.GRAPH_URL}/{container_id}",
-                params={
-                    "fields": "status_code",
-                    "access_token": access_token,
-                },
-            )
-            data = resp.json()
-            status = data.get("status_code")
-
-            if status == "FINISHED":
-                return
-            elif status == "ERROR":
-                raise RuntimeError(f"Instagram media processing failed: {data}")
-
-            await asyncio.sleep(5)
-
-        raise TimeoutError("Instagram media processing timeout (60s)")
+        url = f"https://www.instagram.com/reel/{media_id}/"
+        logger.info("Instagram Reel opublikowany", media_id=media_id)
+        return {"media_id": media_id, "url": url}
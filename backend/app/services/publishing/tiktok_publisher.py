@@ -1,85 +1,143 @@
 """
 Publikacja wideo na TikTok — Content Posting API (v2).
 Ulepszenie: dwuetapowy upload + poprawna obsługa limitów.
+
+Upload w kawałkach wg reguł API: kawałek 5–64 MB (TIKTOK_UPLOAD_CHUNK_MB),
+total_chunk_count = floor(rozmiar / kawałek), a ostatni kawałek zabiera
+resztę (najwyżej 128 MB). Plik poniżej 5 MB idzie jednym kawałkiem.
+Kawałki są czytane strumieniowo ze źródła (S3 / lokalny render) i wysyłane
+po kolei; nieudany kawałek jest ponawiany osobno, w ramach budżetu zadania.
 """
 
+from collections.abc import Awaitable, Callable
+from contextlib import aclosing
+
 import httpx
 import structlog
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import AsyncRetrying, retry
 
+from app.core.config import get_settings
+from app.core.retry_budget import budgeted_retry_kwargs
+from app.services.publishing.video_source import VideoSource
+
+settings = get_settings()
 logger = structlog.get_logger()
 
+_MIB = 1024 * 1024
+_MIN_CHUNK = 5 * _MIB
+_MAX_CHUNK = 64 * _MIB
+
+
+def plan_chunks(size: int, chunk_size: int) -> list[tuple[int, int]]:
+    """Kawałki (offset, długość) zgodne z API: ostatni zawiera resztę pliku."""
+    chunk_size = min(max(chunk_size, _MIN_CHUNK), _MAX_CHUNK)
+    if size < chunk_size:
+        return [(0, size)]
+    count = size // chunk_size
+    chunks = [(i * chunk_size, chunk_size) for i in range(count)]
+    last_start = chunks[-1][0]
+    chunks[-1] = (last_start, size - last_start)
+    return chunks
+
 
 class TikTokPublisher:
     BASE_URL = "https://open.tiktokapis.com/v2"
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=2, max=15))
     async def upload(
         self,
         access_token: str,
-        video_path: str,
+        video: VideoSource,
         title: str,
         description: str,
+        *,
+        on_progress: Callable[[dict], Awaitable[None]] | None = None,
         **kwargs,
     ) -> dict:
         """
-        Uploaduje wideo na TikTok (FILE_UPLOAD).
-        Zwraca {publish_id}.
+        Uploaduje wideo na TikTok (FILE_UPLOAD, w kawałkach).
+        on_progress dostaje {publish_id, chunks_done, total_chunks, bytes_done}
+        po każdym kawałku. Zwraca {publish_id}.
         """
-        logger.info("TikTok upload start", title=title)
-
-        import os
-        file_size = os.path.getsize(video_path)
+        chunks = plan_chunks(video.size, settings.TIKTOK_UPLOAD_CHUNK_MB * _MIB)
+        logger.info("TikTok upload start", title=title, chunks=len(chunks))
 
         async with httpx.AsyncClient(timeout=300.0) as client:
             # Krok 1: Inicjalizacja uploadu
-            init_resp = await client.post(
-                f"{self.BASE_URL}/post/publish/inbox/video/init/",
-                headers={
-                    "Authorization": f"Bearer {access_token}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "post_info": {
-                        "title": title[:150],
-                        "description": description[:2200],
-                        "disable_comment": False,
-                        "privacy_level": "PUBLIC_TO_EVERYONE",
-                    },
-                    "source_info": {
-                        "source": "FILE_UPLOAD",
-                        "video_size": file_size,
-                        "chunk_size": file_size,
-                        "total_chunk_count": 1,
-                    },
-                },
-            )
-            init_resp.raise_for_status()
-            init_data = init_resp.json()
-
-            publish_id = init_data["data"]["publish_id"]
-            upload_url = init_data["data"]["upload_url"]
-
-            # Krok 2: Upload pliku
-            with open(video_path, "rb") as f:
-                video_data = f.read()
-
-            headers = {
-                "Content-Type": "video/mp4",
-                "Content-Length": str(file_size),
-                "Content-Range": f"bytes 0-{file_size - 1}/{file_size}",
-            }
-
-            upload_resp = await client.put(
-                upload_url,
-                headers=headers,
-                content=video_data,
+            publish_id, upload_url = await self._init_upload(
+                client, access_token, title, description, video.size, chunks
             )
-            upload_resp.raise_for_status()
 
-            logger.info("TikTok upload zakończony", publish_id=publish_id)
+            # Krok 2: Kawałki po kolei — strumieniowo ze źródła (S3 / lokalny render)
+            async with aclosing(video.chunks(chunks[0][1])) as pieces:
+                for index, (start, length) in enumerate(chunks):
+                    data = b""
+                    while len(data) < length:  # ostatni kawałek = dwa odczyty
+                        data += await anext(pieces)
+                    await self._put_chunk(client, upload_url, data, start, video.size)
+                    if on_progress:
+                        await on_progress(
+                            {
+                                "publish_id": publish_id,
+                                "chunks_done": index + 1,
+                                "total_chunks": len(chunks),
+                                "bytes_done": start + length,
+                            }
+                        )
+
+            logger.info("TikTok upload zakończony", publish_id=publish_id, chunks=len(chunks))
             return {"publish_id": publish_id, "url": None}
 
+    @retry(**budgeted_retry_kwargs("tiktok", max_wait=15))
+    async def _init_upload(
+        self,
+        client: httpx.AsyncClient,
+        access_token: str,
+        title: str,
+        description: str,
+        size: int,
+        chunks: list[tuple[int, int]],
+    ) -> tuple[str, str]:
+        init_resp = await client.post(
+            f"{self.BASE_URL}/post/publish/inbox/video/init/",
+            headers={
+                "Authorization": f"Bearer {access_token}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "post_info": {
+                    "title": title[:150],
+                    "description": description[:2200],
+                    "disable_comment": False,
+                    "privacy_level": "PUBLIC_TO_EVERYONE",
+                },
+                "source_info": {
+                    "source": "FILE_UPLOAD",
+                    "video_size": size,
+                    "chunk_size": chunks[0][1],
+                    "total_chunk_count": len(chunks),
+                },
+            },
+        )
+        init_resp.raise_for_status()
+        data = init_resp.json()["data"]
+        return data["publish_id"], data["upload_url"]
+
+    async def _put_chunk(
+        self, client: httpx.AsyncClient, upload_url: str, data: bytes, start: int, size: int
+    ) -> None:
+        """PUT jednego kawałka; ponowienia dotyczą tylko tego kawałka."""
+        async for attempt in AsyncRetrying(**budgeted_retry_kwargs("tiktok", max_wait=15)):
+            with attempt:
+                resp = await client.put(
+                    upload_url,
+                    headers={
+                        "Content-Type": "video/mp4",
+                        "Content-Range": f"bytes {start}-{start + len(data) - 1}/{size}",
+                    },
+                    content=data,
+                )
+                resp.raise_for_status()
+
     async def check_status(self, access_token: str, publish_id: str) -> dict:
         """Sprawdza status publikacji."""
         async with httpx.AsyncClient(timeout=30.0) as client:
@@ -0,0 +1,141 @@
+"""
+Źródło pliku wideo dla publikacji — strumień zamiast pobierania do pamięci.
+
+Publisher czyta wideo kawałkami (chunks) wprost ze źródła i od razu wysyła je
+na platformę, więc w pamięci jest najwyżej jeden kawałek na upload
+(PUBLISH_STREAM_CHUNK_MB), niezależnie od rozmiaru pliku.
+
+Kolejność źródeł:
+1. Render zachowany na tym węźle (retain_local_render po uploadzie w pipeline)
+   — nazwa pliku wynika z klucza w storage, więc nieaktualny render nie pasuje.
+2. Backend lokalny storage — plik magazynu czytany bezpośrednio.
+3. S3 GetObject — StreamingBody czytane porcjami (Range przy wznowieniu).
+   Przy kilku uploadach naraz plik jest raz zapisywany na dysk (spool_to_disk).
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import os
+import tempfile
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from pathlib import Path
+from typing import BinaryIO
+
+import structlog
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+_MIB = 1024 * 1024
+
+
+class VideoSource:
+    """Plik wideo o znanym rozmiarze, czytany strumieniowo od dowolnego offsetu."""
+
+    def __init__(self, size: int, opener: Callable[[int], Awaitable[BinaryIO]], origin: str):
+        self.size = size
+        self.origin = origin
+        self._opener = opener
+
+    @classmethod
+    def from_path(cls, path: str, origin: str = "local") -> "VideoSource":
+        async def opener(start: int) -> BinaryIO:
+            f = open(path, "rb")  # noqa: SIM115 — zamyka chunks()
+            f.seek(start)
+            return f
+
+        return cls(os.path.getsize(path), opener, origin=origin)
+
+    async def chunks(self, chunk_size: int | None = None, start: int = 0) -> AsyncIterator[bytes]:
+        """Kolejne kawałki po chunk_size bajtów (ostatni krótszy) od offsetu start."""
+        chunk_size = chunk_size or settings.PUBLISH_STREAM_CHUNK_MB * _MIB
+        f = await self._opener(start)
+        try:
+            remaining = self.size - start
+            while remaining > 0:
+                chunk = await asyncio.to_thread(_read_exact, f, min(chunk_size, remaining))
+                if not chunk:
+                    raise OSError(f"Źródło wideo skończyło się {remaining} B przed końcem")
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            await asyncio.to_thread(f.close)
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    """read() strumienia HTTP może zwrócić mniej niż size — dobieramy do pełnego kawałka."""
+    parts = []
+    while size > 0 and (part := f.read(size)):
+        parts.append(part)
+        size -= len(part)
+    return b"".join(parts)
+
+
+async def open_video_source(storage, video_url: str | None) -> VideoSource:
+    """Źródło dla wideo zapisanego pod video_url (AsyncStorageService)."""
+    key = storage.key_from_url(video_url)
+    if not key:
+        raise RuntimeError("Brak pliku wideo do publikacji")
+
+    local = local_render_path(key)
+    if local.is_file():
+        logger.info("Publikacja z lokalnego renderu", key=key)
+        return VideoSource.from_path(str(local), origin="local_render")
+
+    async def opener(start: int) -> BinaryIO:
+        return await storage.open_object(key, start)
+
+    origin = "local_storage" if settings.STORAGE_BACKEND == "local" else "s3"
+    return VideoSource(await storage.size(key), opener, origin=origin)
+
+
+async def spool_to_disk(source: VideoSource) -> tuple[VideoSource, str]:
+    """
+    Jednorazowy, strumieniowy zapis źródła na dysk — gdy ten sam plik idzie
+    na kilka platform, S3 oddaje go raz. Zwraca (źródło z pliku, ścieżka do usunięcia).
+    """
+    directory = Path(settings.PUBLISH_RENDER_CACHE_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".spool")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in source.chunks():
+                await asyncio.to_thread(f.write, chunk)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        raise
+    return VideoSource.from_path(path, origin=f"{source.origin}_spooled"), path
+
+
+def local_render_path(key: str) -> Path:
+    digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+    return Path(settings.PUBLISH_RENDER_CACHE_DIR) / f"{digest}{Path(key).suffix}"
+
+
+def retain_local_render(path: str, key: str) -> None:
+    """
+    Zachowuje render (hardlink, bez kopii) na potrzeby publikacji z tego węzła.
+    Przy okazji usuwa rendery starsze niż PUBLISH_RENDER_CACHE_HOURS.
+    """
+    if settings.STORAGE_BACKEND == "local":
+        return  # plik i tak jest na dysku magazynu
+    target = local_render_path(key)
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.link(path, target)
+    except FileExistsError:
+        pass
+    except OSError as e:  # inny system plików — publikacja pójdzie z S3
+        logger.info("Render nie zachowany lokalnie", key=key, error=str(e))
+        return
+
+    cutoff = time.time() - settings.PUBLISH_RENDER_CACHE_HOURS * 3600
+    for stale in target.parent.iterdir():
+        with contextlib.suppress(FileNotFoundError):
+            if stale.stat().st_mtime < cutoff:
+                stale.unlink()
@@ -1,84 +1,190 @@
 """
-Publikacja wideo na YouTube — resumable upload.
-Ulepszenie: obsługa retry + śledzenie statusu.
+Publikacja wideo na YouTube — resumable upload w kawałkach.
+
+Plik idzie kawałkami YOUTUBE_UPLOAD_CHUNK_MB (wielokrotność 256 KiB), każdy
+osobnym PUT z Content-Range. Po błędzie sieci lub 5xx pytamy sesję o stan
+(Content-Range: bytes */N) i wysyłamy dalej od ostatniego potwierdzonego bajtu.
+URL sesji trafia do wywołującego przez on_session (zadanie zapisuje go
+w PublishJob.metadata_extra), więc retry zadania Celery wznawia upload,
+zamiast zaczynać od zera.
 """
 
+import asyncio
+from collections.abc import Awaitable, Callable
+
 import httpx
 import structlog
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry
+
+from app.core.config import get_settings
+from app.core.retry_budget import budgeted_retry_kwargs, consume_retry, record_call
+from app.services.publishing.video_source import VideoSource
 
+settings = get_settings()
 logger = structlog.get_logger()
 
+_CHUNK_ALIGN = 256 * 1024  # wymóg API: kawałki (poza ostatnim) to wielokrotność 256 KiB
+_RESUMABLE_STATUS = (429, 500, 502, 503, 504)
+
+
+class UploadSessionExpiredError(Exception):
+    """Sesja resumable wygasła (404/410) — upload trzeba zacząć od nowa."""
+
+
+class _RetryableStatusError(Exception):
+    """Odpowiedź 429/5xx na kawałek — do wznowienia po zapytaniu o stan sesji."""
+
 
 class YouTubePublisher:
     BASE_URL = "https://www.googleapis.com/upload/youtube/v3/videos"
     API_URL = "https://www.googleapis.com/youtube/v3"
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=2, max=15))
     async def upload(
         self,
         access_token: str,
-        video_path: str,
+        video: VideoSource,
         title: str,
         description: str,
         tags: list[str],
         category_id: str = "22",  # People & Blogs
         privacy: str = "public",
+        *,
+        session_url: str | None = None,
+        on_session: Callable[[str], Awaitable[None]] | None = None,
     ) -> dict:
         """
-        Uploaduje wideo na YouTube (resumable upload).
+        Uploaduje wideo na YouTube (resumable upload, kawałkami).
+        Z session_url wznawia wcześniejszy upload od potwierdzonego offsetu.
         Zwraca {video_id, url}.
         """
-        logger.info("YouTube upload start", title=title)
+        logger.info("YouTube upload start", title=title, resume=bool(session_url))
 
         async with httpx.AsyncClient(timeout=300.0) as client:
-            # Krok 1: Inicjalizacja upload sesji
-            metadata = {
-                "snippet": {
-                    "title": title[:100],
-                    "description": description[:5000],
-                    "tags": tags[:30],
-                    "categoryId": category_id,
-                },
-                "status": {
-                    "privacyStatus": privacy,
-                    "selfDeclaredMadeForKids": False,
-                    "madeForKids": False,
-                },
-            }
+            offset, result = 0, None
+            if session_url:
+                try:
+                    offset, result = await self._query_status(
+                        client, access_token, session_url, video.size
+                    )
+                    logger.info("YouTube upload wznowiony", offset=offset, size=video.size)
+                except UploadSessionExpiredError:
+                    logger.info("YouTube: sesja uploadu wygasła, nowa sesja")
+                    session_url = None
 
-            init_resp = await client.post(
-                f"{self.BASE_URL}?uploadType=resumable&part=snippet,status",
-                headers={
-                    "Authorization": f"Bearer {access_token}",
-                    "Content-Type": "application/json",
-                },
-                json=metadata,
-            )
-            init_resp.raise_for_status()
-            upload_url = init_resp.headers["Location"]
+            if session_url is None:
+                metadata = {
+                    "snippet": {
+                        "title": title[:100],
+                        "description": description[:5000],
+                        "tags": tags[:30],
+                        "categoryId": category_id,
+                    },
+                    "status": {
+                        "privacyStatus": privacy,
+                        "selfDeclaredMadeForKids": False,
+                        "madeForKids": False,
+                    },
+                }
+                session_url = await self._create_session(client, access_token, metadata, video)
+                if on_session:
+                    await on_session(session_url)
+
+            resumes, resync = 0, False
+            while result is None:
+                try:
+                    if resync:
+                        # Po błędzie offset z serwera — samo zapytanie też może się nie udać
+                        offset, result = await self._query_status(
+                            client, access_token, session_url, video.size
+                        )
+                        resync = False
+                    if result is None:
+                        offset, result = await self._send_from(
+                            client, access_token, session_url, video, offset
+                        )
+                except (httpx.TransportError, _RetryableStatusError) as e:
+                    resumes += 1
+                    if resumes > settings.YOUTUBE_UPLOAD_MAX_RESUMES or not consume_retry(
+                        "youtube"
+                    ):
+                        raise
+                    record_call("youtube", resumes + 1)
+                    logger.warning(
+                        "YouTube: kawałek nieudany, wznawiam", offset=offset, error=str(e)
+                    )
+                    await asyncio.sleep(min(2**resumes, 30))
+                    resync = True
+
+            video_id = result["id"]
+            url = f"https://www.youtube.com/shorts/{video_id}"
 
-            # Krok 2: Upload pliku
-            with open(video_path, "rb") as f:
-                video_data = f.read()
+            logger.info("YouTube upload zakończony", video_id=video_id, url=url)
+            return {"video_id": video_id, "url": url}
 
-            upload_resp = await client.put(
-                upload_url,
+    @retry(**budgeted_retry_kwargs("youtube", max_wait=15))
+    async def _create_session(
+        self, client: httpx.AsyncClient, access_token: str, metadata: dict, video: VideoSource
+    ) -> str:
+        init_resp = await client.post(
+            f"{self.BASE_URL}?uploadType=resumable&part=snippet,status",
+            headers={
+                "Authorization": f"Bearer {access_token}",
+                "Content-Type": "application/json",
+                "X-Upload-Content-Type": "video/mp4",
+                "X-Upload-Content-Length": str(video.size),
+            },
+            json=metadata,
+        )
+        init_resp.raise_for_status()
+        return init_resp.headers["Location"]
+
+    async def _send_from(
+        self,
+        client: httpx.AsyncClient,
+        access_token: str,
+        session_url: str,
+        video: VideoSource,
+        offset: int,
+    ) -> tuple[int, dict | None]:
+        """
+        Wysyła kolejne kawałki od offset. Zwraca (offset, None), gdy serwer
+        potwierdził mniej, niż wysłaliśmy (ponowna iteracja od tego miejsca),
+        albo (size, zasób wideo) po ostatnim kawałku.
+        """
+        async for chunk in video.chunks(_chunk_size(), start=offset):
+            end = offset + len(chunk) - 1
+            resp = await client.put(
+                session_url,
                 headers={
                     "Authorization": f"Bearer {access_token}",
                     "Content-Type": "video/mp4",
-                    "Content-Length": str(len(video_data)),
+                    "Content-Range": f"bytes {offset}-{end}/{video.size}",
                 },
-                content=video_data,
+                content=chunk,
             )
-            upload_resp.raise_for_status()
-            result = upload_resp.json()
+            done, acked = _parse_upload_response(resp, video.size)
+            if done is not None:
+                return video.size, done
+            logger.debug("YouTube: kawałek potwierdzony", acked=acked, size=video.size)
+            if acked != end + 1:
+                return acked, None
+            offset = acked
+        # Wszystko wysłane, a brak odpowiedzi końcowej — stan rozstrzyga sesja
+        return await self._query_status(client, access_token, session_url, video.size)
 
-            video_id = result["id"]
-            url = f"https://www.youtube.com/shorts/{video_id}"
-
-            logger.info("YouTube upload zakończony", video_id=video_id, url=url)
-            return {"video_id": video_id, "url": url}
+    async def _query_status(
+        self, client: httpx.AsyncClient, access_token: str, session_url: str, size: int
+    ) -> tuple[int, dict | None]:
+        """Stan sesji: (potwierdzony offset, None) albo (size, zasób wideo)."""
+        resp = await client.put(
+            session_url,
+            headers={
+                "Authorization": f"Bearer {access_token}",
+                "Content-Range": f"bytes */{size}",
+            },
+        )
+        done, acked = _parse_upload_response(resp, size)
+        return (size, done) if done is not None else (acked, None)
 
     async def set_thumbnail(self, access_token: str, video_id: str, thumbnail_path: str):
         """Ustawia miniaturę wideo."""
@@ -89,3 +195,24 @@ class YouTubePublisher:
                     headers={"Authorization": f"Bearer {access_token}"},
                     files={"media": ("thumbnail.jpg", f, "image/jpeg")},
                 )
+
+
+def _chunk_size() -> int:
+    aligned = settings.YOUTUBE_UPLOAD_CHUNK_MB * 1024 * 1024 // _CHUNK_ALIGN * _CHUNK_ALIGN
+    return max(_CHUNK_ALIGN, aligned)
+
+
+def _parse_upload_response(resp: httpx.Response, size: int) -> tuple[dict | None, int]:
+    """(zasób wideo, size) po zakończeniu albo (None, potwierdzony offset) dla 308."""
+    if resp.status_code in (200, 201):
+        return resp.json(), size
+    if resp.status_code == 308:
+        # Range: bytes=0-12345 — brak nagłówka oznacza, że nic nie dotarło
+        received = resp.headers.get("Range")
+        return None, int(received.rsplit("-", 1)[1]) + 1 if received else 0
+    if resp.status_code in (404, 410):
+        raise UploadSessionExpiredError(resp.text[:200])
+    if resp.status_code in _RESUMABLE_STATUS:
+        raise _RetryableStatusError(f"HTTP {resp.status_code}")
+    resp.raise_for_status()
+    raise RuntimeError(f"YouTube: nieoczekiwana odpowiedź {resp.status_code}")
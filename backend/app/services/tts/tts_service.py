@@ -1,8 +1,10 @@
 """
 Serwis Text-to-Speech — ElevenLabs (główny) + Google TTS (fallback).
 Ulepszenie: abstrakcja provider + automatyczny fallback + cache audio.
+Provider "local" generuje deterministyczne audio offline (CI, testy obciążeniowe).
 """
 
+import asyncio
 import hashlib
 import io
 import struct
@@ -12,9 +14,13 @@ from pathlib import Path
 
 import httpx
 import structlog
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry
 
 from app.core.config import get_settings
+from app.core.http_replay import replay_transport
+from app.core.rate_limiter import provider_slot
+from app.core.retry_budget import budgeted_retry_kwargs, consume_retry, record_call
+from app.services.analytics.ledger import track_call
 
 settings = get_settings()
 logger = structlog.get_logger()
@@ -38,36 +44,45 @@ class ElevenLabsTTS(TTSProvider):
         self.model_id = settings.ELEVENLABS_MODEL_ID
         self.default_voice_id = settings.ELEVENLABS_DEFAULT_VOICE_ID
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=2, max=10))
+    @retry(**budgeted_retry_kwargs("elevenlabs"))
     async def synthesize(self, text: str, voice_id: str | None = None) -> bytes:
         voice = voice_id or self.default_voice_id
         logger.info("ElevenLabs TTS", voice_id=voice, text_length=len(text))
 
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                f"{self.BASE_URL}/text-to-speech/{voice}",
-                headers={
-                    "xi-api-key": self.api_key,
-                    "Content-Type": "application/json",
-                    "Accept": "audio/mpeg",
-                },
-                json={
-                    "text": text,
-                    "model_id": self.model_id,
-                    "voice_settings": {
-                        "stability": 0.5,
-                        "similarity_boost": 0.75,
-                        "style": 0.0,
-                        "use_speaker_boost": True,
+        async with (
+            provider_slot("elevenlabs", self.api_key),
+            httpx.AsyncClient(timeout=60.0, transport=replay_transport("elevenlabs")) as client,
+        ):
+            with track_call(
+                "elevenlabs", "synthesize", model=self.model_id, characters=len(text)
+            ) as call:
+                response = await client.post(
+                    f"{self.BASE_URL}/text-to-speech/{voice}",
+                    headers={
+                        "xi-api-key": self.api_key,
+                        "Content-Type": "application/json",
+                        "Accept": "audio/mpeg",
                     },
-                },
-            )
-            response.raise_for_status()
+                    json={
+                        "text": text,
+                        "model_id": self.model_id,
+                        "voice_settings": {
+                            "stability": 0.5,
+                            "similarity_boost": 0.75,
+                            "style": 0.0,
+                            "use_speaker_boost": True,
+                        },
+                    },
+                )
+                response.raise_for_status()
+                call.payload_bytes = len(response.content)
             logger.info("Audio wygenerowane", size_bytes=len(response.content))
             return response.content
 
     async def list_voices(self) -> list[dict]:
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with httpx.AsyncClient(
+            timeout=30.0, transport=replay_transport("elevenlabs")
+        ) as client:
             response = await client.get(
                 f"{self.BASE_URL}/voices",
                 headers={"xi-api-key": self.api_key},
@@ -104,9 +119,11 @@ class GoogleTTS(TTSProvider):
                 audio_encoding=texttospeech.AudioEncoding.MP3,
                 speaking_rate=1.0,
             )
-            response = client.synthesize_speech(
-                input=synthesis_input, voice=voice_params, audio_config=audio_config
-            )
+            with track_call("google_tts", "synthesize", characters=len(text)) as call:
+                response = client.synthesize_speech(
+                    input=synthesis_input, voice=voice_params, audio_config=audio_config
+                )
+                call.payload_bytes = len(response.audio_content)
             return response.audio_content
         except Exception as e:
             logger.error("Google TTS niedostępny", error=str(e))
@@ -119,11 +136,96 @@ class GoogleTTS(TTSProvider):
         ]
 
 
+class LocalTTS(TTSProvider):
+    """
+    Deterministyczny provider offline — syntetyczne tony (NumPy) zamiast mowy.
+    Długość audio jest proporcjonalna do długości tekstu, a ten sam tekst i głos
+    dają zawsze identyczne bajty. Opóźnienie konfigurowalne (symulacja API).
+    """
+
+    # voice_id -> bazowa częstotliwość "głosu" (Hz)
+    VOICES = {
+        "local-low": 140.0,
+        "local-mid": 200.0,
+        "local-high": 260.0,
+    }
+    DEFAULT_VOICE = "local-mid"
+
+    def __init__(self):
+        self.sample_rate = settings.LOCAL_TTS_SAMPLE_RATE
+        self.chars_per_second = settings.LOCAL_TTS_CHARS_PER_SECOND
+        self.latency_ms = settings.LOCAL_TTS_LATENCY_MS
+        self.latency_jitter_ms = settings.LOCAL_TTS_LATENCY_JITTER_MS
+
+    async def synthesize(self, text: str, voice_id: str | None = None) -> bytes:
+        voice = voice_id if voice_id in self.VOICES else self.DEFAULT_VOICE
+        seed = int.from_bytes(hashlib.sha256(f"{voice}:{text}".encode()).digest()[:8], "big")
+        logger.info("Lokalny TTS", voice_id=voice, text_length=len(text))
+
+        delay_ms = self.latency_ms
+        if self.latency_jitter_ms:
+            # Jitter też deterministyczny — powtarzalne przebiegi obciążeniowe
+            delay_ms += (seed % (2 * self.latency_jitter_ms + 1)) - self.latency_jitter_ms
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000)
+
+        pcm = self._render_tones(text, self.VOICES[voice], seed)
+        return self._to_wav(pcm)
+
+    async def list_voices(self) -> list[dict]:
+        return [
+            {"id": voice, "name": f"Lokalny ({voice.split('-')[1]})", "category": "local"}
+            for voice in self.VOICES
+        ]
+
+    def _render_tones(self, text: str, base_freq: float, seed: int):
+        """Każde słowo = ton o długości ∝ liczbie znaków, przerwy między słowami."""
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        sr = self.sample_rate
+        seconds_per_char = 1.0 / self.chars_per_second
+        gap = np.zeros(int(sr * seconds_per_char), dtype=np.float32)
+
+        segments = []
+        for word in text.split():
+            duration = len(word) * seconds_per_char
+            t = np.arange(int(sr * duration), dtype=np.float32) / sr
+            freq = base_freq * rng.uniform(0.85, 1.25)
+            tone = np.sin(2 * np.pi * freq * t) + 0.3 * np.sin(4 * np.pi * freq * t)
+            # Obwiednia (attack/release) — bez trzasków na granicach słów
+            ramp = min(len(t) // 4, int(sr * 0.01))
+            if ramp:
+                envelope = np.ones_like(t)
+                envelope[:ramp] = np.linspace(0.0, 1.0, ramp)
+                envelope[-ramp:] = np.linspace(1.0, 0.0, ramp)
+                tone *= envelope
+            segments.append(tone.astype(np.float32))
+            # Dłuższa pauza po znakach interpunkcyjnych
+            segments.append(np.tile(gap, 4) if word[-1] in ".!?" else gap)
+
+        if not segments:
+            segments.append(np.zeros(int(sr * 0.5), dtype=np.float32))
+
+        pcm = np.concatenate(segments) * 0.4
+        return (pcm * 32767).astype("<i2")
+
+    def _to_wav(self, pcm) -> bytes:
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(pcm.tobytes())
+        return buffer.getvalue()
+
+
 def get_tts_provider(provider_name: str = "elevenlabs") -> TTSProvider:
     """Fabryka providerów TTS."""
     providers = {
         "elevenlabs": ElevenLabsTTS,
         "google": GoogleTTS,
+        "local": LocalTTS,
     }
     cls = providers.get(provider_name, ElevenLabsTTS)
     return cls()
@@ -140,7 +242,11 @@ async def synthesize_with_fallback(
         return await primary.synthesize(text, voice_id)
     except Exception as e:
         logger.warning(f"Główny TTS ({provider_name}) zawiódł, fallback", error=str(e))
-        if provider_name != "google":
+        # Lokalny provider nie może po cichu wołać zewnętrznego API (tryb offline)
+        if provider_name not in ("google", "local"):
+            if not consume_retry(provider_name):
+                raise
+            record_call("google")
             fallback = GoogleTTS()
             return await fallback.synthesize(text, voice_id)
         raise
@@ -0,0 +1,146 @@
+"""
+Katalog głosów TTS — wspólny dla wszystkich providerów, cache w Redis.
+
+Lista głosów zmienia się rzadko, więc trzymamy ją w Redis z TTL i odświeżamy
+w tle (stale-while-revalidate): po VOICE_CATALOGUE_REFRESH_AFTER_SECONDS
+zwracamy jeszcze dane z cache, a równolegle pobieramy świeżą listę.
+Gdy Redis jest niedostępny, katalog pobierany jest bezpośrednio od providera.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from dataclasses import dataclass, field
+
+import structlog
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+_REDIS_PREFIX = "voice_catalogue:"
+_LOCK_PREFIX = "voice_catalogue_lock:"
+
+# Referencje do zadań odświeżania w tle (inaczej GC może je ubić)
+_background_refreshes: set[asyncio.Task] = set()
+
+
+@dataclass
+class VoiceCatalogue:
+    provider: str
+    voices: list[dict]
+    fetched_at: float
+    etag: str = field(init=False)
+
+    def __post_init__(self):
+        payload = json.dumps(self.voices, sort_keys=True, ensure_ascii=False).encode()
+        self.etag = f'"{hashlib.sha256(payload).hexdigest()[:32]}"'
+
+    @property
+    def voice_ids(self) -> set[str]:
+        return {v["id"] for v in self.voices}
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.fetched_at
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"provider": self.provider, "voices": self.voices, "fetched_at": self.fetched_at},
+            ensure_ascii=False,
+        )
+
+    @classmethod
+    def from_json(cls, raw: str) -> "VoiceCatalogue":
+        data = json.loads(raw)
+        return cls(provider=data["provider"], voices=data["voices"], fetched_at=data["fetched_at"])
+
+
+async def _get_redis():
+    import redis.asyncio as aioredis
+
+    return aioredis.from_url(settings.REDIS_URL, decode_responses=True, socket_connect_timeout=2)
+
+
+async def _fetch_from_provider(provider: str) -> VoiceCatalogue:
+    from app.services.tts.tts_service import get_tts_provider
+
+    voices = await get_tts_provider(provider).list_voices()
+    logger.info("Katalog głosów pobrany od providera", provider=provider, count=len(voices))
+    return VoiceCatalogue(provider=provider, voices=voices, fetched_at=time.time())
+
+
+async def refresh_voice_catalogue(provider: str) -> VoiceCatalogue:
+    """Pobiera listę głosów od providera i zapisuje ją w Redis."""
+    catalogue = await _fetch_from_provider(provider)
+    try:
+        r = await _get_redis()
+        try:
+            await r.setex(
+                f"{_REDIS_PREFIX}{provider}",
+                settings.VOICE_CATALOGUE_TTL_SECONDS,
+                catalogue.to_json(),
+            )
+        finally:
+            await r.aclose()
+    except Exception as e:
+        logger.warning("Katalog głosów: zapis do Redis nieudany", provider=provider, error=str(e))
+    return catalogue
+
+
+async def _refresh_in_background(provider: str) -> None:
+    """Odświeżenie w tle — lock w Redis, żeby tylko jeden proces pytał providera."""
+    try:
+        r = await _get_redis()
+        try:
+            acquired = await r.set(f"{_LOCK_PREFIX}{provider}", "1", nx=True, ex=60)
+        finally:
+            await r.aclose()
+        if acquired:
+            await refresh_voice_catalogue(provider)
+    except Exception as e:
+        logger.warning(
+            "Katalog głosów: odświeżanie w tle nieudane", provider=provider, error=str(e)
+        )
+
+
+async def get_voice_catalogue(provider: str) -> VoiceCatalogue:
+    """Zwraca katalog głosów providera (z cache, jeśli dostępny)."""
+    cached: VoiceCatalogue | None = None
+    try:
+        r = await _get_redis()
+        try:
+            raw = await r.get(f"{_REDIS_PREFIX}{provider}")
+        finally:
+            await r.aclose()
+        if raw:
+            cached = VoiceCatalogue.from_json(raw)
+    except Exception as e:
+        logger.warning("Katalog głosów: Redis niedostępny", provider=provider, error=str(e))
+
+    if cached is None:
+        return await refresh_voice_catalogue(provider)
+
+    if cached.age_seconds > settings.VOICE_CATALOGUE_REFRESH_AFTER_SECONDS:
+        task = asyncio.create_task(_refresh_in_background(provider))
+        _background_refreshes.add(task)
+        task.add_done_callback(_background_refreshes.discard)
+
+    return cached
+
+
+async def is_voice_available(provider: str, voice_id: str) -> bool | None:
+    """
+    Sprawdza, czy głos istnieje w katalogu providera.
+    Zwraca None, gdy katalogu nie da się pobrać (walidacja niemożliwa).
+    """
+    try:
+        catalogue = await get_voice_catalogue(provider)
+    except Exception as e:
+        logger.warning(
+            "Katalog głosów niedostępny — pomijam walidację", provider=provider, error=str(e)
+        )
+        return None
+    return voice_id in catalogue.voice_ids
@@ -0,0 +1,152 @@
+"""
+Content-addressed storage artefaktów wideo (narracja, render).
+
+store_file liczy SHA-256 pliku i szuka bloba w lokalnym indeksie
+(tabela stored_blobs), a dopiero potem HEAD-em w S3. Upload następuje tylko
+dla nowej treści. Wideo wskazuje bloby przez BlobReference (jedna referencja
+na rolę) — ponowna generacja podmienia referencję, a blob bez referencji
+sprząta collect_unreferenced_blobs po okresie karencji.
+"""
+
+import asyncio
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import structlog
+from sqlalchemy import delete, exists, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.stored_blob import BlobReference, StoredBlob
+from app.services.video.storage import AsyncStorageService
+
+logger = structlog.get_logger()
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def store_file(
+    db: AsyncSession,
+    storage: AsyncStorageService,
+    local_path: str,
+    *,
+    video_id: uuid.UUID,
+    role: str,
+    content_type: str | None = None,
+) -> str:
+    """Zapisuje plik pod kluczem z SHA-256 (bez uploadu, gdy treść już jest) i zwraca URL."""
+    sha256 = await asyncio.to_thread(file_sha256, local_path)
+    content_type = content_type or storage.guess_content_type(local_path)
+
+    blob = await _get_or_upload_blob(db, storage, local_path, sha256, content_type)
+
+    # Jedna referencja na (wideo, rola) — regeneracja podmienia blob
+    ref = await db.scalar(
+        select(BlobReference).where(
+            BlobReference.video_id == video_id, BlobReference.role == role
+        )
+    )
+    if ref is None:
+        db.add(BlobReference(blob_id=blob.id, video_id=video_id, role=role))
+    elif ref.blob_id != blob.id:
+        await _touch(db, ref.blob_id)  # poprzedni blob: karencja liczy się od teraz
+        ref.blob_id = blob.id
+    await db.flush()
+    return storage.public_url(blob.storage_key)
+
+
+async def _get_or_upload_blob(
+    db: AsyncSession,
+    storage: AsyncStorageService,
+    local_path: str,
+    sha256: str,
+    content_type: str,
+) -> StoredBlob:
+    blob = await db.scalar(select(StoredBlob).where(StoredBlob.sha256 == sha256))
+    if blob is not None:
+        # Odświeżony updated_at chroni blob przed GC w trakcie dopisywania referencji
+        await _touch(db, blob.id)
+        logger.info("CAS: treść już zapisana, upload pominięty", sha256=sha256[:12])
+        return blob
+
+    extension = Path(local_path).suffix.lstrip(".") or "bin"
+    key = storage.content_key(sha256, extension)
+    if await storage.exists(key):
+        logger.info("CAS: obiekt w S3 bez wpisu w indeksie", key=key)
+    else:
+        await storage.upload_file(local_path, key, content_type)
+
+    blob = StoredBlob(
+        sha256=sha256,
+        storage_key=key,
+        content_type=content_type,
+        size_bytes=Path(local_path).stat().st_size,
+    )
+    try:
+        async with db.begin_nested():
+            db.add(blob)
+    except IntegrityError:
+        # Inny worker zapisał ten sam blob równolegle
+        blob = await db.scalar(select(StoredBlob).where(StoredBlob.sha256 == sha256))
+    return blob
+
+
+async def _touch(db: AsyncSession, blob_id: uuid.UUID) -> None:
+    await db.execute(
+        update(StoredBlob)
+        .where(StoredBlob.id == blob_id)
+        .values(updated_at=datetime.now(timezone.utc))
+    )
+
+
+async def collect_unreferenced_blobs(
+    db: AsyncSession,
+    storage: AsyncStorageService,
+    *,
+    grace_hours: int,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Usuwa bloby bez referencji, nieużywane dłużej niż grace_hours.
+    Najpierw wiersze (DELETE … RETURNING, warunek sprawdzany atomowo w bazie),
+    potem obiekty S3 — blob nie zniknie spod referencji dodanej w międzyczasie.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=grace_hours)
+    unreferenced = (
+        ~exists().where(BlobReference.blob_id == StoredBlob.id),
+        StoredBlob.updated_at < cutoff,
+    )
+
+    if dry_run:
+        query = select(StoredBlob.storage_key, StoredBlob.size_bytes).where(*unreferenced)
+        rows = (await db.execute(query)).all()
+    else:
+        rows = (
+            await db.execute(
+                delete(StoredBlob)
+                .where(*unreferenced)
+                .returning(StoredBlob.storage_key, StoredBlob.size_bytes)
+            )
+        ).all()
+        await db.commit()
+        for key, _ in rows:
+            try:
+                await storage.delete_file(key)
+            except Exception as e:
+                logger.warning("CAS GC: usunięcie obiektu nieudane", key=key, error=str(e))
+
+    stats = {
+        "blobs": len(rows),
+        "bytes": sum(size for _, size in rows),
+        "dry_run": dry_run,
+    }
+    logger.info("CAS GC", **stats)
+    return stats
@@ -0,0 +1,168 @@
+"""
+Cache klipów stockowych w formacie mezzanine.
+
+Klip z Pexels jest transkodowany raz: 1080x1920 (cover + crop), stałe FPS,
+H.264 z krótkim GOP (keyframe co pół sekundy), bez audio. Render tylko tnie
+i skleja takie pliki (concat demuxer), a jedyne kodowanie to finalny przebieg
+z napisami — zamiast dekodowania i skalowania źródła 4K przy każdym renderze.
+
+Pliki leżą w CLIP_CACHE_DIR pod hashem URL-a; mtime = ostatnie użycie.
+Po każdym dopisaniu najdawniej używane klipy są usuwane ponad CLIP_CACHE_MAX_BYTES.
+Zapis przez plik tymczasowy + rename, więc równoległe workery nie widzą
+niedokończonych plików (najwyżej zdublują transkodowanie).
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+import structlog
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+
+@dataclass(frozen=True)
+class CachedClip:
+    path: str
+    duration: float
+
+
+class ClipCache:
+    """Lokalny cache klipów mezzanine z eksmisją wg ostatniego użycia."""
+
+    def __init__(self, cache_dir: str | None = None, max_bytes: int | None = None):
+        self.dir = Path(cache_dir or settings.CLIP_CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.CLIP_CACHE_MAX_BYTES
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self._semaphore = asyncio.Semaphore(settings.CLIP_TRANSCODE_CONCURRENCY)
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode()).hexdigest()[:32]
+        return self.dir / f"{key}.mp4", self.dir / f"{key}.json"
+
+    async def get(self, client: httpx.AsyncClient, url: str) -> CachedClip:
+        """Klip mezzanine dla URL-a — z cache albo pobrany i przetranskodowany."""
+        clip_path, meta_path = self._paths(url)
+        if clip_path.exists() and meta_path.exists():
+            os.utime(clip_path)
+            logger.debug("Clip cache hit", url=url)
+            return CachedClip(str(clip_path), json.loads(meta_path.read_text())["duration"])
+
+        async with self._semaphore:
+            duration = await self._fetch_and_transcode(client, url, clip_path, meta_path)
+        await asyncio.to_thread(self.evict)
+        return CachedClip(str(clip_path), duration)
+
+    async def _fetch_and_transcode(
+        self, client: httpx.AsyncClient, url: str, clip_path: Path, meta_path: Path
+    ) -> float:
+        from app.services.analytics.ledger import track_call
+        from app.services.video.renderer import VideoRenderer
+
+        fd, source = tempfile.mkstemp(dir=self.dir, suffix=".src")
+        os.close(fd)
+        # Unikalna nazwa — dwa workery transkodujące ten sam URL nie piszą do jednego pliku
+        fd, tmp = tempfile.mkstemp(dir=self.dir, suffix=".tmp.mp4")
+        os.close(fd)
+        tmp_clip = Path(tmp)
+        try:
+            with track_call("pexels", "download_video") as call:
+                async with client.stream("GET", url) as resp:
+                    resp.raise_for_status()
+                    with open(source, "wb") as f:
+                        async for chunk in resp.aiter_bytes(1 << 20):
+                            f.write(chunk)
+                call.payload_bytes = os.path.getsize(source)
+
+            w, h, fps = VideoRenderer.OUTPUT_WIDTH, VideoRenderer.OUTPUT_HEIGHT, VideoRenderer.FPS
+            await run_ffmpeg(
+                settings.FFMPEG_PATH,
+                "-y",
+                "-i", source,
+                "-an",
+                "-vf", (
+                    f"scale={w}:{h}:force_original_aspect_ratio=increase,"
+                    f"crop={w}:{h},setsar=1,fps={fps}"
+                ),
+                "-c:v", "libx264",
+                "-preset", "veryfast",
+                "-crf", "18",
+                "-g", str(fps // 2),
+                "-keyint_min", str(fps // 2),
+                "-sc_threshold", "0",
+                "-pix_fmt", "yuv420p",
+                "-movflags", "+faststart",
+                str(tmp_clip),
+            )
+            duration = await probe_duration(str(tmp_clip))
+            os.replace(tmp_clip, clip_path)
+            meta_path.write_text(json.dumps({"url": url, "duration": duration}))
+        finally:
+            for leftover in (source, tmp_clip):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(leftover)
+
+        logger.info(
+            "Klip w cache",
+            url=url,
+            duration=round(duration, 2),
+            size_mb=round(clip_path.stat().st_size / 1_048_576, 1),
+        )
+        return duration
+
+    def evict(self) -> int:
+        """Usuwa najdawniej używane klipy ponad limit rozmiaru. Zwraca liczbę usuniętych."""
+        clips = []
+        for path in self.dir.glob("*.mp4"):
+            if path.name.endswith(".tmp.mp4"):
+                continue
+            with contextlib.suppress(FileNotFoundError):
+                stat = path.stat()
+                clips.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in clips)
+        removed = 0
+        for _, size, path in sorted(clips, key=lambda c: c[0]):
+            if total <= self.max_bytes:
+                break
+            for stale in (path, path.with_suffix(".json")):
+                with contextlib.suppress(FileNotFoundError):
+                    stale.unlink()
+            total -= size
+            removed += 1
+
+        if removed:
+            logger.info("Clip cache: eksmisja", removed=removed, size_mb=total // 1_048_576)
+        return removed
+
+
+async def probe_duration(path: str) -> float:
+    stdout = await run_ffmpeg(
+        settings.FFPROBE_PATH,
+        "-v", "quiet",
+        "-show_entries", "format=duration",
+        "-of", "json",
+        path,
+    )
+    return float(json.loads(stdout)["format"]["duration"])
+
+
+async def run_ffmpeg(*cmd: str) -> str:
+    """Uruchamia FFmpeg/FFprobe bez blokowania pętli zdarzeń."""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await proc.communicate()
+    if proc.returncode != 0:
+        logger.error("FFmpeg błąd", cmd=cmd[0], stderr=stderr.decode(errors="replace")[:500])
+        raise RuntimeError(f"{Path(cmd[0]).name} failed: {stderr.decode(errors='replace')[:200]}")
+    return stdout.decode()
@@ -0,0 +1,163 @@
+"""
+Lokalny backend storage — katalog na dysku zamiast S3/MinIO (jeden węzeł, CI).
+
+Pliki leżą pod {LOCAL_STORAGE_DIR}/{bucket}/{key}, a URL-e mają postać
+{LOCAL_STORAGE_PUBLIC_URL}/{bucket}/{key} — ten sam kontrakt co S3, więc
+key_from_url, CAS i GC działają bez zmian. Pliki serwuje route /media
+(app/api/media.py) z obsługą nagłówka Range.
+
+Upload nie kopiuje danych: artefakt z katalogu roboczego trafia do magazynu
+jako hardlink, a na innym systemie plików jako reflink (FICLONE — btrfs, XFS).
+Kopia jest tylko ostatecznym fallbackiem. Źródło zostaje na miejscu (audio
+jest jeszcze potrzebne do renderu), a zapis idzie przez plik tymczasowy
++ os.replace, więc czytelnik nigdy nie widzi połowy pliku.
+"""
+
+import contextlib
+import errno
+import os
+import shutil
+import tempfile
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from pathlib import Path
+
+import structlog
+
+logger = structlog.get_logger()
+
+_FICLONE = 0x40049409  # ioctl linux/fs.h
+_PAGE_SIZE = 1000  # jak list_objects_v2
+_TMP_SUFFIX = ".part"
+
+
+class LocalFileStore:
+    """Obiekty bucketu jako pliki w katalogu; klucze jak w S3 (a/b/c.mp4)."""
+
+    def __init__(self, root: str, bucket: str):
+        self.root = (Path(root) / bucket).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        """Ścieżka pliku dla klucza; ValueError dla kluczy wychodzących poza bucket."""
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root) or path == self.root:
+            raise ValueError(f"Niepoprawny klucz: {key!r}")
+        return path
+
+    def upload_file(self, local_path: str, key: str) -> str:
+        """Umieszcza plik pod kluczem bez kopiowania, gdy to możliwe. Zwraca użytą metodę."""
+        target = self.path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(f".{target.name}.{os.getpid()}{_TMP_SUFFIX}")
+        with contextlib.suppress(FileNotFoundError):
+            tmp.unlink()
+        try:
+            method = _link_or_clone(local_path, tmp)
+            os.replace(tmp, target)
+        finally:
+            # rename() na dowiązanie do tego samego i-węzła nic nie robi — sprzątamy tmp
+            with contextlib.suppress(FileNotFoundError):
+                tmp.unlink()
+        if method == "copy":
+            logger.warning(
+                "Lokalny storage: hardlink i reflink niedostępne, plik skopiowany",
+                key=key,
+                source=local_path,
+            )
+        return method
+
+    def write_bytes(self, data: bytes, key: str) -> None:
+        target = self.path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".", suffix=_TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, target)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp)
+            raise
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).is_file()
+
+    def delete(self, key: str) -> None:
+        with contextlib.suppress(FileNotFoundError):
+            self.path(key).unlink()
+
+    def list_pages(
+        self, Prefix: str = "", Delimiter: str | None = None  # noqa: N803 — jak list_objects_v2
+    ) -> Iterator[dict]:
+        """Listing w formacie stron list_objects_v2 (Contents / CommonPrefixes)."""
+        entries = self._common_prefixes(Prefix) if Delimiter == "/" else self._objects(Prefix)
+        page: list[dict] = []
+        field = "CommonPrefixes" if Delimiter == "/" else "Contents"
+        for entry in entries:
+            page.append(entry)
+            if len(page) >= _PAGE_SIZE:
+                yield {field: page}
+                page = []
+        if page:
+            yield {field: page}
+
+    def _common_prefixes(self, prefix: str) -> Iterator[dict]:
+        directory = self.root / prefix
+        if not prefix.endswith("/") or not directory.is_dir():
+            return
+        for child in sorted(directory.iterdir()):
+            if child.is_dir():
+                yield {"Prefix": f"{prefix}{child.name}/"}
+
+    def _objects(self, prefix: str) -> Iterator[dict]:
+        directory = self.root / prefix.rpartition("/")[0]
+        if not directory.is_dir():
+            return
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name.endswith(_TMP_SUFFIX):
+                    continue
+                path = Path(dirpath) / name
+                key = path.relative_to(self.root).as_posix()
+                if not key.startswith(prefix):
+                    continue
+                with contextlib.suppress(FileNotFoundError):
+                    stat = path.stat()
+                    yield {
+                        "Key": key,
+                        "Size": stat.st_size,
+                        "LastModified": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc),
+                    }
+
+
+def _link_or_clone(source: str, target: Path) -> str:
+    """Hardlink → reflink → kopia. Zwraca nazwę użytej metody."""
+    try:
+        os.link(source, target)
+        return "hardlink"
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+
+    if _reflink(source, target):
+        return "reflink"
+    shutil.copyfile(source, target)
+    return "copy"
+
+
+def _reflink(source: str, target: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:  # poza Linuksem
+        return False
+
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+            return True
+        except OSError:
+            pass
+    target.unlink()
+    return False
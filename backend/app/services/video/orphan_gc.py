@@ -0,0 +1,202 @@
+"""
+GC osieroconych artefaktów w S3 (audio/{series_id}/…, videos/{series_id}/…).
+
+Nieudane pipeline'y, regeneracje i usunięte serie zostawiają w buckecie
+pliki, do których nie prowadzi żaden Video.voice_url / video_url.
+
+Przebieg jest strumieniowy: prefiksy serii listujemy stronami (Delimiter="/"),
+dla każdej paczki serii jednym zapytaniem pobieramy żywe klucze, a obiekty
+serii porównujemy z tym zbiorem strona po stronie — w pamięci jest tylko
+zbiór referencji jednej paczki serii i bieżąca strona listingu.
+
+Obiekt jest usuwany, gdy nie ma referencji i jest starszy niż okres karencji
+(chroni pliki właśnie wgrywanych wideo). Serie usunięte (soft-delete) dawniej
+niż okres karencji traktujemy jak brak referencji. Referencja, której URL-a
+nie da się zamienić na klucz (np. po zmianie S3_PUBLIC_BASE_URL), chroni całą
+serię — lepiej zostawić śmieci niż skasować żywy plik; takie serie są
+liczone w raporcie (series_kept, unparseable_refs). Kasowanie przez
+DeleteObjects w paczkach po 1000 kluczy; dry-run tylko raportuje.
+Backend lokalny (STORAGE_BACKEND="local") daje ten sam format listingu.
+"""
+
+import asyncio
+import uuid
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+import structlog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.video.storage import StorageService
+
+logger = structlog.get_logger()
+
+ARTIFACT_PREFIXES = ("audio/", "videos/")
+_DELETE_BATCH = 1000  # limit DeleteObjects
+_SERIES_BATCH = 200
+_SAMPLE_KEYS = 20
+
+
+@dataclass
+class OrphanReport:
+    dry_run: bool
+    series_scanned: int = 0
+    objects_scanned: int = 0
+    orphans: int = 0
+    orphan_bytes: int = 0
+    deleted: int = 0
+    errors: int = 0
+    series_kept: int = 0
+    unparseable_refs: int = 0
+    sample: list[str] = field(default_factory=list)
+
+
+def _list_pages(storage: StorageService, **kwargs) -> Iterator[dict]:
+    if storage.local:
+        yield from storage.local.list_pages(**kwargs)
+        return
+    paginator = storage.s3.get_paginator("list_objects_v2")
+    yield from paginator.paginate(Bucket=storage.bucket, **kwargs)
+
+
+async def _pages(storage: StorageService, **kwargs) -> AsyncIterator[dict]:
+    """Strony listingu S3 pobierane kolejno w wątku (boto3 jest synchroniczne)."""
+    pages = _list_pages(storage, **kwargs)
+    while (page := await asyncio.to_thread(next, pages, None)) is not None:
+        yield page
+
+
+async def _series_batches(
+    storage: StorageService, root: str
+) -> AsyncIterator[list[tuple[str, uuid.UUID]]]:
+    """Paczki (prefiks, series_id) spod root; prefiksy spoza układu {uuid}/ są pomijane."""
+    batch: list[tuple[str, uuid.UUID]] = []
+    async for page in _pages(storage, Prefix=root, Delimiter="/"):
+        for common in page.get("CommonPrefixes", []):
+            series_id = _parse_series_id(common["Prefix"], root)
+            if series_id is None:
+                logger.warning("Storage GC: nieznany prefiks, pomijam", prefix=common["Prefix"])
+                continue
+            batch.append((common["Prefix"], series_id))
+            if len(batch) >= _SERIES_BATCH:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _delete_batch(storage: StorageService, keys: list[str]) -> int:
+    """DeleteObjects dla ≤1000 kluczy; zwraca liczbę błędów."""
+    if storage.local:
+        for key in keys:
+            storage.local.delete(key)
+        return 0
+    resp = storage.s3.delete_objects(
+        Bucket=storage.bucket,
+        Delete={"Objects": [{"Key": k} for k in keys], "Quiet": True},
+    )
+    errors = resp.get("Errors", [])
+    for err in errors[:5]:
+        logger.warning("Storage GC: błąd usuwania", key=err.get("Key"), code=err.get("Code"))
+    return len(errors)
+
+
+async def _live_keys(
+    db: AsyncSession,
+    storage: StorageService,
+    series_ids: list[uuid.UUID],
+    deleted_before: datetime,
+    report: OrphanReport,
+) -> tuple[set[str], set[uuid.UUID]]:
+    """
+    Klucze artefaktów, do których prowadzą wideo z paczki serii (bez serii dawno
+    usuniętych), oraz serie z referencjami nie do sparsowania — te GC pomija w całości.
+    """
+    from app.models.series import Series
+    from app.models.video import Video
+
+    result = await db.stream(
+        select(Video.series_id, Video.voice_url, Video.video_url, Video.thumbnail_url)
+        .join(Series, Video.series_id == Series.id)
+        .where(
+            Series.id.in_(series_ids),
+            Series.deleted_at.is_(None) | (Series.deleted_at >= deleted_before),
+        )
+    )
+    keys: set[str] = set()
+    kept: set[uuid.UUID] = set()
+    async for series_id, *urls in result:
+        for url in filter(None, urls):
+            if key := storage.key_from_url(url):
+                keys.add(key)
+                continue
+            report.unparseable_refs += 1
+            if series_id not in kept:
+                kept.add(series_id)
+                logger.warning(
+                    "Storage GC: URL spoza storage, seria pominięta",
+                    series_id=str(series_id),
+                    url=url,
+                )
+    return keys, kept
+
+
+async def collect_orphaned_artifacts(
+    db: AsyncSession, storage: StorageService, *, grace_hours: int, dry_run: bool = True
+) -> OrphanReport:
+    report = OrphanReport(dry_run=dry_run)
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=grace_hours)
+    pending: list[str] = []
+
+    async def flush(force: bool = False) -> None:
+        while pending and (force or len(pending) >= _DELETE_BATCH):
+            batch, pending[:] = pending[:_DELETE_BATCH], pending[_DELETE_BATCH:]
+            if dry_run:
+                continue
+            errors = await asyncio.to_thread(_delete_batch, storage, batch)
+            report.errors += errors
+            report.deleted += len(batch) - errors
+
+    for root in ARTIFACT_PREFIXES:
+        async for batch in _series_batches(storage, root):
+            live, kept = await _live_keys(db, storage, [sid for _, sid in batch], cutoff, report)
+            for prefix, series_id in batch:
+                report.series_scanned += 1
+                if series_id in kept:
+                    report.series_kept += 1
+                    continue
+                async for page in _pages(storage, Prefix=prefix):
+                    for obj in page.get("Contents", []):
+                        report.objects_scanned += 1
+                        if obj["Key"] in live or obj["LastModified"] >= cutoff:
+                            continue
+                        report.orphans += 1
+                        report.orphan_bytes += obj.get("Size", 0)
+                        if len(report.sample) < _SAMPLE_KEYS:
+                            report.sample.append(obj["Key"])
+                        pending.append(obj["Key"])
+                    await flush()
+    await flush(force=True)
+
+    logger.info(
+        "Storage GC: osierocone artefakty",
+        dry_run=dry_run,
+        series=report.series_scanned,
+        objects=report.objects_scanned,
+        orphans=report.orphans,
+        orphan_mb=round(report.orphan_bytes / 1_048_576, 1),
+        deleted=report.deleted,
+        errors=report.errors,
+        series_kept=report.series_kept,
+        unparseable_refs=report.unparseable_refs,
+    )
+    return report
+
+
+def _parse_series_id(prefix: str, root: str) -> uuid.UUID | None:
+    try:
+        return uuid.UUID(prefix[len(root) :].rstrip("/"))
+    except ValueError:
+        return None
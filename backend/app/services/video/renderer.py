@@ -7,10 +7,12 @@ Pipeline:
   3. Złóż audio + video + napisy -> finalny MP4
 """
 
+import asyncio
 import json
 import os
 import subprocess
 import tempfile
+from itertools import accumulate
 from pathlib import Path
 
 import structlog
@@ -59,7 +61,11 @@ class VideoRenderer:
         self._generate_srt(scenes, srt_path, audio_duration)
 
         # 3. Przygotuj concat list z obrazów (każdy obraz = fragment czasu)
-        concat_path = await self._prepare_scene_images(scenes, audio_duration)
+        #    albo z klipów mezzanine, gdy seria używa klipów wideo
+        if style.get("use_video_clips") and any(s.get("clip_url") for s in scenes):
+            concat_path = await self._prepare_scene_clips(scenes, audio_duration)
+        else:
+            concat_path = await self._prepare_scene_images(scenes, audio_duration)
 
         # 4. Złóż wideo
         output_path = os.path.join(self.work_dir, "output.mp4")
@@ -88,6 +94,46 @@ class VideoRenderer:
         data = json.loads(result.stdout)
         return float(data["format"]["duration"])
 
+    async def concat_audio(self, audio_paths: list[str], output_path: str) -> list[float]:
+        """
+        Łączy segmenty audio (np. TTS per scena) w jedną narrację MP3.
+        Zwraca czasy trwania kolejnych segmentów (do synchronizacji scen).
+        """
+        durations = [await self._get_audio_duration(path) for path in audio_paths]
+
+        list_path = os.path.join(self.work_dir, "audio_concat.txt")
+        Path(list_path).write_text(
+            "\n".join(f"file '{path}'" for path in audio_paths), encoding="utf-8"
+        )
+        cmd = [
+            settings.FFMPEG_PATH,
+            "-y",
+            "-f", "concat", "-safe", "0",
+            "-i", list_path,
+            "-c:a", "libmp3lame",
+            "-b:a", "192k",
+            output_path,
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+        if result.returncode != 0:
+            logger.error("FFmpeg concat audio błąd", stderr=result.stderr[:500])
+            raise RuntimeError(f"FFmpeg audio concat failed: {result.stderr[:200]}")
+        return durations
+
+    @staticmethod
+    def _scene_durations(scenes: list[dict], total_duration: float) -> list[float]:
+        """
+        Czas trwania każdej sceny. Gdy sceny mają własne audio (TTS per scena),
+        czasy są proporcjonalne do "audio_duration"; inaczej równy podział.
+        """
+        if not scenes:
+            return []
+        measured = [scene.get("audio_duration") for scene in scenes]
+        if all(isinstance(d, int | float) and d > 0 for d in measured):
+            scale = total_duration / sum(measured)
+            return [d * scale for d in measured]
+        return [total_duration / len(scenes)] * len(scenes)
+
     def _generate_srt(self, scenes: list[dict], srt_path: str, total_duration: float):
         """Generuje plik napisów SRT z tekstu scen."""
         num_scenes = len(scenes)
@@ -95,12 +141,13 @@ class VideoRenderer:
             Path(srt_path).write_text("")
             return
 
-        scene_duration = total_duration / num_scenes
+        durations = self._scene_durations(scenes, total_duration)
+        offsets = list(accumulate(durations, initial=0.0))
 
         lines = []
         for i, scene in enumerate(scenes):
-            start = i * scene_duration
-            end = min((i + 1) * scene_duration, total_duration)
+            start = offsets[i]
+            end = min(offsets[i + 1], total_duration)
             text = scene.get("text", "").strip()
             if not text:
                 continue
@@ -130,35 +177,13 @@ class VideoRenderer:
         Przygotowuje listę concat z obrazami scen.
         Każdy obraz pobieramy i skalujemy do 1080x1920.
         """
-        import httpx
-
         concat_lines = []
-        num_scenes = max(len(scenes), 1)
-        scene_duration = total_duration / num_scenes
+        durations = self._scene_durations(scenes, total_duration)
 
         for i, scene in enumerate(scenes):
-            media_url = scene.get("media_url")
-            img_path = os.path.join(self.work_dir, f"scene_{i}.jpg")
-
-            if media_url:
-                try:
-                    async with httpx.AsyncClient(timeout=30.0) as client:
-                        resp = await client.get(media_url)
-                        if resp.status_code == 200:
-                            Path(img_path).write_bytes(resp.content)
-                        else:
-                            self._create_placeholder(img_path, scene.get("text", ""))
-                except Exception:
-                    self._create_placeholder(img_path, scene.get("text", ""))
-            else:
-                self._create_placeholder(img_path, scene.get("text", ""))
-
-            # Skaluj obraz do 1080x1920
-            scaled_path = os.path.join(self.work_dir, f"scene_{i}_scaled.jpg")
-            self._scale_image(img_path, scaled_path)
-
+            scaled_path = await self._scene_image(i, scene)
             concat_lines.append(f"file '{scaled_path}'")
-            concat_lines.append(f"duration {scene_duration:.3f}")
+            concat_lines.append(f"duration {durations[i]:.3f}")
 
         # Powtórz ostatni frame (wymóg FFmpeg concat)
         if concat_lines:
@@ -169,6 +194,100 @@ class VideoRenderer:
         Path(concat_path).write_text("\n".join(concat_lines), encoding="utf-8")
         return concat_path
 
+    async def _scene_image(self, i: int, scene: dict) -> str:
+        """Pobiera obraz sceny (albo placeholder) i zwraca ścieżkę wersji 1080x1920."""
+        import httpx
+
+        from app.core.http_replay import replay_transport
+
+        media_url = scene.get("media_url")
+        img_path = os.path.join(self.work_dir, f"scene_{i}.jpg")
+
+        if media_url:
+            try:
+                async with httpx.AsyncClient(
+                    timeout=30.0, transport=replay_transport("stock_media")
+                ) as client:
+                    resp = await client.get(media_url)
+                    if resp.status_code == 200:
+                        Path(img_path).write_bytes(resp.content)
+                    else:
+                        self._create_placeholder(img_path, scene.get("text", ""))
+            except Exception:
+                self._create_placeholder(img_path, scene.get("text", ""))
+        else:
+            self._create_placeholder(img_path, scene.get("text", ""))
+
+        # Skaluj obraz do 1080x1920
+        scaled_path = os.path.join(self.work_dir, f"scene_{i}_scaled.jpg")
+        self._scale_image(img_path, scaled_path)
+        return scaled_path
+
+    async def _prepare_scene_clips(self, scenes: list[dict], total_duration: float) -> str:
+        """
+        Lista concat z klipów mezzanine (ClipCache). Sceny bez klipu dostają
+        krótki klip ze zdjęcia w tym samym formacie. Klipy są tylko przycinane
+        (outpoint) lub powtarzane — jedyne kodowanie to finalny przebieg.
+        """
+        import httpx
+
+        from app.core.http_replay import replay_transport
+        from app.services.video.clip_cache import ClipCache
+
+        cache = ClipCache()
+        durations = self._scene_durations(scenes, total_duration)
+
+        async with httpx.AsyncClient(
+            timeout=60.0, follow_redirects=True, transport=replay_transport("stock_media")
+        ) as client:
+            # Ten sam klip w kilku scenach — jedno pobranie i transkodowanie
+            in_flight: dict[str, asyncio.Task] = {}
+
+            def fetch(url: str) -> asyncio.Task:
+                if url not in in_flight:
+                    in_flight[url] = asyncio.ensure_future(cache.get(client, url))
+                return in_flight[url]
+
+            async def segment(i: int, scene: dict):
+                if scene.get("clip_url"):
+                    try:
+                        return await fetch(scene["clip_url"])
+                    except Exception as e:
+                        logger.warning("Klip niedostępny, zdjęcie", scene=i, error=str(e))
+                return await self._still_clip(i, scene, durations[i])
+
+            clips = await asyncio.gather(*(segment(i, s) for i, s in enumerate(scenes)))
+
+        concat_lines: list[str] = []
+        for clip, duration in zip(clips, durations, strict=True):
+            concat_lines.extend(_trim_entries(clip.path, clip.duration, duration))
+
+        concat_path = os.path.join(self.work_dir, "concat.txt")
+        Path(concat_path).write_text("\n".join(concat_lines), encoding="utf-8")
+        return concat_path
+
+    async def _still_clip(self, i: int, scene: dict, duration: float):
+        """Zdjęcie sceny jako klip w formacie mezzanine (zgodny z ClipCache)."""
+        from app.services.video.clip_cache import CachedClip, probe_duration, run_ffmpeg
+
+        image_path = await self._scene_image(i, scene)
+        clip_path = os.path.join(self.work_dir, f"scene_{i}.mp4")
+        await run_ffmpeg(
+            settings.FFMPEG_PATH,
+            "-y",
+            "-loop", "1",
+            "-i", image_path,
+            "-t", f"{duration:.3f}",
+            "-vf", f"fps={self.FPS},setsar=1",
+            "-c:v", "libx264",
+            "-preset", "ultrafast",
+            "-tune", "stillimage",
+            "-g", str(self.FPS // 2),
+            "-pix_fmt", "yuv420p",
+            clip_path,
+        )
+        return CachedClip(clip_path, await probe_duration(clip_path))
+
     def _create_placeholder(self, path: str, text: str):
         """Tworzy placeholderowy obraz z tekstem."""
         try:
@@ -197,7 +316,19 @@ class VideoRenderer:
             Path(path).write_bytes(b"")
 
     def _scale_image(self, input_path: str, output_path: str):
-        """Skaluje obraz do 1080x1920 z crop/pad."""
+        """
+        Skaluje obraz do 1080x1920 z crop. Pillow dekoduje JPEG w trybie draft
+        (mniej pamięci i CPU niż pełny dekod w FFmpeg); FFmpeg jako fallback.
+        """
+        try:
+            from app.services.media.images import fit_to_frame
+
+            frame = fit_to_frame(input_path, (self.OUTPUT_WIDTH, self.OUTPUT_HEIGHT))
+            frame.save(output_path, "JPEG", quality=92)
+            return
+        except Exception as e:
+            logger.debug("Pillow nie zdekodował obrazu, FFmpeg", path=input_path, error=str(e))
+
         cmd = [
             settings.FFMPEG_PATH,
             "-y",
@@ -279,3 +410,16 @@ class VideoRenderer:
         secs = int(seconds % 60)
         millis = int((seconds % 1) * 1000)
         return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+
+
+def _trim_entries(path: str, clip_duration: float, duration: float) -> list[str]:
+    """Wpisy concat pokrywające duration: klip powtarzany, ostatni przycięty (outpoint)."""
+    entries: list[str] = []
+    remaining = duration
+    while remaining > 0.01:
+        take = min(remaining, clip_duration) if clip_duration > 0 else remaining
+        entries.append(f"file '{path}'")
+        if take < clip_duration:
+            entries.append(f"outpoint {take:.3f}")
+        remaining -= take
+    return entries
@@ -1,69 +1,141 @@
 """
 Serwis przechowywania plików — S3/MinIO.
 Ulepszenie: presigned URLs + automatyczne wykrywanie content-type.
+
+Klient boto3 jest jeden na proces (thread-safe, własna pula połączeń) —
+tworzenie klienta kosztuje kilkadziesiąt ms i osobną pulę przy każdym
+StorageService(). Kod async używa AsyncStorageService: te same metody,
+wywołania boto3 idą do wspólnej, ograniczonej puli wątków
+(S3_UPLOAD_CONCURRENCY), więc upload wielu MB nie blokuje pętli zdarzeń.
+
+STORAGE_BACKEND="local" podmienia S3 na katalog na dysku (LocalFileStore) —
+te same klucze i URL-e {base}/{bucket}/{key}, upload bez kopiowania danych.
 """
 
+import asyncio
+import contextvars
+import functools
 import os
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import BinaryIO
 
 import boto3
 import structlog
 from botocore.config import Config
 
 from app.core.config import get_settings
+from app.services.analytics.ledger import track_call
+from app.services.video import transfer
+from app.services.video.local_storage import LocalFileStore
 
 settings = get_settings()
 logger = structlog.get_logger()
 
 
+_lock = threading.Lock()
+_clients: dict[int, object] = {}
+_executors: dict[int, ThreadPoolExecutor] = {}
+
+
+def get_s3_client():
+    """Wspólny klient S3 procesu (osobny po fork — np. worker Celery prefork)."""
+    pid = os.getpid()
+    client = _clients.get(pid)
+    if client is None:
+        with _lock:
+            client = _clients.get(pid)
+            if client is None:
+                kwargs = {
+                    "aws_access_key_id": settings.S3_ACCESS_KEY,
+                    "aws_secret_access_key": settings.S3_SECRET_KEY,
+                    "region_name": settings.S3_REGION,
+                    "config": Config(
+                        signature_version="s3v4",
+                        max_pool_connections=settings.S3_MAX_POOL_CONNECTIONS,
+                    ),
+                }
+                if settings.S3_ENDPOINT_URL:
+                    kwargs["endpoint_url"] = settings.S3_ENDPOINT_URL
+                client = _clients[pid] = boto3.client("s3", **kwargs)
+    return client
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    pid = os.getpid()
+    executor = _executors.get(pid)
+    if executor is None:
+        with _lock:
+            executor = _executors.get(pid)
+            if executor is None:
+                executor = _executors[pid] = ThreadPoolExecutor(
+                    max_workers=settings.S3_UPLOAD_CONCURRENCY, thread_name_prefix="s3"
+                )
+    return executor
+
+
 class StorageService:
     def __init__(self):
         self.bucket = settings.S3_BUCKET_NAME
-        kwargs = {
-            "aws_access_key_id": settings.S3_ACCESS_KEY,
-            "aws_secret_access_key": settings.S3_SECRET_KEY,
-            "region_name": settings.S3_REGION,
-            "config": Config(signature_version="s3v4"),
-        }
-        if settings.S3_ENDPOINT_URL:
-            kwargs["endpoint_url"] = settings.S3_ENDPOINT_URL
+        if settings.STORAGE_BACKEND == "local":
+            self.local = LocalFileStore(settings.LOCAL_STORAGE_DIR, self.bucket)
+            self.s3 = None
+        else:
+            self.local = None
+            self.s3 = get_s3_client()
 
-        self.s3 = boto3.client("s3", **kwargs)
+    def upload_file(
+        self,
+        local_path: str,
+        key: str,
+        content_type: str | None = None,
+        resumable: bool = True,
+    ) -> str:
+        """
+        Uploaduje plik do S3 i zwraca publiczny URL dostępny dla przeglądarki.
+        resumable=False dla kluczy jednorazowych (generate_key) — patrz transfer.upload_file.
+        """
+        ct = content_type or self.guess_content_type(local_path)
 
-    def upload_file(self, local_path: str, key: str, content_type: str | None = None) -> str:
-        """Uploaduje plik do S3 i zwraca publiczny URL dostępny dla przeglądarki."""
-        ct = content_type or self._guess_content_type(local_path)
+        if self.local:
+            method = self.local.upload_file(local_path, key)
+            logger.info("Zapis do lokalnego storage", key=key, method=method)
+            return self.public_url(key)
 
         logger.info("Upload do S3", key=key, content_type=ct)
 
-        self.s3.upload_file(
-            local_path,
-            self.bucket,
-            key,
-            ExtraArgs={"ContentType": ct},
-        )
+        with track_call("s3", "upload_file", payload_bytes=os.path.getsize(local_path)):
+            transfer.upload_file(self.s3, self.bucket, local_path, key, ct, resumable=resumable)
 
-        return self._public_url(key)
+        return self.public_url(key)
 
     def upload_bytes(self, data: bytes, key: str, content_type: str = "application/octet-stream") -> str:
         """Uploaduje bajty do S3 i zwraca publiczny URL."""
         import io
 
-        self.s3.upload_fileobj(io.BytesIO(data), self.bucket, key, ExtraArgs={"ContentType": content_type})
+        if self.local:
+            self.local.write_bytes(data, key)
+            return self.public_url(key)
+
+        with track_call("s3", "upload_bytes", payload_bytes=len(data)):
+            self.s3.upload_fileobj(
+                io.BytesIO(data), self.bucket, key, ExtraArgs={"ContentType": content_type}
+            )
 
-        return self._public_url(key)
+        return self.public_url(key)
 
-    def _public_url(self, key: str) -> str:
+    def public_url(self, key: str) -> str:
         """Zwraca URL dostępny dla przeglądarki/klienta zewnętrznego.
 
         Priorytety:
         1. S3_PUBLIC_BASE_URL (jawnie ustawiony publiczny base, np. http://localhost:9000)
         2. AWS S3 presigned — gdy brak endpoint (produkcyjne S3)
         3. Fallback: S3_ENDPOINT_URL (uwaga: w dev może być niedostępny z przeglądarki)
+        Backend lokalny: LOCAL_STORAGE_PUBLIC_URL (route /media API).
         """
-        if settings.S3_PUBLIC_BASE_URL:
-            base = settings.S3_PUBLIC_BASE_URL.rstrip("/")
+        if base := self._public_base():
             return f"{base}/{self.bucket}/{key}"
         if not settings.S3_ENDPOINT_URL:
             return f"https://{self.bucket}.s3.{settings.S3_REGION}.amazonaws.com/{key}"
@@ -74,8 +146,15 @@ class StorageService:
         )
         return f"{settings.S3_ENDPOINT_URL}/{self.bucket}/{key}"
 
+    def _public_base(self) -> str:
+        if self.local:
+            return settings.LOCAL_STORAGE_PUBLIC_URL.rstrip("/")
+        return settings.S3_PUBLIC_BASE_URL.rstrip("/")
+
     def get_presigned_url(self, key: str, expires_in: int = 3600) -> str:
-        """Generuje presigned URL do odczytu."""
+        """Generuje presigned URL do odczytu (backend lokalny: publiczny URL)."""
+        if self.local:
+            return self.public_url(key)
         return self.s3.generate_presigned_url(
             "get_object",
             Params={"Bucket": self.bucket, "Key": key},
@@ -84,15 +163,69 @@ class StorageService:
 
     def delete_file(self, key: str):
         """Usuwa plik z S3."""
+        if self.local:
+            self.local.delete(key)
+            return
         self.s3.delete_object(Bucket=self.bucket, Key=key)
 
+    def exists(self, key: str) -> bool:
+        """HEAD obiektu — czy klucz istnieje w buckecie."""
+        from botocore.exceptions import ClientError
+
+        if self.local:
+            return self.local.exists(key)
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def size(self, key: str) -> int:
+        """Rozmiar obiektu w bajtach (HEAD)."""
+        if self.local:
+            return self.local.path(key).stat().st_size
+        return self.s3.head_object(Bucket=self.bucket, Key=key)["ContentLength"]
+
+    def open_object(self, key: str, start: int = 0) -> BinaryIO:
+        """Strumień treści obiektu od bajtu start (GetObject z Range, bez buforowania)."""
+        if self.local:
+            f = open(self.local.path(key), "rb")  # noqa: SIM115 — zamyka wywołujący
+            f.seek(start)
+            return f
+        kwargs = {"Range": f"bytes={start}-"} if start else {}
+        return self.s3.get_object(Bucket=self.bucket, Key=key, **kwargs)["Body"]
+
+    def key_from_url(self, url: str | None) -> str | None:
+        """Klucz obiektu z URL-a zwróconego przez public_url (None dla obcych URL-i)."""
+        from urllib.parse import unquote, urlsplit
+
+        if not url:
+            return None
+        parts = urlsplit(url)
+        path = unquote(parts.path).lstrip("/")
+        if parts.netloc.startswith(f"{self.bucket}.s3."):  # AWS, virtual-hosted
+            return path or None
+        # Base z własną ścieżką (np. …/media) poprzedza {bucket}/{key}
+        base_path = urlsplit(self._public_base()).path.strip("/")
+        prefix = f"{base_path}/{self.bucket}/" if base_path else f"{self.bucket}/"
+        if not path.startswith(prefix):
+            return None
+        return path[len(prefix) :] or None
+
+    @staticmethod
+    def content_key(sha256: str, extension: str) -> str:
+        """Klucz adresowany treścią: cas/ab/abcdef….ext (prefiks rozkłada obiekty)."""
+        return f"cas/{sha256[:2]}/{sha256}.{extension}"
+
     @staticmethod
     def generate_key(prefix: str, extension: str) -> str:
         """Generuje unikalny klucz: prefix/uuid.ext"""
         return f"{prefix}/{uuid.uuid4().hex}.{extension}"
 
     @staticmethod
-    def _guess_content_type(path: str) -> str:
+    def guess_content_type(path: str) -> str:
         ext = Path(path).suffix.lower()
         mapping = {
             ".mp4": "video/mp4",
@@ -105,3 +238,60 @@ class StorageService:
             ".srt": "text/plain",
         }
         return mapping.get(ext, "application/octet-stream")
+
+
+class AsyncStorageService:
+    """
+    Asynchroniczny odpowiednik StorageService (te same metody publiczne).
+    Operacje sieciowe wykonuje w puli wątków procesu — co najwyżej
+    S3_UPLOAD_CONCURRENCY równoległych operacji na proces.
+    """
+
+    generate_key = staticmethod(StorageService.generate_key)
+    content_key = staticmethod(StorageService.content_key)
+    guess_content_type = staticmethod(StorageService.guess_content_type)
+
+    def __init__(self):
+        self._sync = StorageService()
+        self.bucket = self._sync.bucket
+
+    async def _call(self, fn, *args, **kwargs):
+        # Kopia kontekstu jak w asyncio.to_thread — ledger przypisuje wywołania do wideo
+        call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), call)
+
+    async def upload_file(
+        self,
+        local_path: str,
+        key: str,
+        content_type: str | None = None,
+        resumable: bool = True,
+    ) -> str:
+        return await self._call(self._sync.upload_file, local_path, key, content_type, resumable)
+
+    async def upload_bytes(
+        self, data: bytes, key: str, content_type: str = "application/octet-stream"
+    ) -> str:
+        return await self._call(self._sync.upload_bytes, data, key, content_type)
+
+    async def get_presigned_url(self, key: str, expires_in: int = 3600) -> str:
+        # Podpis liczony lokalnie (bez sieci) — nie ma czego oddawać do puli
+        return self._sync.get_presigned_url(key, expires_in)
+
+    async def delete_file(self, key: str):
+        await self._call(self._sync.delete_file, key)
+
+    async def exists(self, key: str) -> bool:
+        return await self._call(self._sync.exists, key)
+
+    async def size(self, key: str) -> int:
+        return await self._call(self._sync.size, key)
+
+    async def open_object(self, key: str, start: int = 0) -> BinaryIO:
+        return await self._call(self._sync.open_object, key, start)
+
+    def public_url(self, key: str) -> str:
+        return self._sync.public_url(key)
+
+    def key_from_url(self, url: str | None) -> str | None:
+        return self._sync.key_from_url(url)
@@ -0,0 +1,293 @@
+"""
+Transfer plików do S3 — multipart z sumami kontrolnymi i wznawianiem.
+
+- Pliki poniżej S3_MULTIPART_THRESHOLD_MB idą jednym PUT z ChecksumSHA256.
+- Większe: multipart, części S3_MULTIPART_PART_SIZE_MB wysyłane równolegle
+  (S3_MULTIPART_CONCURRENCY), każda z własnym SHA-256 weryfikowanym przez S3.
+- Stan uploadu (upload_id, rozmiar części) trzymamy w Redis pod
+  (bucket, klucz docelowy, SHA-256 całego pliku). Po restarcie workera ten sam
+  plik pod tym samym kluczem (np. CAS: cas/ab/<sha>.ext) wznawia upload:
+  ListParts → wysyłamy tylko części, których brakuje lub których suma się
+  nie zgadza. Upload z innym rozmiarem części jest przerywany (AbortMultipartUpload),
+  żeby nie zostawiać w S3 płatnych, niedokończonych części.
+- Klucz jednorazowy (resumable=False, np. prefix/uuid.ext) nigdy nie zostanie
+  wznowiony — błąd wysyłki od razu przerywa upload. Uploady porzucone mimo to
+  (np. zabity worker) sprząta abort_stale_uploads po S3_UPLOAD_STATE_TTL_SECONDS.
+- SHA-256 całego obiektu trafia do metadanych (x-amz-meta-sha256).
+
+Funkcje są synchroniczne — wołane z puli wątków AsyncStorageService.
+"""
+
+import base64
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import structlog
+
+from app.core.config import get_settings
+
+settings = get_settings()
+logger = structlog.get_logger()
+
+_MIB = 1024 * 1024
+_MAX_PARTS = 10_000  # limit S3
+_STATE_PREFIX = "s3_upload:"
+
+
+@dataclass
+class TransferStats:
+    key: str
+    bytes: int
+    seconds: float
+    parts: int = 1
+    resumed_parts: int = 0
+    sha256: str = ""
+
+    @property
+    def mb_per_s(self) -> float:
+        return round(self.bytes / _MIB / self.seconds, 2) if self.seconds > 0 else 0.0
+
+
+def upload_file(
+    client,
+    bucket: str,
+    local_path: str,
+    key: str,
+    content_type: str,
+    *,
+    part_size: int | None = None,
+    threshold: int | None = None,
+    resumable: bool = True,
+) -> TransferStats:
+    """
+    Wysyła plik do S3 pod klucz `key` i zwraca statystyki transferu.
+    resumable=False — klucz nie wróci przy ponowieniu, więc nieudany multipart
+    jest od razu przerywany zamiast czekać na wznowienie.
+    """
+    size = os.path.getsize(local_path)
+    threshold = threshold or settings.S3_MULTIPART_THRESHOLD_MB * _MIB
+    start = time.perf_counter()
+    if size < threshold:
+        stats = _put_single(client, bucket, local_path, key, content_type)
+    else:
+        part_size = max(
+            part_size or settings.S3_MULTIPART_PART_SIZE_MB * _MIB, math.ceil(size / _MAX_PARTS)
+        )
+        stats = _put_multipart(client, bucket, local_path, key, content_type, part_size, resumable)
+    stats.seconds = time.perf_counter() - start
+
+    logger.info(
+        "Transfer S3",
+        key=stats.key,
+        size_mb=round(size / _MIB, 2),
+        seconds=round(stats.seconds, 2),
+        mb_per_s=stats.mb_per_s,
+        parts=stats.parts,
+        resumed_parts=stats.resumed_parts,
+    )
+    return stats
+
+
+def _b64(digest: bytes) -> str:
+    return base64.b64encode(digest).decode()
+
+
+def _put_single(client, bucket: str, local_path: str, key: str, content_type: str):
+    with open(local_path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).digest()
+    client.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=data,
+        ContentType=content_type,
+        ChecksumSHA256=_b64(digest),
+        Metadata={"sha256": digest.hex()},
+    )
+    return TransferStats(key=key, bytes=len(data), seconds=0.0, sha256=digest.hex())
+
+
+def _checksums(local_path: str, part_size: int) -> tuple[str, list[str]]:
+    """SHA-256 całego pliku (hex) i każdej części (base64) — jeden odczyt."""
+    whole = hashlib.sha256()
+    parts: list[str] = []
+    with open(local_path, "rb") as f:
+        while chunk := f.read(part_size):
+            whole.update(chunk)
+            parts.append(_b64(hashlib.sha256(chunk).digest()))
+    return whole.hexdigest(), parts
+
+
+def _put_multipart(
+    client,
+    bucket: str,
+    local_path: str,
+    key: str,
+    content_type: str,
+    part_size: int,
+    resumable: bool,
+) -> TransferStats:
+    size = os.path.getsize(local_path)
+    sha256, part_sums = _checksums(local_path, part_size)
+    state_key = f"{_STATE_PREFIX}{bucket}:{key}:{sha256}"
+
+    done: dict[int, str] = {}
+    state = _load_state(state_key)
+    if state and state.get("part_size") == part_size:
+        upload_id = state["upload_id"]
+        done = _uploaded_parts(client, bucket, key, upload_id, part_sums)
+        if done is None:  # upload przerwany/wygasły po stronie S3
+            state, done = None, {}
+    elif state:
+        # Inny podział na części — wysłanych części nie da się użyć
+        _abort(client, bucket, key, state["upload_id"])
+        state = None
+
+    if state is None:
+        upload_id = client.create_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            ContentType=content_type,
+            ChecksumAlgorithm="SHA256",
+            Metadata={"sha256": sha256},
+        )["UploadId"]
+        _save_state(state_key, {"upload_id": upload_id, "part_size": part_size})
+
+    def send(number: int) -> tuple[int, str]:
+        with open(local_path, "rb") as f:
+            f.seek((number - 1) * part_size)
+            body = f.read(part_size)
+        resp = client.upload_part(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=number,
+            Body=body,
+            ChecksumAlgorithm="SHA256",
+            ChecksumSHA256=part_sums[number - 1],
+        )
+        return number, resp["ETag"]
+
+    todo = [n for n in range(1, len(part_sums) + 1) if n not in done]
+    try:
+        with ThreadPoolExecutor(
+            max_workers=settings.S3_MULTIPART_CONCURRENCY, thread_name_prefix="s3-part"
+        ) as pool:
+            etags = {**done, **dict(pool.map(send, todo))}
+
+        client.complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={
+                "Parts": [
+                    {"PartNumber": n, "ETag": etags[n], "ChecksumSHA256": part_sums[n - 1]}
+                    for n in sorted(etags)
+                ]
+            },
+        )
+    except Exception:
+        if not resumable:
+            # Ponowienie wyśle plik pod nowy klucz — wysłane części byłyby tylko kosztem
+            _abort(client, bucket, key, upload_id)
+            _delete_state(state_key)
+        raise
+    _delete_state(state_key)
+    return TransferStats(
+        key=key,
+        bytes=size,
+        seconds=0.0,
+        parts=len(part_sums),
+        resumed_parts=len(done),
+        sha256=sha256,
+    )
+
+
+def _uploaded_parts(
+    client, bucket: str, key: str, upload_id: str, part_sums: list[str]
+) -> dict[int, str] | None:
+    """Części już w S3 z poprawną sumą {numer: ETag}; None, gdy upload nie istnieje."""
+    done: dict[int, str] = {}
+    kwargs = {"Bucket": bucket, "Key": key, "UploadId": upload_id}
+    try:
+        while True:
+            page = client.list_parts(**kwargs)
+            for part in page.get("Parts", []):
+                n = part["PartNumber"]
+                if n <= len(part_sums) and part.get("ChecksumSHA256") == part_sums[n - 1]:
+                    done[n] = part["ETag"]
+            if not page.get("IsTruncated"):
+                return done
+            kwargs["PartNumberMarker"] = page["NextPartNumberMarker"]
+    except Exception as e:
+        logger.info("Transfer S3: nie można wznowić uploadu", key=key, error=str(e))
+        return None
+
+
+def _abort(client, bucket: str, key: str, upload_id: str) -> bool:
+    try:
+        client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        logger.info("Transfer S3: upload przerwany", key=key, upload_id=upload_id)
+        return True
+    except Exception as e:
+        logger.warning("Transfer S3: przerwanie uploadu nieudane", key=key, error=str(e))
+        return False
+
+
+def abort_stale_uploads(client, bucket: str, max_age_seconds: int | None = None) -> int:
+    """
+    Przerywa niedokończone uploady multipart starsze niż max_age_seconds
+    (domyślnie S3_UPLOAD_STATE_TTL_SECONDS — po tym czasie stanu do wznowienia
+    i tak już nie ma). Zwraca liczbę przerwanych.
+    """
+    max_age = max_age_seconds or settings.S3_UPLOAD_STATE_TTL_SECONDS
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age)
+    aborted = 0
+    for page in client.get_paginator("list_multipart_uploads").paginate(Bucket=bucket):
+        for upload in page.get("Uploads", []):
+            if upload["Initiated"] < cutoff and _abort(
+                client, bucket, upload["Key"], upload["UploadId"]
+            ):
+                aborted += 1
+    logger.info("Transfer S3: porzucone uploady przerwane", bucket=bucket, aborted=aborted)
+    return aborted
+
+
+def _redis():
+    import redis
+
+    return redis.Redis.from_url(
+        settings.REDIS_URL, decode_responses=True, socket_timeout=2, socket_connect_timeout=2
+    )
+
+
+def _load_state(state_key: str) -> dict | None:
+    try:
+        with _redis() as r:
+            raw = r.get(state_key)
+    except Exception as e:
+        logger.warning("Transfer S3: Redis niedostępny, bez wznawiania", error=str(e))
+        return None
+    return json.loads(raw) if raw else None
+
+
+def _save_state(state_key: str, state: dict) -> None:
+    try:
+        with _redis() as r:
+            r.setex(state_key, settings.S3_UPLOAD_STATE_TTL_SECONDS, json.dumps(state))
+    except Exception as e:
+        logger.warning("Transfer S3: zapis stanu nieudany", error=str(e))
+
+
+def _delete_state(state_key: str) -> None:
+    try:
+        with _redis() as r:
+            r.delete(state_key)
+    except Exception as e:
+        logger.warning("Transfer S3: usunięcie stanu nieudane", error=str(e))
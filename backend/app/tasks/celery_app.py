@@ -31,9 +31,12 @@ celery_app.conf.update(
     # Routing — osobne kolejki dla różnych typów zadań
     task_routes={
         "app.tasks.video_pipeline.*": {"queue": "video_pipeline"},
+        # Lekki polling — nie zajmuje slotów workerów publikacji
+        "app.tasks.publishing.poll_instagram_containers": {"queue": "scheduler"},
         "app.tasks.publishing.*": {"queue": "publishing"},
         "app.tasks.scheduler.*": {"queue": "scheduler"},
         "app.tasks.analytics.*": {"queue": "analytics"},
+        "app.tasks.storage_gc.*": {"queue": "scheduler"},
     },
 
     # Beat schedule — harmonogram cron
@@ -42,6 +45,10 @@ celery_app.conf.update(
             "task": "app.tasks.scheduler.check_scheduled_videos",
             "schedule": 60.0,  # co minutę
         },
+        "poll-instagram-containers": {
+            "task": "app.tasks.publishing.poll_instagram_containers",
+            "schedule": float(settings.INSTAGRAM_POLL_INTERVAL_SECONDS),
+        },
         "refresh-platform-tokens": {
             "task": "app.tasks.scheduler.refresh_expiring_tokens",
             "schedule": 3600.0,  # co godzinę
@@ -54,6 +61,18 @@ celery_app.conf.update(
             "task": "app.tasks.scheduler.reset_monthly_counters",
             "schedule": 86400.0,  # co 24h (sprawdza czy jest 1. dzień miesiąca)
         },
+        "collect-blob-garbage": {
+            "task": "app.tasks.storage_gc.collect_blob_garbage",
+            "schedule": 86400.0,  # co 24h
+        },
+        "collect-orphaned-artifacts": {
+            "task": "app.tasks.storage_gc.collect_orphaned_artifacts",
+            "schedule": 86400.0,  # co 24h (dry-run, dopóki STORAGE_GC_DRY_RUN=true)
+        },
+        "abort-stale-multipart-uploads": {
+            "task": "app.tasks.storage_gc.abort_stale_multipart_uploads",
+            "schedule": 86400.0,  # co 24h
+        },
     },
 
     # Timeouts
@@ -69,5 +88,6 @@ celery_app.conf.update(
         "app.tasks.publishing",
         "app.tasks.scheduler",
         "app.tasks.analytics",
+        "app.tasks.storage_gc",
     ],
 )
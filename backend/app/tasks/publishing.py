@@ -1,6 +1,10 @@
 """
 Zadania publikacji wideo na platformach.
 Ulepszenie: osobne zadania per platforma + retry + status tracking.
+
+schedule_publish_task wysyła jedno publish_video_task na wszystkie kanały:
+kontekst z bazy i plik wideo są pobierane raz, uploady idą równolegle,
+a retry obejmuje tylko platformy, które się nie powiodły.
 """
 
 import asyncio
@@ -55,9 +59,61 @@ async def _create_publish_jobs(video_id: str, channels: list[str]):
         await db.commit()
 
         # Natychmiastowa publikacja jeśli nie zaplanowano na przyszłość
-        for channel in channels:
-            if not video.scheduled_publish_at or video.scheduled_publish_at <= datetime.now(timezone.utc):
-                publish_to_platform_task.delay(video_id, channel)
+        scheduled_at = video.scheduled_publish_at
+        if not scheduled_at or scheduled_at <= datetime.now(timezone.utc):
+            publish_video_task.delay(video_id, channels)
+
+
+@celery_app.task(
+    name="app.tasks.publishing.publish_video_task",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=60,
+)
+def publish_video_task(
+    self, video_id: str, platforms: list[str], retry_budget: int | None = None
+):
+    """
+    Publikuje wideo na kilka platform równolegle (jeden kontekst, jeden transfer pliku).
+    Retry zadania ponawia tylko platformy zakończone błędem.
+    """
+    from app.core.config import get_settings
+    from app.core.retry_budget import RetryBudget, record_call, use_retry_budget
+    from app.services.analytics.ledger import ledger_video
+
+    logger.info("Publikacja start", video_id=video_id, platforms=platforms)
+
+    if retry_budget is None:
+        retry_budget = get_settings().RETRY_BUDGET_PER_JOB
+    budget = RetryBudget(retry_budget, job_id=f"{video_id}:publish")
+
+    with use_retry_budget(budget), ledger_video(video_id):
+        record_call("celery_publish", self.request.retries + 1)
+        try:
+            try:
+                outcomes = _run_async(_publish_many(video_id, platforms))
+            except Exception as exc:
+                outcomes = dict.fromkeys(platforms, exc)
+
+            failed = {p: o for p, o in outcomes.items() if isinstance(o, BaseException)}
+            for platform, exc in failed.items():
+                logger.error(
+                    "Publikacja błąd", video_id=video_id, platform=platform, error=str(exc)
+                )
+                _run_async(_update_publish_job(video_id, platform, "failed", str(exc)))
+            if failed:
+                exc = next(iter(failed.values()))
+                if not budget.try_consume("celery_publish"):
+                    raise exc
+                raise self.retry(
+                    exc=exc,
+                    args=[video_id, list(failed)],
+                    kwargs={"retry_budget": budget.remaining},
+                ) from exc
+            return outcomes
+        finally:
+            _run_async(budget.flush_stats())
+            _run_async(_flush_api_ledger())
 
 
 @celery_app.task(
@@ -66,26 +122,66 @@ async def _create_publish_jobs(video_id: str, channels: list[str]):
     max_retries=3,
     default_retry_delay=60,
 )
-def publish_to_platform_task(self, video_id: str, platform: str):
-    """Publikuje wideo na konkretną platformę."""
+def publish_to_platform_task(
+    self, video_id: str, platform: str, retry_budget: int | None = None
+):
+    """Publikuje wideo na konkretną platformę (w ramach budżetu ponowień zadania)."""
+    from app.core.config import get_settings
+    from app.core.retry_budget import RetryBudget, record_call, use_retry_budget
+    from app.services.analytics.ledger import ledger_video
+
     logger.info("Publikacja start", video_id=video_id, platform=platform)
-    try:
-        _run_async(_publish(video_id, platform))
-    except Exception as exc:
-        logger.error("Publikacja błąd", video_id=video_id, platform=platform, error=str(exc))
-        _run_async(_update_publish_job(video_id, platform, "failed", str(exc)))
-        raise self.retry(exc=exc)
+
+    if retry_budget is None:
+        retry_budget = get_settings().RETRY_BUDGET_PER_JOB
+    budget = RetryBudget(retry_budget, job_id=f"{video_id}:{platform}")
+
+    with use_retry_budget(budget), ledger_video(video_id):
+        record_call("celery_publish", self.request.retries + 1)
+        try:
+            _run_async(_publish(video_id, platform))
+        except Exception as exc:
+            logger.error("Publikacja błąd", video_id=video_id, platform=platform, error=str(exc))
+            _run_async(_update_publish_job(video_id, platform, "failed", str(exc)))
+            if not budget.try_consume("celery_publish"):
+                raise
+            raise self.retry(
+                exc=exc, kwargs={**self.request.kwargs, "retry_budget": budget.remaining}
+            ) from exc
+        finally:
+            _run_async(budget.flush_stats())
+            _run_async(_flush_api_ledger())
 
 
 async def _publish(video_id: str, platform: str):
+    outcome = (await _publish_many(video_id, [platform]))[platform]
+    if isinstance(outcome, BaseException):
+        raise outcome
+
+
+# Platformy, na które plik wysyłamy sami (Instagram pobiera go z URL-a)
+_STREAMING_PLATFORMS = ("youtube", "tiktok")
+
+
+async def _publish_many(video_id: str, platforms: list[str]) -> dict[str, str | BaseException]:
+    """
+    Publikuje wideo na kilka platform naraz: Video/Series/połączenia i joby
+    ładowane raz, plik pobierany raz (przy kilku uploadach z S3 — jednorazowo
+    na dysk), uploady równolegle. Zwraca {platforma: "published" | "processing"
+    | wyjątek}; błędy jednej platformy nie przerywają pozostałych.
+    """
+    import contextlib
+    import os
+
     from sqlalchemy import select
 
     from app.core.database import async_session_factory
     from app.models.platform_connection import PlatformConnection
     from app.models.publish_job import PublishJob, PublishStatus
     from app.models.series import Series
-    from app.models.video import Video, VideoStatus
-    from app.services.video.storage import StorageService
+    from app.models.video import Video
+    from app.services.publishing.video_source import open_video_source, spool_to_disk
+    from app.services.video.storage import AsyncStorageService
 
     async with async_session_factory() as db:
         result = await db.execute(select(Video).where(Video.id == uuid.UUID(video_id)))
@@ -94,115 +190,465 @@ async def _publish(video_id: str, platform: str):
         series_result = await db.execute(select(Series).where(Series.id == video.series_id))
         series = series_result.scalar_one()
 
-        # Pobierz połączenie z platformą
+        # Połączenia z platformami — jedno zapytanie dla wszystkich
         conn_result = await db.execute(
             select(PlatformConnection).where(
                 PlatformConnection.user_id == series.user_id,
-                PlatformConnection.platform == platform,
+                PlatformConnection.platform.in_(platforms),
                 PlatformConnection.is_active.is_(True),
             )
         )
-        connection = conn_result.scalar_one_or_none()
-        if not connection:
-            raise RuntimeError(f"Brak aktywnego połączenia z {platform}")
+        connections = {c.platform: c for c in conn_result.scalars()}
+
+        # Najnowszy nieopublikowany job per platforma (retry zastaje go jako failed/uploading)
+        job_result = await db.execute(
+            select(PublishJob)
+            .where(
+                PublishJob.video_id == video.id,
+                PublishJob.platform.in_(platforms),
+                PublishJob.status != PublishStatus.PUBLISHED,
+            )
+            .order_by(PublishJob.created_at.desc())
+        )
+        jobs: dict[str, PublishJob] = {}
+        for job in job_result.scalars():
+            jobs.setdefault(job.platform, job)
+
+        outcomes: dict[str, str | BaseException] = {}
+        active: list[str] = []
+        for platform in platforms:
+            job = jobs.get(platform)
+            if job and job.status == PublishStatus.PROCESSING:
+                # Kontener Instagram już przetwarzany — dokończy go poll_instagram_containers
+                logger.info(
+                    "Publikacja w przetwarzaniu, pomijam", video_id=video_id, platform=platform
+                )
+                outcomes[platform] = "processing"
+            elif platform not in connections:
+                outcomes[platform] = RuntimeError(f"Brak aktywnego połączenia z {platform}")
+            else:
+                active.append(platform)
+                if job:
+                    job.status = PublishStatus.UPLOADING
+        await db.commit()
+
+        # Źródło wideo: render z tego węzła albo strumień GetObject — bez pobierania do pamięci
+        storage = AsyncStorageService()
+        source, spooled = None, None
+        streaming = [p for p in active if p in _STREAMING_PLATFORMS]
+        if streaming:
+            try:
+                source = await open_video_source(storage, video.video_url)
+                if len(streaming) > 1 and source.origin == "s3":
+                    source, spooled = await spool_to_disk(source)  # jeden transfer z S3
+            except Exception as e:
+                for platform in streaming:
+                    outcomes[platform] = e
+                active = [p for p in active if p not in streaming]
+            else:
+                logger.info(
+                    "Publikacja: źródło wideo",
+                    video_id=video_id,
+                    platforms=streaming,
+                    origin=source.origin,
+                    size_mb=round(source.size / 1_048_576, 1),
+                )
+
+        # Jedna sesja, równoległe uploady — dostęp do bazy serializuje blokada
+        db_lock = asyncio.Lock()
+        try:
+            results = await asyncio.gather(
+                *(
+                    _publish_one(
+                        db,
+                        db_lock,
+                        platform,
+                        video=video,
+                        job=jobs.get(platform),
+                        connection=connections[platform],
+                        storage=storage,
+                        source=source,
+                    )
+                    for platform in active
+                ),
+                return_exceptions=True,
+            )
+        finally:
+            if spooled:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(spooled)
+        outcomes.update(zip(active, results, strict=True))
+        return outcomes
+
+
+async def _publish_one(
+    db, db_lock: asyncio.Lock, platform: str, *, video, job, connection, storage, source
+) -> str:
+    """Upload na jedną platformę; zwraca "published" albo "processing" (Instagram)."""
+    from app.models.publish_job import PublishStatus
 
-        # Pobierz plik wideo do tymczasowego katalogu
-        import tempfile
+    video_id = str(video.id)
+
+    async def save_metadata(key: str, value: dict | None) -> None:
+        if not job:
+            return
+        async with db_lock:
+            extra = {k: v for k, v in (job.metadata_extra or {}).items() if k != key}
+            job.metadata_extra = extra if value is None else {**extra, key: value}
+            await db.commit()
 
-        storage = StorageService()
-        video_key = video.video_url.split("/")[-1] if video.video_url else None
-        if not video_key:
-            raise RuntimeError("Brak pliku wideo do publikacji")
+    # Publikuj
+    publish_result = {}
+    if platform == "youtube":
+        from app.services.publishing.youtube_publisher import YouTubePublisher
+
+        # Sesja resumable z poprzedniej próby — wznowienie zamiast wysyłki od zera
+        upload_state = (job.metadata_extra or {}).get("youtube_upload", {}) if job else {}
+        session_url = (
+            upload_state.get("session_url")
+            if upload_state.get("size") == source.size
+            else None
+        )
 
-        # Dla uproszczenia: generujemy presigned URL
-        presigned_url = storage.get_presigned_url(
-            f"videos/{series.id}/{video_key}", expires_in=3600
+        async def save_session(url: str) -> None:
+            await save_metadata("youtube_upload", {"session_url": url, "size": source.size})
+
+        publisher = YouTubePublisher()
+        publish_result = await publisher.upload(
+            access_token=connection.access_token,
+            video=source,
+            title=video.title,
+            description=video.description,
+            tags=video.tags or [],
+            session_url=session_url,
+            on_session=save_session,
         )
 
-        # Update job status
-        job_result = await db.execute(
-            select(PublishJob).where(
-                PublishJob.video_id == video.id,
-                PublishJob.platform == platform,
-                PublishJob.status == PublishStatus.PENDING,
-            )
+    elif platform == "tiktok":
+        from app.services.publishing.tiktok_publisher import TikTokPublisher
+
+        async def save_progress(progress: dict) -> None:
+            await save_metadata("tiktok_upload", progress)
+
+        publisher = TikTokPublisher()
+        publish_result = await publisher.upload(
+            access_token=connection.access_token,
+            video=source,
+            title=video.title,
+            description=video.description,
+            on_progress=save_progress,
         )
-        job = job_result.scalar_one_or_none()
-        if job:
-            job.status = PublishStatus.UPLOADING
-            db.add(job)
+
+    elif platform == "instagram":
+        from app.services.publishing.instagram_publisher import InstagramPublisher
+
+        if not job:
+            raise RuntimeError("Brak zadania publikacji do śledzenia kontenera Instagram")
+
+        # Instagram pobiera wideo sam — wystarczy URL do odczytu
+        presigned_url = await storage.get_presigned_url(
+            storage.key_from_url(video.video_url), expires_in=3600
+        )
+        container_id = await InstagramPublisher().create_container(
+            access_token=connection.access_token,
+            ig_user_id=connection.platform_user_id,
+            video_url=presigned_url,
+            caption=f"{video.title}\n\n{video.description}",
+        )
+        # Przetwarzanie śledzi poll_instagram_containers — worker jest wolny od razu
+        now = datetime.now(timezone.utc)
+        async with db_lock:
+            job.status = PublishStatus.PROCESSING
+            job.metadata_extra = {
+                **(job.metadata_extra or {}),
+                "instagram": {
+                    "container_id": container_id,
+                    "ig_user_id": connection.platform_user_id,
+                    "created_at": now.isoformat(),
+                    "polls": 0,
+                    "next_poll_at": _next_poll_at(now, 0).isoformat(),
+                },
+            }
             await db.commit()
+        logger.info(
+            "Instagram: kontener w przetwarzaniu", video_id=video_id, container_id=container_id
+        )
+        return "processing"
+
+    else:
+        raise ValueError(f"Nieobsługiwana platforma: {platform}")
+
+    async with db_lock:
+        if job and platform == "youtube":
+            # Sesja resumable zużyta — nie wznawiamy już zakończonego uploadu
+            job.metadata_extra = {
+                k: v for k, v in (job.metadata_extra or {}).items() if k != "youtube_upload"
+            }
+        _mark_published(video, job, platform, publish_result)
+        await db.commit()
+    logger.info("Publikacja zakończona", video_id=video_id, platform=platform)
+    return "published"
 
-        # Publikuj
-        publish_result = {}
-        if platform == "youtube":
-            from app.services.publishing.youtube_publisher import YouTubePublisher
-
-            publisher = YouTubePublisher()
-            # Potrzebujemy lokalny plik — pobierz z S3
-            import httpx
-
-            tmp_path = tempfile.mktemp(suffix=".mp4")
-            async with httpx.AsyncClient(timeout=120) as client:
-                resp = await client.get(presigned_url)
-                with open(tmp_path, "wb") as f:
-                    f.write(resp.content)
-
-            publish_result = await publisher.upload(
-                access_token=connection.access_token,
-                video_path=tmp_path,
-                title=video.title,
-                description=video.description,
-                tags=video.tags or [],
-            )
-            video.platform_ids = {**video.platform_ids, "youtube_id": publish_result.get("video_id")}
 
-        elif platform == "tiktok":
-            from app.services.publishing.tiktok_publisher import TikTokPublisher
+# Klucz w Video.platform_ids i pole z wynikiem publishera
+_PLATFORM_IDS = {
+    "youtube": ("youtube_id", "video_id"),
+    "tiktok": ("tiktok_id", "publish_id"),
+    "instagram": ("instagram_id", "media_id"),
+}
 
-            publisher = TikTokPublisher()
-            tmp_path = tempfile.mktemp(suffix=".mp4")
-            import httpx
 
-            async with httpx.AsyncClient(timeout=120) as client:
-                resp = await client.get(presigned_url)
-                with open(tmp_path, "wb") as f:
-                    f.write(resp.content)
+def _mark_published(video, job, platform: str, publish_result: dict) -> None:
+    from app.models.publish_job import PublishStatus
+    from app.models.video import VideoStatus
 
-            publish_result = await publisher.upload(
-                access_token=connection.access_token,
-                video_path=tmp_path,
-                title=video.title,
-                description=video.description,
-            )
-            video.platform_ids = {**video.platform_ids, "tiktok_id": publish_result.get("publish_id")}
+    id_key, result_key = _PLATFORM_IDS[platform]
+    content_id = publish_result.get(result_key)
+    now = datetime.now(timezone.utc)
 
-        elif platform == "instagram":
-            from app.services.publishing.instagram_publisher import InstagramPublisher
+    video.platform_ids = {**(video.platform_ids or {}), id_key: content_id}
+    video.status = VideoStatus.PUBLISHED
+    video.published_at = now
 
-            publisher = InstagramPublisher()
-            publish_result = await publisher.upload(
-                access_token=connection.access_token,
-                ig_user_id=connection.platform_user_id,
-                video_url=presigned_url,
-                caption=f"{video.title}\n\n{video.description}",
-            )
-            video.platform_ids = {**video.platform_ids, "instagram_id": publish_result.get("media_id")}
+    if job:
+        job.status = PublishStatus.PUBLISHED
+        job.published_at = now
+        job.platform_url = publish_result.get("url")
+        job.platform_content_id = content_id
 
-        # Aktualizuj status
-        video.status = VideoStatus.PUBLISHED
-        video.published_at = datetime.now(timezone.utc)
-        db.add(video)
 
-        if job:
-            job.status = PublishStatus.PUBLISHED
-            job.published_at = datetime.now(timezone.utc)
-            job.platform_url = publish_result.get("url")
-            job.platform_content_id = publish_result.get("video_id") or publish_result.get("publish_id") or publish_result.get("media_id")
-            db.add(job)
+def _next_poll_at(now: datetime, polls: int) -> datetime:
+    """Backoff sprawdzeń kontenera: interwał × 2^polls, nie dłużej niż maksimum."""
+    from datetime import timedelta
+
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    delay = min(
+        settings.INSTAGRAM_POLL_INTERVAL_SECONDS * 2**polls,
+        settings.INSTAGRAM_POLL_MAX_INTERVAL_SECONDS,
+    )
+    return now + timedelta(seconds=delay)
+
 
+_INSTAGRAM_STATE_KEYS = ("container_id", "ig_user_id", "created_at", "next_poll_at")
+
+
+def _instagram_state(job) -> dict | None:
+    """Stan kontenera z metadata_extra["instagram"]; None, gdy brakuje pól lub dat."""
+    state = (job.metadata_extra or {}).get("instagram")
+    if not isinstance(state, dict) or not all(state.get(k) for k in _INSTAGRAM_STATE_KEYS):
+        return None
+    try:
+        datetime.fromisoformat(state["created_at"])
+        datetime.fromisoformat(state["next_poll_at"])
+    except (TypeError, ValueError):
+        return None
+    return state
+
+
+def _instagram_poll_due(job, now: datetime) -> bool:
+    """Czas sprawdzić kontener (uszkodzony stan też — zadanie zostanie oznaczone jako błąd)."""
+    state = _instagram_state(job)
+    return state is None or datetime.fromisoformat(state["next_poll_at"]) <= now
+
+
+@celery_app.task(name="app.tasks.publishing.poll_instagram_containers")
+def poll_instagram_containers():
+    """Sprawdza kontenery Instagram w przetwarzaniu i publikuje gotowe."""
+    return _run_async(_poll_instagram_containers())
+
+
+async def _poll_instagram_containers() -> dict:
+    """
+    Trzy kroki, żeby blokady nie trwały przez wywołania Graph API:
+    1. krótka transakcja — blokada (skip_locked) tylko należnych zadań i dzierżawa:
+       next_poll_at przesunięte o INSTAGRAM_POLL_MAX_INTERVAL_SECONDS, więc
+       nakładający się przebieg ich nie weźmie;
+    2. statusy i publikacja gotowych kontenerów — bez otwartej transakcji;
+       media_id z media_publish jest zapisywany od razu, osobno;
+    3. zapis wyników w nowej transakcji.
+    Kontener PUBLISHED (media_publish przeszedł, a zapis wyniku nie) kończy
+    zadanie jako opublikowane — z media_id, jeśli zdążył zostać zapisany.
+    """
+    from collections import defaultdict
+    from datetime import timedelta
+
+    from sqlalchemy import select
+
+    from app.core.config import get_settings
+    from app.core.database import async_session_factory
+    from app.models.platform_connection import PlatformConnection
+    from app.models.publish_job import PublishJob, PublishStatus
+    from app.models.series import Series
+    from app.models.video import Video
+    from app.services.publishing.instagram_publisher import InstagramPublisher
+
+    settings = get_settings()
+    now = datetime.now(timezone.utc)
+    timeout_before = now.timestamp() - settings.INSTAGRAM_PROCESSING_TIMEOUT_MINUTES * 60
+    lease_until = now + timedelta(seconds=settings.INSTAGRAM_POLL_MAX_INTERVAL_SECONDS)
+    stats = {"checked": 0, "published": 0, "failed": 0, "pending": 0}
+    publisher = InstagramPublisher()
+
+    def fail(job, error: str) -> None:
+        job.status = PublishStatus.FAILED
+        job.error_message = error
+        stats["failed"] += 1
+        logger.warning("Instagram: publikacja nieudana", job_id=str(job.id), error=error)
+
+    async def remember_media(job_id: uuid.UUID, result: dict) -> None:
+        """Reel jest już publiczny — media_id trafia do bazy, zanim cokolwiek dalej padnie."""
+        try:
+            async with async_session_factory() as db:
+                job = await db.get(PublishJob, job_id)
+                state = {**job.metadata_extra["instagram"], **result}
+                job.metadata_extra = {**job.metadata_extra, "instagram": state}
+                await db.commit()
+        except Exception as e:
+            logger.warning("Instagram: zapis media_id nieudany", job_id=str(job_id), error=str(e))
+
+    # ── 1. Zajęcie należnych zadań ──
+    by_user: dict[uuid.UUID, list[tuple[uuid.UUID, dict]]] = defaultdict(list)
+    tokens: dict[uuid.UUID, str] = {}
+    async with async_session_factory() as db:
+        processing = (
+            await db.execute(
+                select(PublishJob).where(
+                    PublishJob.platform == "instagram",
+                    PublishJob.status == PublishStatus.PROCESSING,
+                )
+            )
+        ).scalars()
+        due_ids = [job.id for job in processing if _instagram_poll_due(job, now)]
+
+        if due_ids:
+            rows = (
+                await db.execute(
+                    select(PublishJob, Series.user_id)
+                    .join(Video, PublishJob.video_id == Video.id)
+                    .join(Series, Video.series_id == Series.id)
+                    .where(
+                        PublishJob.id.in_(due_ids),
+                        PublishJob.status == PublishStatus.PROCESSING,
+                    )
+                    .with_for_update(of=PublishJob, skip_locked=True)
+                    .execution_options(populate_existing=True)
+                )
+            ).all()
+            for job, user_id in rows:
+                state = _instagram_state(job)
+                if state is None:
+                    fail(job, "Niepoprawny stan kontenera Instagram w metadata_extra")
+                    continue
+                if datetime.fromisoformat(state["next_poll_at"]) > now:
+                    continue  # zajęte przez równoległy przebieg
+                job.metadata_extra = {
+                    **job.metadata_extra,
+                    "instagram": {**state, "next_poll_at": lease_until.isoformat()},
+                }
+                by_user[user_id].append((job.id, state))
+
+        if by_user:
+            tokens = {
+                c.user_id: c.access_token
+                for c in (
+                    await db.execute(
+                        select(PlatformConnection).where(
+                            PlatformConnection.user_id.in_(list(by_user)),
+                            PlatformConnection.platform == "instagram",
+                            PlatformConnection.is_active.is_(True),
+                        )
+                    )
+                ).scalars()
+            }
         await db.commit()
-        logger.info("Publikacja zakończona", video_id=video_id, platform=platform)
+
+    if not by_user:
+        if stats["failed"]:
+            logger.info("Instagram: sprawdzone kontenery", **stats)
+        return stats
+
+    # ── 2. Graph API (bez blokad) ──
+    # job_id → ("published", wynik) | ("failed", błąd) | ("pending", stan)
+    outcomes: dict[uuid.UUID, tuple[str, dict | str]] = {}
+    for user_id, pending in by_user.items():
+        access_token = tokens.get(user_id)
+        if access_token is None:
+            for job_id, _ in pending:
+                outcomes[job_id] = ("failed", "Brak aktywnego połączenia z instagram")
+            continue
+
+        try:
+            statuses = await publisher.container_statuses(
+                access_token, [state["container_id"] for _, state in pending]
+            )
+        except Exception as e:
+            logger.warning("Instagram: odczyt statusów nieudany", error=str(e))
+            statuses = {}
+
+        for job_id, state in pending:
+            stats["checked"] += 1
+            info = statuses.get(state["container_id"], {})
+            code = info.get("status_code")
+            if code == "FINISHED":
+                try:
+                    result = await publisher.publish_container(
+                        access_token, state["ig_user_id"], state["container_id"]
+                    )
+                except Exception as e:
+                    outcomes[job_id] = ("failed", f"media_publish: {e}")
+                    continue
+                await remember_media(job_id, result)
+                outcomes[job_id] = ("published", result)
+            elif code == "PUBLISHED":
+                # Opublikowany w poprzednim przebiegu, którego zapis się nie udał
+                if not state.get("media_id"):
+                    logger.warning(
+                        "Instagram: kontener opublikowany, brak media_id",
+                        job_id=str(job_id),
+                        container_id=state["container_id"],
+                    )
+                outcomes[job_id] = (
+                    "published",
+                    {"media_id": state.get("media_id"), "url": state.get("url")},
+                )
+            elif code in ("ERROR", "EXPIRED"):
+                error = f"Instagram media processing failed: {info.get('status') or code}"
+                outcomes[job_id] = ("failed", error)
+            elif datetime.fromisoformat(state["created_at"]).timestamp() < timeout_before:
+                outcomes[job_id] = ("failed", "Instagram media processing timeout")
+            else:
+                polls = state.get("polls", 0) + 1
+                next_poll_at = _next_poll_at(now, polls).isoformat()
+                state = {**state, "polls": polls, "next_poll_at": next_poll_at}
+                outcomes[job_id] = ("pending", state)
+
+    # ── 3. Zapis wyników ──
+    async with async_session_factory() as db:
+        rows = (
+            await db.execute(
+                select(PublishJob, Video)
+                .join(Video, PublishJob.video_id == Video.id)
+                .where(PublishJob.id.in_(list(outcomes)))
+            )
+        ).all()
+        for job, video in rows:
+            if job.status != PublishStatus.PROCESSING:
+                continue
+            outcome, value = outcomes[job.id]
+            if outcome == "published":
+                _mark_published(video, job, "instagram", value)
+                stats["published"] += 1
+            elif outcome == "failed":
+                fail(job, value)
+            else:
+                job.metadata_extra = {**job.metadata_extra, "instagram": value}
+                stats["pending"] += 1
+        await db.commit()
+
+    logger.info("Instagram: sprawdzone kontenery", **stats)
+    return stats
 
 
 async def _update_publish_job(video_id: str, platform: str, status: str, error: str):
@@ -213,10 +659,13 @@ async def _update_publish_job(video_id: str, platform: str, status: str, error:
 
     async with async_session_factory() as db:
         result = await db.execute(
-            select(PublishJob).where(
+            select(PublishJob)
+            .where(
                 PublishJob.video_id == uuid.UUID(video_id),
                 PublishJob.platform == platform,
             )
+            .order_by(PublishJob.created_at.desc())
+            .limit(1)
         )
         job = result.scalar_one_or_none()
         if job:
@@ -225,3 +674,11 @@ async def _update_publish_job(video_id: str, platform: str, status: str, error:
             job.retry_count += 1
             db.add(job)
             await db.commit()
+
+
+async def _flush_api_ledger():
+    from app.core.database import async_session_factory
+    from app.services.analytics.ledger import flush_ledger
+
+    async with async_session_factory() as db:
+        await flush_ledger(db)
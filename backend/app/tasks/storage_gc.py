@@ -0,0 +1,99 @@
+"""
+Sprzątanie magazynu S3 — bloby content-addressed bez referencji,
+osierocone pliki audio/ i videos/ (bez Video.voice_url / video_url)
+oraz porzucone uploady multipart.
+"""
+
+import asyncio
+
+import structlog
+
+from app.tasks.celery_app import celery_app
+
+logger = structlog.get_logger()
+
+
+def _local_session_factory():
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+    from app.core.config import get_settings
+
+    # Engine per wywołanie — zadanie działa na własnej pętli zdarzeń
+    engine = create_async_engine(str(get_settings().DATABASE_URL), pool_pre_ping=True)
+    return engine, async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def _run_async(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+@celery_app.task(name="app.tasks.storage_gc.collect_blob_garbage")
+def collect_blob_garbage(dry_run: bool = False):
+    """Usuwa bloby CAS, do których nie odwołuje się żadne wideo (po okresie karencji)."""
+    return _run_async(_collect_blob_garbage(dry_run))
+
+
+async def _collect_blob_garbage(dry_run: bool) -> dict:
+    from app.core.config import get_settings
+    from app.services.video.blob_store import collect_unreferenced_blobs
+    from app.services.video.storage import AsyncStorageService
+
+    settings = get_settings()
+    local_engine, local_session_factory = _local_session_factory()
+    try:
+        async with local_session_factory() as db:
+            return await collect_unreferenced_blobs(
+                db,
+                AsyncStorageService(),
+                grace_hours=settings.STORAGE_BLOB_GC_GRACE_HOURS,
+                dry_run=dry_run,
+            )
+    finally:
+        await local_engine.dispose()
+
+
+@celery_app.task(name="app.tasks.storage_gc.collect_orphaned_artifacts")
+def collect_orphaned_artifacts(dry_run: bool | None = None):
+    """
+    Usuwa pliki audio/ i videos/ bez referencji w bazie (starsze niż okres karencji).
+    Domyślnie dry-run (STORAGE_GC_DRY_RUN) — raport w logach i wyniku zadania.
+    """
+    return _run_async(_collect_orphaned_artifacts(dry_run))
+
+
+async def _collect_orphaned_artifacts(dry_run: bool | None) -> dict:
+    from dataclasses import asdict
+
+    from app.core.config import get_settings
+    from app.services.video.orphan_gc import collect_orphaned_artifacts as collect
+    from app.services.video.storage import StorageService
+
+    settings = get_settings()
+    local_engine, local_session_factory = _local_session_factory()
+    try:
+        async with local_session_factory() as db:
+            report = await collect(
+                db,
+                StorageService(),
+                grace_hours=settings.STORAGE_GC_GRACE_HOURS,
+                dry_run=settings.STORAGE_GC_DRY_RUN if dry_run is None else dry_run,
+            )
+        return asdict(report)
+    finally:
+        await local_engine.dispose()
+
+
+@celery_app.task(name="app.tasks.storage_gc.abort_stale_multipart_uploads")
+def abort_stale_multipart_uploads():
+    """Przerywa uploady multipart starsze niż S3_UPLOAD_STATE_TTL_SECONDS (płatne części)."""
+    from app.services.video.storage import StorageService
+    from app.services.video.transfer import abort_stale_uploads
+
+    storage = StorageService()
+    if storage.local:
+        return {"aborted": 0}
+    return {"aborted": abort_stale_uploads(storage.s3, storage.bucket)}
@@ -39,22 +39,40 @@ def generate_video_task(
     series_id: str,
     custom_topic: str | None = None,
     custom_prompt: str | None = None,
+    retry_budget: int | None = None,
 ):
     """
     Główne zadanie generacji wideo — orkiestruje cały pipeline.
     Każdy etap aktualizuje status w bazie (state machine).
+    retry_budget — pozostały budżet ponowień z poprzedniej próby zadania.
     """
+    from app.core.config import get_settings
+    from app.core.retry_budget import RetryBudget, record_call, use_retry_budget
+    from app.services.analytics.ledger import ledger_video
+
     logger.info("Pipeline start", video_id=video_id, series_id=series_id)
 
-    try:
-        _run_async(_execute_pipeline(video_id, series_id, custom_topic, custom_prompt))
-    except Exception as exc:
-        logger.error("Pipeline błąd", video_id=video_id, error=str(exc), retries=self.request.retries)
-        _run_async(_set_video_status(video_id, "failed", str(exc)))
-        if self.request.retries < self.max_retries:
-            raise self.retry(exc=exc)
-        # Retries wyczerpane — zakończ z jawnym wyjątkiem zamiast raise None
-        raise exc
+    if retry_budget is None:
+        retry_budget = get_settings().RETRY_BUDGET_PER_JOB
+    budget = RetryBudget(retry_budget, job_id=video_id)
+
+    with use_retry_budget(budget), ledger_video(video_id):
+        record_call("celery_pipeline", self.request.retries + 1)
+        try:
+            _run_async(_execute_pipeline(video_id, series_id, custom_topic, custom_prompt))
+        except Exception as exc:
+            logger.error(
+                "Pipeline błąd", video_id=video_id, error=str(exc), retries=self.request.retries
+            )
+            _run_async(_set_video_status(video_id, "failed", str(exc)))
+            if self.request.retries < self.max_retries and budget.try_consume("celery_pipeline"):
+                raise self.retry(
+                    exc=exc, kwargs={**self.request.kwargs, "retry_budget": budget.remaining}
+                ) from exc
+            # Retries wyczerpane — zakończ z jawnym wyjątkiem zamiast raise None
+            raise exc
+        finally:
+            _run_async(budget.flush_stats())
 
 
 async def _execute_pipeline(
@@ -70,12 +88,13 @@ async def _execute_pipeline(
     from app.core.config import get_settings
     from app.models.series import Series
     from app.models.video import Video, VideoStatus
-    from app.services.hooks.hook_optimizer import generate_hooks
-    from app.services.llm.script_generator import generate_script
-    from app.services.media.stock_provider import find_media_for_scenes
+    from app.services.analytics.ledger import flush_ledger
+    from app.services.media.media_library import find_scene_media
+    from app.services.media.stock_provider import find_clips_for_scenes
+    from app.services.publishing.video_source import retain_local_render
     from app.services.tts.tts_service import synthesize_with_fallback
     from app.services.video.renderer import VideoRenderer
-    from app.services.video.storage import StorageService
+    from app.services.video.storage import AsyncStorageService
 
     settings = get_settings()
     local_engine = create_async_engine(str(settings.DATABASE_URL), pool_pre_ping=True)
@@ -94,84 +113,71 @@ async def _execute_pipeline(
 
             topic = custom_topic or series.topic
             work_dir = tempfile.mkdtemp(prefix=f"autoshorts_{video_id[:8]}_")
+            # Zdjęcia i klipy z ostatnich odcinków serii — omijane przy wyborze mediów
+            used_media = await _series_used_media(db, series.id, video.id)
+
+            if series.generation_mode == "streaming":
+                # ── Etap 1-4: hook → strumień skryptu; każda scena od razu do TTS i mediów ──
+                best_hook, script_data, enriched_scenes, audio_path = await _generate_streaming(
+                    db,
+                    video,
+                    series,
+                    topic,
+                    custom_prompt,
+                    work_dir,
+                    used_media,
+                    local_session_factory,
+                )
+            else:
+                # ── Etap 1-2: Hook + skrypt LLM ──
+                best_hook, script_data = await _generate_content(
+                    db, video, series, topic, custom_prompt
+                )
+                scenes = _build_scenes(best_hook, script_data)
+
+                # ── Etap 3: TTS ──
+                video.status = VideoStatus.GENERATING_VOICE
+                db.add(video)
+                await db.commit()
 
-            # ── Etap 1: Generowanie hooka ──
-            video.status = VideoStatus.GENERATING_HOOK
-            db.add(video)
-            await db.commit()
+                logger.info("Etap 3: TTS", video_id=video_id)
+                full_narration = " ".join(s["text"] for s in scenes if s.get("text"))
+                audio_bytes = await synthesize_with_fallback(
+                    text=full_narration,
+                    provider_name=series.tts_provider,
+                    voice_id=series.voice_id,
+                )
 
-            logger.info("Etap 1: Hook", video_id=video_id)
-            hooks_data = await generate_hooks(topic, series.language)
-            best_hook = hooks_data.get("best_hook", "")
-            video.hook_text = best_hook
+                audio_path = os.path.join(work_dir, f"narration.{_audio_ext(audio_bytes)}")
+                with open(audio_path, "wb") as f:
+                    f.write(audio_bytes)
 
-            # ── Etap 2: Generowanie skryptu ──
-            video.status = VideoStatus.GENERATING_SCRIPT
-            db.add(video)
-            await db.commit()
+                # ── Etap 4: Pobieranie mediów ──
+                video.status = VideoStatus.FETCHING_MEDIA
+                db.add(video)
+                await db.commit()
 
-            logger.info("Etap 2: Skrypt LLM", video_id=video_id)
-            script_data = await generate_script(
-                topic=topic,
-                language=series.language,
-                tone=series.tone,
-                duration_seconds=series.target_duration_seconds,
-                custom_prompt=custom_prompt,
-                prompt_template=series.prompt_template,
-            )
+                logger.info("Etap 4: Media stockowe", video_id=video_id, scenes_count=len(scenes))
+                enriched_scenes = await find_scene_media(
+                    scenes, exclude_urls=used_media, session_factory=local_session_factory
+                )
+
+            if series.visual_style.get("use_video_clips"):
+                enriched_scenes = await find_clips_for_scenes(
+                    enriched_scenes, exclude_urls=used_media
+                )
 
             video.title = script_data.get("title", f"Odcinek {video.episode_number}")
             video.script = _build_full_script(best_hook, script_data)
             video.description = script_data.get("description", "")
             video.tags = script_data.get("tags", [])
-
-            # Przygotuj sceny
-            scenes = []
-            if best_hook:
-                scenes.append({
-                    "text": best_hook,
-                    "visual_description": "dramatic attention-grabbing visual",
-                    "duration_hint": "3",
-                })
-            scenes.extend(script_data.get("scenes", []))
-            if script_data.get("call_to_action"):
-                scenes.append({
-                    "text": script_data["call_to_action"],
-                    "visual_description": "subscribe follow button animation",
-                    "duration_hint": "3",
-                })
-
-            # ── Etap 3: TTS ──
-            video.status = VideoStatus.GENERATING_VOICE
-            db.add(video)
-            await db.commit()
-
-            logger.info("Etap 3: TTS", video_id=video_id)
-            full_narration = " ".join(s["text"] for s in scenes if s.get("text"))
-            audio_bytes = await synthesize_with_fallback(
-                text=full_narration,
-                provider_name=series.tts_provider,
-                voice_id=series.voice_id,
-            )
-
-            audio_path = os.path.join(work_dir, "narration.mp3")
-            with open(audio_path, "wb") as f:
-                f.write(audio_bytes)
+            video.scenes = enriched_scenes
 
             # Upload audio do S3
-            storage = StorageService()
-            audio_key = storage.generate_key(f"audio/{series_id}", "mp3")
-            voice_url = storage.upload_file(audio_path, audio_key, "audio/mpeg")
-            video.voice_url = voice_url
-
-            # ── Etap 4: Pobieranie mediów ──
-            video.status = VideoStatus.FETCHING_MEDIA
-            db.add(video)
-            await db.commit()
-
-            logger.info("Etap 4: Media stockowe", video_id=video_id, scenes_count=len(scenes))
-            enriched_scenes = await find_media_for_scenes(scenes)
-            video.scenes = enriched_scenes
+            storage = AsyncStorageService()
+            video.voice_url = await _store_artifact(
+                db, storage, audio_path, video, role="voice", prefix=f"audio/{series_id}"
+            )
 
             # ── Etap 5: Rendering ──
             video.status = VideoStatus.RENDERING
@@ -188,15 +194,24 @@ async def _execute_pipeline(
             )
 
             # Upload wideo do S3
-            video_key = storage.generate_key(f"videos/{series_id}", "mp4")
-            video_url = storage.upload_file(output_path, video_key, "video/mp4")
+            video_url = await _store_artifact(
+                db,
+                storage,
+                output_path,
+                video,
+                role="video",
+                prefix=f"videos/{series_id}",
+                content_type="video/mp4",
+            )
             video.video_url = video_url
+            # Hardlink renderu poza work_dir — publikacja z tego węzła bez pobierania z S3
+            retain_local_render(output_path, storage.key_from_url(video_url))
 
             # ── Gotowe ──
             video.status = VideoStatus.READY_FOR_REVIEW
             video.media_assets = {
                 "images": [s.get("media_url") for s in enriched_scenes if s.get("media_url")],
-                "clips": [],
+                "clips": [s["clip_url"] for s in enriched_scenes if s.get("clip_url")],
                 "music_track": None,
             }
             db.add(video)
@@ -213,9 +228,301 @@ async def _execute_pipeline(
             import shutil
             shutil.rmtree(work_dir, ignore_errors=True)
     finally:
+        # Ledger wywołań API — jeden zapis hurtowy na przebieg pipeline'u
+        async with local_session_factory() as ledger_db:
+            await flush_ledger(ledger_db)
         await local_engine.dispose()
 
 
+async def _store_artifact(
+    db,
+    storage,
+    local_path: str,
+    video,
+    *,
+    role: str,
+    prefix: str,
+    content_type: str | None = None,
+) -> str:
+    """
+    Upload artefaktu wideo. W trybie content-addressed (STORAGE_CONTENT_ADDRESSED)
+    klucz wynika z SHA-256 treści, a identyczny plik nie jest wysyłany ponownie.
+    """
+    from app.core.config import get_settings
+
+    if get_settings().STORAGE_CONTENT_ADDRESSED:
+        from app.services.video.blob_store import store_file
+
+        return await store_file(
+            db, storage, local_path, video_id=video.id, role=role, content_type=content_type
+        )
+    key = storage.generate_key(prefix, local_path.rsplit(".", 1)[-1])
+    # Ponowienie zadania dostanie nowy klucz — nieudany upload nie będzie wznawiany
+    return await storage.upload_file(local_path, key, content_type, resumable=False)
+
+
+async def _generate_content(db, video, series, topic: str, custom_prompt: str | None):
+    """
+    Generuje hook i scenariusz wg trybu serii (z semantycznym cache).
+    Zwraca (best_hook, script_data); ustawia video.hook_text.
+    """
+    from app.models.video import VideoStatus
+    from app.services.hooks.hook_optimizer import generate_hooks
+    from app.services.llm.script_generator import generate_hook_and_script, generate_script
+    from app.services.llm.semantic_cache import cached_generate
+
+    video_id = str(video.id)
+    script_kwargs = {
+        "topic": topic,
+        "language": series.language,
+        "tone": series.tone,
+        "duration_seconds": series.target_duration_seconds,
+        "custom_prompt": custom_prompt,
+        "prompt_template": series.prompt_template,
+    }
+    script_prompt_text = "\n".join(
+        [topic, series.tone, str(series.target_duration_seconds), custom_prompt or ""]
+    )
+
+    if series.generation_mode == "combined":
+        # Jedno wywołanie LLM: warianty hooka + pełny scenariusz
+        video.status = VideoStatus.GENERATING_SCRIPT
+        db.add(video)
+        await db.commit()
+
+        logger.info("Etap 1-2: Hook + skrypt (1 wywołanie LLM)", video_id=video_id)
+        script_data = await cached_generate(
+            db,
+            kind="combined",
+            prompt_text=script_prompt_text,
+            series_id=series.id,
+            language=series.language,
+            generate=lambda examples: generate_hook_and_script(
+                **script_kwargs, few_shot_examples=examples
+            ),
+        )
+        best_hook = script_data.get("best_hook", "")
+        video.hook_text = best_hook
+        return best_hook, script_data
+
+    # ── Etap 1: Generowanie hooka ──
+    video.status = VideoStatus.GENERATING_HOOK
+    db.add(video)
+    await db.commit()
+
+    logger.info("Etap 1: Hook", video_id=video_id)
+    hooks_data = await cached_generate(
+        db,
+        kind="hooks",
+        prompt_text=topic,
+        series_id=series.id,
+        language=series.language,
+        generate=lambda examples: generate_hooks(
+            topic, series.language, few_shot_examples=examples
+        ),
+    )
+    best_hook = hooks_data.get("best_hook", "")
+    video.hook_text = best_hook
+
+    # ── Etap 2: Generowanie skryptu ──
+    video.status = VideoStatus.GENERATING_SCRIPT
+    db.add(video)
+    await db.commit()
+
+    logger.info("Etap 2: Skrypt LLM", video_id=video_id)
+    script_data = await cached_generate(
+        db,
+        kind="script",
+        prompt_text=script_prompt_text,
+        series_id=series.id,
+        language=series.language,
+        generate=lambda examples: generate_script(**script_kwargs, few_shot_examples=examples),
+    )
+    return best_hook, script_data
+
+
+async def _generate_streaming(
+    db,
+    video,
+    series,
+    topic: str,
+    custom_prompt: str | None,
+    work_dir: str,
+    used_media: set[str],
+    session_factory,
+):
+    """
+    Tryb strumieniowy: hook, potem skrypt token po tokenie. Każda kompletna scena
+    od razu trafia do TTS i wyszukiwania mediów, więc te etapy nakładają się
+    na generację zamiast czekać na cały scenariusz.
+    Zwraca (best_hook, script_data, enriched_scenes, audio_path).
+    """
+    from app.models.video import VideoStatus
+    from app.services.hooks.hook_optimizer import generate_hooks
+    from app.services.llm.script_generator import stream_script
+    from app.services.llm.semantic_cache import cached_generate
+    from app.services.media.media_library import find_scene_media
+    from app.services.media.phash import HashIndex
+    from app.services.tts.tts_service import synthesize_with_fallback
+    from app.services.video.renderer import VideoRenderer
+
+    video_id = str(video.id)
+    dispatched: dict[tuple[str, str], asyncio.Task] = {}
+    # Sceny szukają mediów równolegle — wspólne kadry wideo i lock na wybór zasobu
+    frames = HashIndex()
+    media_lock = asyncio.Lock()
+
+    async def process_scene(scene: dict) -> tuple[bytes, dict]:
+        audio_bytes, enriched = await asyncio.gather(
+            synthesize_with_fallback(
+                text=scene["text"],
+                provider_name=series.tts_provider,
+                voice_id=series.voice_id,
+            ),
+            find_scene_media(
+                [scene],
+                exclude_urls=used_media,
+                session_factory=session_factory,
+                frames=frames,
+                lock=media_lock,
+            ),
+        )
+        return audio_bytes, enriched[0]
+
+    def dispatch(scene: dict) -> None:
+        key = _scene_key(scene)
+        if scene.get("text") and key not in dispatched:
+            dispatched[key] = asyncio.create_task(process_scene(scene))
+
+    try:
+        video.status = VideoStatus.GENERATING_HOOK
+        db.add(video)
+        await db.commit()
+
+        logger.info("Etap 1: Hook", video_id=video_id)
+        hooks_data = await cached_generate(
+            db,
+            kind="hooks",
+            prompt_text=topic,
+            series_id=series.id,
+            language=series.language,
+            generate=lambda examples: generate_hooks(
+                topic, series.language, few_shot_examples=examples
+            ),
+        )
+        best_hook = hooks_data.get("best_hook", "")
+        video.hook_text = best_hook
+        if best_hook:
+            dispatch(_build_scenes(best_hook, {})[0])
+
+        video.status = VideoStatus.GENERATING_SCRIPT
+        db.add(video)
+        await db.commit()
+
+        logger.info("Etap 2: Skrypt LLM (stream)", video_id=video_id)
+        script_data = await cached_generate(
+            db,
+            kind="script",
+            prompt_text="\n".join(
+                [topic, series.tone, str(series.target_duration_seconds), custom_prompt or ""]
+            ),
+            series_id=series.id,
+            language=series.language,
+            generate=lambda examples: stream_script(
+                topic=topic,
+                on_scene=dispatch,
+                language=series.language,
+                tone=series.tone,
+                duration_seconds=series.target_duration_seconds,
+                custom_prompt=custom_prompt,
+                prompt_template=series.prompt_template,
+                few_shot_examples=examples,
+            ),
+        )
+
+        # Sceny z cache / fallbacku / CTA nie przeszły przez strumień — wyślij teraz
+        scenes = [s for s in _build_scenes(best_hook, script_data) if s.get("text")]
+        for scene in scenes:
+            dispatch(scene)
+
+        video.status = VideoStatus.GENERATING_VOICE
+        db.add(video)
+        await db.commit()
+
+        logger.info("Etap 3-4: TTS + media (per scena)", video_id=video_id, scenes=len(scenes))
+        results = await asyncio.gather(*(dispatched[_scene_key(s)] for s in scenes))
+    finally:
+        # Sceny porzucone (np. fallback wygenerował inny skrypt) lub przerwane błędem
+        for task in dispatched.values():
+            task.cancel()
+
+    segment_paths = []
+    for i, (audio_bytes, _) in enumerate(results):
+        path = os.path.join(work_dir, f"scene_{i}_voice.{_audio_ext(audio_bytes)}")
+        with open(path, "wb") as f:
+            f.write(audio_bytes)
+        segment_paths.append(path)
+
+    audio_path = os.path.join(work_dir, "narration.mp3")
+    durations = await VideoRenderer(work_dir=work_dir).concat_audio(segment_paths, audio_path)
+
+    enriched_scenes = [
+        {**enriched, "audio_duration": round(duration, 3)}
+        for (_, enriched), duration in zip(results, durations, strict=True)
+    ]
+    return best_hook, script_data, enriched_scenes, audio_path
+
+
+def _build_scenes(hook: str, script_data: dict) -> list[dict]:
+    """Sceny do renderu: hook + sceny skryptu + CTA."""
+    scenes = []
+    if hook:
+        scenes.append({
+            "text": hook,
+            "visual_description": "dramatic attention-grabbing visual",
+            "duration_hint": "3",
+        })
+    scenes.extend(script_data.get("scenes", []))
+    if script_data.get("call_to_action"):
+        scenes.append({
+            "text": script_data["call_to_action"],
+            "visual_description": "subscribe follow button animation",
+            "duration_hint": "3",
+        })
+    return scenes
+
+
+def _scene_key(scene: dict) -> tuple[str, str]:
+    return scene.get("text", ""), scene.get("visual_description", "")
+
+
+def _audio_ext(audio_bytes: bytes) -> str:
+    """Provider "local" zwraca WAV (nagłówek RIFF), pozostałe MP3."""
+    return "wav" if audio_bytes[:4] == b"RIFF" else "mp3"
+
+
+async def _series_used_media(db, series_id, video_id) -> set[str]:
+    """URL-e zdjęć i klipów z ostatnich odcinków serii (bez bieżącego wideo)."""
+    from sqlalchemy import select
+
+    from app.core.config import get_settings
+    from app.models.video import Video
+
+    result = await db.execute(
+        select(Video.media_assets)
+        .where(Video.series_id == series_id, Video.id != video_id)
+        .order_by(Video.created_at.desc())
+        .limit(get_settings().SERIES_MEDIA_HISTORY_VIDEOS)
+    )
+    return {
+        url
+        for assets in result.scalars()
+        for kind in ("images", "clips")
+        for url in (assets or {}).get(kind, [])
+        if url
+    }
+
+
 async def _set_video_status(video_id: str, status: str, error_msg: str | None = None):
     """Aktualizuje status wideo w bazie (error recovery)."""
     from sqlalchemy import select
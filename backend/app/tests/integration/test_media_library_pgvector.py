@@ -0,0 +1,142 @@
+"""
+Testy biblioteki mediów na PostgreSQL + pgvector (wyszukiwanie po podobieństwie opisu).
+
+Wymagają bazy z rozszerzeniem vector pod DATABASE_URL (jak w CI) — bez niej są pomijane.
+"""
+
+import io
+
+import numpy as np
+import pytest
+import pytest_asyncio
+from PIL import Image
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import get_settings
+from app.models.media_asset import MediaAsset
+from app.services.media import media_library
+
+settings = get_settings()
+
+SCENES = [{"text": "Jezioro", "visual_description": "Mountain lake at sunrise"}]
+
+
+def _unit(*weights: float) -> list[float]:
+    vector = [0.0] * settings.EMBEDDING_DIMENSIONS
+    vector[: len(weights)] = weights
+    return vector
+
+
+@pytest_asyncio.fixture
+async def pg_session_factory():
+    engine = create_async_engine(str(settings.DATABASE_URL))
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+            await conn.run_sync(MediaAsset.__table__.create, checkfirst=True)
+            await conn.execute(delete(MediaAsset))
+    except Exception as e:
+        await engine.dispose()
+        pytest.skip(f"PostgreSQL z pgvector niedostępny: {e}")
+
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.execute(delete(MediaAsset))
+    await engine.dispose()
+
+
+@pytest.fixture
+def library(monkeypatch):
+    """Włączona biblioteka; embedding opisu sceny i Pexels podmieniane w teście."""
+    monkeypatch.setattr(settings, "OPENAI_API_KEY", "sk-test")  # klient przy imporcie
+    from app.services.llm import embeddings
+
+    monkeypatch.setattr(settings, "MEDIA_LIBRARY_ENABLED", True)
+    pexels_calls: list[list[dict]] = []
+
+    async def fake_find(scenes, exclude_urls=None):
+        pexels_calls.append(scenes)
+        return [{**s, "media_url": "https://pexels/lake.jpg"} for s in scenes]
+
+    monkeypatch.setattr(media_library, "find_media_for_scenes", fake_find)
+
+    def embed_as(vector: list[float]) -> None:
+        async def fake_embed(texts):
+            return [vector for _ in texts]
+
+        monkeypatch.setattr(embeddings, "embed_texts", fake_embed)
+
+    return embed_as, pexels_calls
+
+
+async def _add_asset(session_factory, embedding: list[float]) -> None:
+    async with session_factory() as db:
+        db.add(
+            MediaAsset(
+                source_url="https://pexels/old-lake.jpg",
+                description="Mountain lake",
+                embedding=embedding,
+                storage_key="media/library/old-lake.jpg",
+                public_url="https://cdn/old-lake.jpg",
+                use_count=1,
+            )
+        )
+        await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_similar_scene_reuses_library_asset(pg_session_factory, library):
+    embed_as, pexels_calls = library
+    await _add_asset(pg_session_factory, _unit(1.0))
+    embed_as(_unit(1.0, 0.2))  # cosine ≈ 0.98 ≥ próg
+
+    [scene] = await media_library.find_scene_media(SCENES, session_factory=pg_session_factory)
+
+    assert scene["media_url"] == "https://cdn/old-lake.jpg"
+    assert pexels_calls == []
+    async with pg_session_factory() as db:
+        asset = await db.scalar(select(MediaAsset))
+    assert asset.use_count == 2
+
+
+@pytest.mark.asyncio
+async def test_dissimilar_scene_falls_back_to_pexels_and_is_ingested(
+    pg_session_factory, library, monkeypatch
+):
+    embed_as, pexels_calls = library
+    await _add_asset(pg_session_factory, _unit(1.0))
+    embed_as(_unit(0.0, 1.0))  # cosine 0 < próg
+
+    async def fake_download(client, url):
+        noise = np.random.default_rng(7).integers(0, 256, (48, 27, 3), dtype=np.uint8)
+        src = io.BytesIO()
+        Image.fromarray(noise).resize((540, 960)).save(src, "PNG")
+        data, width, height, image_hash = media_library.normalize_image(src.getvalue())
+        return {"data": data, "width": width, "height": height, "phash": image_hash}
+
+    async def fake_store(image):
+        return {
+            "storage_key": "media/library/new.jpg",
+            "public_url": "https://cdn/new.jpg",
+            "width": image["width"],
+            "height": image["height"],
+            "size_bytes": len(image["data"]),
+            "phash": media_library.to_signed(image["phash"]),
+        }
+
+    monkeypatch.setattr(media_library, "_download", fake_download)
+    monkeypatch.setattr(media_library, "_store", fake_store)
+
+    [scene] = await media_library.find_scene_media(SCENES, session_factory=pg_session_factory)
+
+    assert len(pexels_calls) == 1
+    assert scene["media_url"] == "https://cdn/new.jpg"
+    async with pg_session_factory() as db:
+        new = await db.scalar(
+            select(MediaAsset).where(MediaAsset.source_url == "https://pexels/lake.jpg")
+        )
+    assert new is not None
+    assert new.description == "mountain lake at sunrise"  # scene_query
+    assert str(new.id) == scene["media_asset_id"]
@@ -71,3 +71,13 @@ async def test_get_me(client: AsyncClient, auth_headers):
 async def test_get_me_unauthorized(client: AsyncClient):
     response = await client.get("/api/v1/users/me")
     assert response.status_code == 403  # no auth header
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["llm-cache", "retry-amplification", "api-latency", "llm-usage"])
+async def test_global_stats_require_admin(client: AsyncClient, auth_headers, monkeypatch, path):
+    from app.core.config import get_settings
+
+    monkeypatch.setattr(get_settings(), "ADMIN_EMAILS", ["admin@example.com"])
+    response = await client.get(f"/api/v1/analytics/{path}", headers=auth_headers)
+    assert response.status_code == 403
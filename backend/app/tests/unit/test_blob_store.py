@@ -0,0 +1,71 @@
+"""Testy content-addressed storage (deduplikacja uploadów, GC bez referencji)."""
+
+import uuid
+
+import pytest
+from sqlalchemy import delete, func, select
+
+from app.models.stored_blob import BlobReference, StoredBlob
+from app.services.video import blob_store
+from app.services.video.storage import StorageService
+from app.tests import conftest
+
+
+class _FakeStorage:
+    content_key = staticmethod(StorageService.content_key)
+    guess_content_type = staticmethod(StorageService.guess_content_type)
+
+    def __init__(self):
+        self.objects: dict[str, bytes] = {}
+        self.uploads = 0
+
+    async def exists(self, key):
+        return key in self.objects
+
+    async def upload_file(self, local_path, key, content_type=None):
+        self.uploads += 1
+        with open(local_path, "rb") as f:
+            self.objects[key] = f.read()
+        return self.public_url(key)
+
+    async def delete_file(self, key):
+        self.objects.pop(key, None)
+
+    def public_url(self, key):
+        return f"https://cdn/{key}"
+
+
+@pytest.mark.asyncio
+async def test_identical_content_is_uploaded_once_and_collected_when_unreferenced(tmp_path):
+    storage = _FakeStorage()
+    first, second = tmp_path / "a.mp3", tmp_path / "b.mp3"
+    first.write_bytes(b"same narration")
+    second.write_bytes(b"same narration")
+    video_a, video_b = uuid.uuid4(), uuid.uuid4()
+
+    async with conftest.test_session_factory() as db:
+        store = blob_store.store_file
+        url_a = await store(db, storage, str(first), video_id=video_a, role="voice")
+        url_b = await store(db, storage, str(second), video_id=video_b, role="voice")
+        await db.commit()
+
+        assert url_a == url_b
+        assert "/cas/" in url_a
+        assert storage.uploads == 1
+        assert await db.scalar(select(func.count()).select_from(BlobReference)) == 2
+
+        # Jedno wideo nadal wskazuje blob — GC go nie rusza
+        await db.execute(delete(BlobReference).where(BlobReference.video_id == video_a))
+        await db.commit()
+        stats = await blob_store.collect_unreferenced_blobs(db, storage, grace_hours=0)
+        assert stats["blobs"] == 0
+
+        await db.execute(delete(BlobReference))
+        await db.commit()
+        dry = await blob_store.collect_unreferenced_blobs(db, storage, grace_hours=0, dry_run=True)
+        assert dry["blobs"] == 1 and storage.objects
+
+        stats = await blob_store.collect_unreferenced_blobs(db, storage, grace_hours=0)
+        assert stats == {"blobs": 1, "bytes": len(b"same narration"), "dry_run": False}
+        assert storage.objects == {}
+        assert await db.scalar(select(func.count()).select_from(StoredBlob)) == 0
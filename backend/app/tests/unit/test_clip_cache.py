@@ -0,0 +1,53 @@
+"""Testy cache klipów mezzanine (eksmisja LRU, przycinanie w concat, deduplikacja)."""
+
+import asyncio
+import os
+
+import pytest
+
+from app.core.config import get_settings
+from app.services.video.clip_cache import CachedClip, ClipCache
+from app.services.video.renderer import VideoRenderer, _trim_entries
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    cache = ClipCache(cache_dir=str(tmp_path), max_bytes=250)
+    for i, name in enumerate(["old", "mid", "new"]):
+        (tmp_path / f"{name}.mp4").write_bytes(b"x" * 100)
+        (tmp_path / f"{name}.json").write_text("{}")
+        os.utime(tmp_path / f"{name}.mp4", (1000 + i, 1000 + i))
+
+    assert cache.evict() == 1
+    assert sorted(p.name for p in tmp_path.glob("*.mp4")) == ["mid.mp4", "new.mp4"]
+    assert not (tmp_path / "old.json").exists()
+
+
+def test_trim_entries_loops_and_cuts_last_segment():
+    assert _trim_entries("/c/a.mp4", 10.0, 4.0) == ["file '/c/a.mp4'", "outpoint 4.000"]
+    assert _trim_entries("/c/a.mp4", 3.0, 7.5) == [
+        "file '/c/a.mp4'",
+        "file '/c/a.mp4'",
+        "file '/c/a.mp4'",
+        "outpoint 1.500",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_scenes_sharing_a_clip_fetch_it_once(tmp_path, monkeypatch):
+    calls: list[str] = []
+
+    async def fake_get(self, client, url):
+        calls.append(url)
+        await asyncio.sleep(0)  # pozostałe sceny startują, zanim klip jest gotowy
+        return CachedClip(f"/cache/{url[-5:]}", 10.0)
+
+    monkeypatch.setattr(ClipCache, "get", fake_get)
+    monkeypatch.setattr(get_settings(), "CLIP_CACHE_DIR", str(tmp_path / "cache"))
+    urls = ["https://v/a.mp4", "https://v/b.mp4", "https://v/a.mp4"]
+    scenes = [{"clip_url": url} for url in urls]
+
+    concat = await VideoRenderer(str(tmp_path))._prepare_scene_clips(scenes, 9.0)
+
+    assert sorted(calls) == ["https://v/a.mp4", "https://v/b.mp4"]
+    with open(concat) as f:
+        assert f.read().count("file '/cache/a.mp4'") == 2
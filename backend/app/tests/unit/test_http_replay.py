@@ -0,0 +1,47 @@
+"""Testy nagrywania i odtwarzania odpowiedzi providerów."""
+
+import httpx
+import pytest
+
+from app.core.http_replay import FixtureNotFoundError, ReplayTransport, request_key
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay_offline(tmp_path):
+    calls = []
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(200, json={"choices": [{"text": "ok"}]})
+
+    recorder = ReplayTransport("openai", "record", tmp_path)
+    recorder._live = httpx.MockTransport(upstream)
+    async with httpx.AsyncClient(transport=recorder) as client:
+        recorded = await client.post(
+            "https://api.openai.com/v1/chat/completions",
+            headers={"Authorization": "Bearer sk-live"},
+            json={"model": "gpt-4", "messages": [{"role": "user", "content": "Cześć"}]},
+        )
+
+    player = ReplayTransport("openai", "replay", tmp_path)
+    async with httpx.AsyncClient(transport=player) as client:
+        # Inny klucz API i kolejność pól w body — to samo nagranie
+        replayed = await client.post(
+            "https://api.openai.com/v1/chat/completions",
+            headers={"Authorization": "Bearer sk-other"},
+            json={"messages": [{"role": "user", "content": "Cześć"}], "model": "gpt-4"},
+        )
+        with pytest.raises(FixtureNotFoundError):
+            await client.post(
+                "https://api.openai.com/v1/chat/completions", json={"model": "gpt-3.5-turbo"}
+            )
+
+    assert len(calls) == 1
+    assert replayed.status_code == 200
+    assert replayed.json() == recorded.json()
+
+
+def test_request_key_depends_on_query():
+    a = httpx.Request("GET", "https://api.pexels.com/v1/search", params={"query": "las"})
+    b = httpx.Request("GET", "https://api.pexels.com/v1/search", params={"query": "morze"})
+    assert request_key(a) != request_key(b)
@@ -0,0 +1,197 @@
+"""Testy pollera kontenerów Instagram (statusy hurtem, publikacja gotowych, backoff)."""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.models.platform_connection import PlatformConnection
+from app.models.publish_job import PublishJob, PublishStatus
+from app.models.series import Series
+from app.models.video import Video, VideoStatus
+from app.services.publishing.instagram_publisher import InstagramPublisher
+from app.tasks import publishing
+from app.tests import conftest
+
+
+def _state(container_id: str, next_poll_at: datetime) -> dict:
+    return {
+        "instagram": {
+            "container_id": container_id,
+            "ig_user_id": "ig1",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "polls": 0,
+            "next_poll_at": next_poll_at.isoformat(),
+        }
+    }
+
+
+@pytest.mark.asyncio
+async def test_ready_containers_are_published_and_others_back_off(test_user, monkeypatch):
+    monkeypatch.setattr("app.core.database.async_session_factory", conftest.test_session_factory)
+    status_calls: list[list[str]] = []
+
+    async def statuses(self, access_token, container_ids):
+        status_calls.append(sorted(container_ids))
+        return {"c-ready": {"status_code": "FINISHED"}, "c-busy": {"status_code": "IN_PROGRESS"}}
+
+    async def publish(self, access_token, ig_user_id, container_id):
+        return {"media_id": f"m-{container_id}", "url": "https://instagram.com/reel/x/"}
+
+    monkeypatch.setattr(InstagramPublisher, "container_statuses", statuses)
+    monkeypatch.setattr(InstagramPublisher, "publish_container", publish)
+
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    future = datetime.now(timezone.utc) + timedelta(minutes=5)
+    series_id = uuid.uuid4()
+    async with conftest.test_session_factory() as db:
+        db.add(Series(id=series_id, user_id=test_user.id, title="S", topic="t"))
+        db.add(PlatformConnection(user_id=test_user.id, platform="instagram", access_token="tok"))  # noqa: S106
+        jobs = {}
+        for container_id, due in (("c-ready", past), ("c-busy", past), ("c-later", future)):
+            video = Video(series_id=series_id)
+            db.add(video)
+            await db.flush()
+            jobs[container_id] = PublishJob(
+                video_id=video.id,
+                platform="instagram",
+                status=PublishStatus.PROCESSING,
+                metadata_extra=_state(container_id, due),
+            )
+            db.add(jobs[container_id])
+        await db.commit()
+        job_ids = {cid: job.id for cid, job in jobs.items()}
+
+    stats = await publishing._poll_instagram_containers()
+
+    assert stats == {"checked": 2, "published": 1, "failed": 0, "pending": 1}
+    assert status_calls == [["c-busy", "c-ready"]]  # jedno zapytanie dla konta
+    async with conftest.test_session_factory() as db:
+        ready = await db.get(PublishJob, job_ids["c-ready"])
+        busy = await db.get(PublishJob, job_ids["c-busy"])
+        video = (await db.execute(select(Video).where(Video.id == ready.video_id))).scalar_one()
+
+    assert ready.status == PublishStatus.PUBLISHED
+    assert ready.platform_content_id == "m-c-ready"
+    assert video.status == VideoStatus.PUBLISHED
+    assert video.platform_ids["instagram_id"] == "m-c-ready"
+    assert busy.status == PublishStatus.PROCESSING
+    assert busy.metadata_extra["instagram"]["polls"] == 1
+    assert datetime.fromisoformat(busy.metadata_extra["instagram"]["next_poll_at"]) > past
+
+
+async def _add_jobs(test_user, extras: dict[str, dict]) -> dict[str, uuid.UUID]:
+    series_id = uuid.uuid4()
+    async with conftest.test_session_factory() as db:
+        db.add(Series(id=series_id, user_id=test_user.id, title="S", topic="t"))
+        db.add(PlatformConnection(user_id=test_user.id, platform="instagram", access_token="tok"))  # noqa: S106
+        jobs = {}
+        for name, extra in extras.items():
+            video = Video(series_id=series_id)
+            db.add(video)
+            await db.flush()
+            jobs[name] = PublishJob(
+                video_id=video.id,
+                platform="instagram",
+                status=PublishStatus.PROCESSING,
+                metadata_extra=extra,
+            )
+            db.add(jobs[name])
+        await db.commit()
+        return {name: job.id for name, job in jobs.items()}
+
+
+@pytest.mark.asyncio
+async def test_malformed_state_fails_only_that_job(test_user, monkeypatch):
+    monkeypatch.setattr("app.core.database.async_session_factory", conftest.test_session_factory)
+
+    async def statuses(self, access_token, container_ids):
+        return {cid: {"status_code": "IN_PROGRESS"} for cid in container_ids}
+
+    monkeypatch.setattr(InstagramPublisher, "container_statuses", statuses)
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    bad_date = _state("c-bad-date", past)
+    bad_date["instagram"]["created_at"] = "wczoraj"
+    job_ids = await _add_jobs(
+        test_user,
+        {"missing": {}, "bad-date": bad_date, "ok": _state("c-ok", past)},
+    )
+
+    stats = await publishing._poll_instagram_containers()
+
+    assert stats == {"checked": 1, "published": 0, "failed": 2, "pending": 1}
+    async with conftest.test_session_factory() as db:
+        jobs = {name: await db.get(PublishJob, job_id) for name, job_id in job_ids.items()}
+    assert jobs["missing"].status == jobs["bad-date"].status == PublishStatus.FAILED
+    assert jobs["ok"].status == PublishStatus.PROCESSING
+
+
+@pytest.mark.asyncio
+async def test_claimed_jobs_are_skipped_by_overlapping_run(test_user, monkeypatch):
+    monkeypatch.setattr("app.core.database.async_session_factory", conftest.test_session_factory)
+    overlapping: list[dict] = []
+
+    async def statuses(self, access_token, container_ids):
+        # Drugi przebieg w trakcie wywołania API — baza nie jest zablokowana,
+        # a zajęte zadanie nie jest jeszcze należne
+        overlapping.append(await publishing._poll_instagram_containers())
+        return {cid: {"status_code": "IN_PROGRESS"} for cid in container_ids}
+
+    monkeypatch.setattr(InstagramPublisher, "container_statuses", statuses)
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    await _add_jobs(test_user, {"a": _state("c-a", past)})
+
+    stats = await publishing._poll_instagram_containers()
+
+    assert stats["checked"] == 1 and stats["pending"] == 1
+    assert overlapping == [{"checked": 0, "published": 0, "failed": 0, "pending": 0}]
+
+
+@pytest.mark.asyncio
+async def test_published_container_completes_job_after_lost_write(test_user, monkeypatch):
+    monkeypatch.setattr("app.core.database.async_session_factory", conftest.test_session_factory)
+    code = {"c-a": "FINISHED", "c-b": "PUBLISHED"}
+
+    async def statuses(self, access_token, container_ids):
+        return {cid: {"status_code": code[cid]} for cid in container_ids}
+
+    async def publish(self, access_token, ig_user_id, container_id):
+        return {
+            "media_id": f"m-{container_id}",
+            "url": f"https://instagram.com/reel/{container_id}/",
+        }
+
+    def lost_write(*args):
+        raise RuntimeError("commit nieudany")
+
+    monkeypatch.setattr(InstagramPublisher, "container_statuses", statuses)
+    monkeypatch.setattr(InstagramPublisher, "publish_container", publish)
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    # c-b: media_publish przeszedł, ale media_id nie zdążył trafić do bazy
+    job_ids = await _add_jobs(test_user, {"a": _state("c-a", past), "b": _state("c-b", past)})
+
+    with monkeypatch.context() as m:
+        m.setattr(publishing, "_mark_published", lost_write)
+        with pytest.raises(RuntimeError):
+            await publishing._poll_instagram_containers()
+
+    code["c-a"] = "PUBLISHED"
+    async with conftest.test_session_factory() as db:
+        for job_id in job_ids.values():
+            job = await db.get(PublishJob, job_id)
+            assert job.status == PublishStatus.PROCESSING
+            state = {**job.metadata_extra["instagram"], "next_poll_at": past.isoformat()}
+            job.metadata_extra = {**job.metadata_extra, "instagram": state}
+        await db.commit()
+
+    stats = await publishing._poll_instagram_containers()
+
+    assert stats == {"checked": 2, "published": 2, "failed": 0, "pending": 0}
+    async with conftest.test_session_factory() as db:
+        a = await db.get(PublishJob, job_ids["a"])
+        b = await db.get(PublishJob, job_ids["b"])
+    assert a.status == b.status == PublishStatus.PUBLISHED
+    assert a.platform_content_id == "m-c-a"
+    assert a.platform_url == "https://instagram.com/reel/c-a/"
+    assert b.platform_content_id is None
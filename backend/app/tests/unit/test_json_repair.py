@@ -0,0 +1,101 @@
+"""Testy lokalnej naprawy JSON-a i walidacji schematu scenariusza."""
+
+import json
+
+import pytest
+
+from app.services.llm.json_repair import JSONRepairError, repair_json
+from app.services.llm.script_schema import parse_script_response
+
+SCRIPT = {
+    "title": "Tytuł z {nawiasem}",
+    "hook": "Czy wiesz, że...",
+    "scenes": [
+        {"text": "Pierwsza, z przecinkiem", "visual_description": "a", "duration_hint": "5"},
+        {"text": "Druga", "visual_description": "b", "duration_hint": "7"},
+    ],
+    "call_to_action": "Obserwuj!",
+    "tags": ["a", "b"],
+}
+
+
+def test_repair_fence_and_trailing_commas():
+    raw = '```json\n{"title": "T", "scenes": [{"text": "x",},], "tags": ["a",],}\n```'
+    assert repair_json(raw) == {"title": "T", "scenes": [{"text": "x"}], "tags": ["a"]}
+
+
+def test_repair_text_after_object():
+    raw = json.dumps(SCRIPT, ensure_ascii=False) + "\nMam nadzieję, że pomogłem! }"
+    assert repair_json(raw) == SCRIPT
+
+
+def test_every_truncation_recovers_an_object():
+    raw = json.dumps(SCRIPT, ensure_ascii=False, indent=2)
+    texts = {s["text"] for s in SCRIPT["scenes"]}
+    for cut in range(1, len(raw)):
+        data = repair_json(raw[:cut])
+        for scene in data.get("scenes", []):
+            # Tekst sceny nigdy nie jest urwany w połowie
+            assert scene.get("text") in texts | {None}
+
+
+def test_truncated_scene_is_dropped():
+    raw = json.dumps(SCRIPT, ensure_ascii=False)
+    cut = raw.index('"Druga') + 4
+    data = repair_json(raw[:cut])
+    assert data["scenes"] == SCRIPT["scenes"][:1]
+
+
+def test_no_object_raises():
+    with pytest.raises(JSONRepairError):
+        repair_json("Przepraszam, nie mogę pomóc.")
+
+
+def test_schema_fills_defaults_and_reports_missing():
+    result = parse_script_response('{"scenes": [{"text": "A", "duration_hint": 6}, {"text": ""}]')
+    assert result.data["title"] == "Bez tytułu"
+    assert result.data["scenes"] == [
+        {"text": "A", "visual_description": "", "duration_hint": "6"}
+    ]
+    assert "title" in result.missing
+    assert not result.needs_scenes
+
+
+def test_schema_flags_missing_scenes_and_splits_tags():
+    result = parse_script_response('{"title": "T", "tags": "a, b ,c"}')
+    assert result.needs_scenes
+    assert result.data["tags"] == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_fallback_output_goes_through_fragment_repair(monkeypatch):
+    from types import SimpleNamespace
+
+    from app.core.config import get_settings
+
+    # klient OpenAI powstaje przy imporcie modułu
+    monkeypatch.setattr(get_settings(), "OPENAI_API_KEY", "sk-test")
+    from app.services.llm import script_generator
+
+    replies = iter(
+        [
+            json.dumps({"title": "Z fallbacku", "hook": "H"}),  # tańszy model bez scen
+            json.dumps({"scenes": SCRIPT["scenes"]}),  # dopytanie o fragment
+        ]
+    )
+    paths = []
+
+    async def fake_create(operation, path, **kwargs):
+        paths.append(path)
+        message = SimpleNamespace(content=next(replies))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    monkeypatch.setattr(script_generator, "_create", fake_create)
+
+    raw, script = await script_generator._parse_and_repair(
+        "generate_script", "Przepraszam, nie mogę pomóc.", []
+    )
+
+    assert paths == ["fallback", "repair_fragment"]
+    assert script["title"] == "Z fallbacku"
+    assert [s["text"] for s in script["scenes"]] == ["Pierwsza, z przecinkiem", "Druga"]
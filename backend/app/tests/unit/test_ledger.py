@@ -0,0 +1,121 @@
+"""Testy ledgera wywołań API (bufor, zapis hurtowy, agregacje)."""
+
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from app.models.api_call import ApiCallRecord
+from app.services.analytics import ledger
+from app.tests import conftest
+
+
+@pytest.mark.asyncio
+async def test_track_flush_and_latency_percentiles(client: AsyncClient, auth_headers, monkeypatch):
+    monkeypatch.setattr(ledger.settings, "ADMIN_EMAILS", ["test@example.com"])
+    before = ledger.pending_records()
+    for _ in range(10):
+        with ledger.track_call("pexels", "search_photo"):
+            pass
+    with (
+        pytest.raises(RuntimeError),
+        ledger.track_call("elevenlabs", "synthesize", characters=1000),
+    ):
+        raise RuntimeError("boom")
+    with ledger.track_call("openai", "generate_script", model="gpt-4") as call:
+        call.set_usage(SimpleNamespace(prompt_tokens=1000, completion_tokens=500))
+    with ledger.track_call(
+        "openai", "generate_script", model="gpt-3.5-turbo", path="fallback"
+    ) as call:
+        call.set_usage(SimpleNamespace(prompt_tokens=1000, completion_tokens=500))
+
+    assert ledger.pending_records() == before + 13
+    async with conftest.test_session_factory() as db:
+        assert await ledger.flush_ledger(db) == before + 13
+        usage = await ledger.usage_by_path(db)
+    assert ledger.pending_records() == 0
+
+    response = await client.get("/api/v1/analytics/api-latency", headers=auth_headers)
+    assert response.status_code == 200
+    providers = response.json()["providers"]
+    assert providers["pexels"]["calls"] == 10
+    assert providers["elevenlabs"]["error_rate"] == 1.0
+    assert providers["openai"]["p95_ms"] >= providers["openai"]["p50_ms"]
+
+    paths = usage["generate_script"]
+    assert paths["primary"]["tokens"] == paths["fallback"]["tokens"] == 1500
+    assert paths["fallback"]["cost_usd"] < paths["primary"]["cost_usd"]
+
+
+def test_latency_percentiles_computed_in_postgres():
+    from datetime import datetime, timezone
+
+    from sqlalchemy.dialects import postgresql
+
+    sql = str(
+        ledger._latency_query(datetime.now(timezone.utc)).compile(dialect=postgresql.dialect())
+    )
+    assert "percentile_cont" in sql and "WITHIN GROUP (ORDER BY" in sql
+    assert "GROUP BY api_call_records.provider" in sql
+
+
+def test_cost_estimate_uses_model_pricing():
+    settings = ledger.settings
+    primary = ledger.CallRecord("openai", "generate_script", model="gpt-4")
+    primary.set_usage(SimpleNamespace(prompt_tokens=2000, completion_tokens=1000))
+    assert primary.cost_usd == pytest.approx(
+        2 * settings.COST_OPENAI_PROMPT_PER_1K + settings.COST_OPENAI_COMPLETION_PER_1K
+    )
+
+    fallback = ledger.CallRecord("openai", "generate_script", model="gpt-3.5-turbo")
+    fallback.set_usage(SimpleNamespace(prompt_tokens=2000, completion_tokens=1000))
+    assert fallback.cost_usd < primary.cost_usd
+
+    tts = ledger.CallRecord("elevenlabs", "synthesize", characters=500)
+    assert tts.cost_usd == pytest.approx(0.5 * settings.COST_ELEVENLABS_PER_1K_CHARS)
+
+
+def test_percentile_interpolates():
+    assert ledger._percentile([10.0, 20.0, 30.0, 40.0], 0.5) == 25.0
+    assert ledger._percentile([], 0.95) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_flush_drops_only_rejected_rows():
+    await _drain()
+    with ledger.track_call("pexels", "search_photo"):
+        pass
+    with ledger.track_call("s3", "upload_file", payload_bytes=3 * 1024**3):  # > int32
+        pass
+    ledger._buffer.insert(1, {**ledger._buffer[0], "provider": None})  # NOT NULL
+
+    async with conftest.test_session_factory() as db:
+        assert await ledger.flush_ledger(db) == 2
+        providers = await db.scalars(
+            select(ApiCallRecord.provider).order_by(ApiCallRecord.payload_bytes)
+        )
+        assert list(providers)[-2:] == ["pexels", "s3"]
+    assert ledger.pending_records() == 0
+
+
+@pytest.mark.asyncio
+async def test_flush_requeues_on_connection_failure(monkeypatch):
+    await _drain()
+    with ledger.track_call("pexels", "search_photo"):
+        pass
+
+    async def down(db, rows):
+        raise OperationalError("INSERT", {}, ConnectionRefusedError())
+
+    monkeypatch.setattr(ledger, "_insert", down)
+    async with conftest.test_session_factory() as db:
+        assert await ledger.flush_ledger(db) == 0
+    assert ledger.pending_records() == 1
+    ledger._buffer.clear()
+
+
+async def _drain() -> None:
+    async with conftest.test_session_factory() as db:
+        await ledger.flush_ledger(db)
@@ -0,0 +1,58 @@
+"""Testy lokalnego backendu storage (upload bez kopiowania, route z Range)."""
+
+import os
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api import media
+from app.services.video import storage
+
+
+@pytest.fixture
+def local_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage.settings, "STORAGE_BACKEND", "local")
+    monkeypatch.setattr(storage.settings, "LOCAL_STORAGE_DIR", str(tmp_path / "store"))
+    monkeypatch.setattr(
+        storage.settings, "LOCAL_STORAGE_PUBLIC_URL", "http://testserver/media"
+    )
+    media._store.cache_clear()
+    yield tmp_path
+    media._store.cache_clear()
+
+
+def test_upload_is_hardlink_with_s3_url_contract(local_backend):
+    source = local_backend / "render.mp4"
+    source.write_bytes(b"video" * 100)
+    service = storage.StorageService()
+
+    url = service.upload_file(str(source), "videos/s1/a.mp4")
+
+    stored = service.local.path("videos/s1/a.mp4")
+    assert os.path.samestat(source.stat(), stored.stat())  # ten sam i-węzeł, źródło zostaje
+    assert url == f"http://testserver/media/{service.bucket}/videos/s1/a.mp4"
+    assert service.key_from_url(url) == "videos/s1/a.mp4"
+    assert not list(stored.parent.glob("*.part"))
+
+    with pytest.raises(ValueError):
+        service.local.path("../escape.mp4")
+
+
+@pytest.mark.asyncio
+async def test_media_route_serves_byte_ranges(local_backend):
+    service = storage.StorageService()
+    url = service.upload_bytes(bytes(range(256)), "audio/s1/v.mp3", "audio/mpeg")
+
+    app = FastAPI()
+    app.include_router(media.router, prefix=media.route_prefix())
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        resp = await client.get(url, headers={"Range": "bytes=10-19"})
+        missing = await client.get(f"/media/{service.bucket}/..%2F..%2Fetc/passwd")
+
+    assert resp.status_code == 206
+    assert resp.content == bytes(range(10, 20))
+    assert resp.headers["content-range"] == "bytes 10-19/256"
+    assert resp.headers["content-type"] == "audio/mpeg"
+    assert missing.status_code == 404
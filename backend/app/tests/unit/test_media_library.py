@@ -0,0 +1,174 @@
+"""Testy biblioteki mediów (normalizacja zdjęć, fallback do Pexels, zapis zasobów)."""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+from sqlalchemy import func, select
+
+from app.models.media_asset import MediaAsset
+from app.services.media import media_library
+from app.services.media.images import fit_to_frame
+from app.tests import conftest
+
+EMBEDDING = [1.0] + [0.0] * (media_library.settings.EMBEDDING_DIMENSIONS - 1)
+
+
+@pytest.fixture(autouse=True)
+def fresh_hash_index():
+    """Indeks pHash jest per proces, a baza testowa — per test."""
+    media_library._library_hashes.reset()
+    yield
+    media_library._library_hashes.reset()
+
+
+def _photo_bytes(seed: int, size: tuple[int, int] = (540, 960)) -> bytes:
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (48, 27, 3), dtype=np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(noise).resize(size, Image.Resampling.BICUBIC).save(out, "PNG")
+    return out.getvalue()
+
+
+def _fake_library_io(monkeypatch, photos: dict[str, bytes], stored: list[str]):
+    """Pobranie z Pexels i zapis do S3 bez sieci — normalizacja i pHash prawdziwe."""
+
+    async def fake_download(client, url):
+        data, width, height, image_hash = media_library.normalize_image(photos[url])
+        return {"data": data, "width": width, "height": height, "phash": image_hash}
+
+    async def fake_store(image):
+        key = f"media/library/{len(stored)}.jpg"
+        stored.append(key)
+        return {
+            "storage_key": key,
+            "public_url": f"https://cdn/{key}",
+            "content_type": "image/jpeg",
+            "width": image["width"],
+            "height": image["height"],
+            "size_bytes": len(image["data"]),
+            "phash": media_library.to_signed(image["phash"]),
+        }
+
+    monkeypatch.setattr(media_library, "_download", fake_download)
+    monkeypatch.setattr(media_library, "_store", fake_store)
+
+
+def test_normalize_image_crops_to_portrait_jpeg():
+    src = io.BytesIO()
+    Image.new("RGB", (1600, 900), (40, 120, 200)).save(src, "PNG")
+
+    data, width, height, _ = media_library.normalize_image(src.getvalue())
+
+    assert (width, height) == (1080, 1920)
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.format == "JPEG"
+        assert img.size == (1080, 1920)
+
+
+@pytest.mark.asyncio
+async def test_disabled_library_goes_straight_to_pexels(monkeypatch):
+    calls = []
+
+    async def fake_find(scenes, exclude_urls=None):
+        calls.append(scenes)
+        return [{**s, "media_url": "https://img/x.jpg"} for s in scenes]
+
+    monkeypatch.setattr(media_library.settings, "MEDIA_LIBRARY_ENABLED", False)
+    monkeypatch.setattr(media_library, "find_media_for_scenes", fake_find)
+
+    scenes = [{"text": "a", "visual_description": "Mountain lake"}]
+    result = await media_library.find_scene_media(scenes, session_factory=lambda: None)
+
+    assert result[0]["media_url"] == "https://img/x.jpg"
+    assert len(calls) == 1
+
+
+def test_fit_to_frame_uses_draft_decode_for_large_jpeg():
+    src = io.BytesIO()
+    Image.new("RGB", (4000, 3000), (200, 30, 30)).save(src, "JPEG")
+
+    frame = fit_to_frame(src.getvalue(), (1080, 1920))
+
+    assert frame.size == (1080, 1920)
+    assert frame.mode == "RGB"
+
+
+@pytest.mark.asyncio
+async def test_ingest_writes_assets_and_stores_near_duplicates_once(monkeypatch):
+    photos = {
+        "https://pexels/a.jpg": _photo_bytes(1),
+        "https://pexels/a-large.jpg": _photo_bytes(1, (1080, 1920)),  # to samo zdjęcie
+        "https://pexels/b.jpg": _photo_bytes(2),
+    }
+    stored: list[str] = []
+    _fake_library_io(monkeypatch, photos, stored)
+
+    async with conftest.test_session_factory() as db:
+        assets = await media_library._ingest(
+            db, [("scene", EMBEDDING, url) for url in photos] + [("empty", EMBEDDING, None)]
+        )
+        await db.commit()
+
+    assert len(stored) == 2
+    assert assets[3] is None
+    assert assets[0].id == assets[1].id != assets[2].id
+    async with conftest.test_session_factory() as db:
+        rows = (await db.execute(select(MediaAsset))).scalars().all()
+    assert len(rows) == 2
+    assert {r.source_url for r in rows} >= {"https://pexels/b.jpg"}
+    assert all(r.phash is not None and r.public_url.startswith("https://cdn/") for r in rows)
+
+
+@pytest.mark.asyncio
+async def test_ingest_reuses_row_written_concurrently(monkeypatch):
+    url = "https://pexels/a.jpg"
+    stored: list[str] = []
+    _fake_library_io(monkeypatch, {url: _photo_bytes(3)}, stored)
+    store = media_library._store
+
+    async def store_racing_another_worker(image):
+        meta = await store(image)
+        async with conftest.test_session_factory() as other:
+            other.add(
+                MediaAsset(
+                    source_url=url,
+                    description="scene",
+                    embedding=EMBEDDING,
+                    storage_key="media/library/other.jpg",
+                    public_url="https://cdn/other.jpg",
+                )
+            )
+            await other.commit()
+        return meta
+
+    monkeypatch.setattr(media_library, "_store", store_racing_another_worker)
+
+    async with conftest.test_session_factory() as db:
+        [asset] = await media_library._ingest(db, [("scene", EMBEDDING, url)])
+        await db.commit()
+
+    assert asset.public_url == "https://cdn/other.jpg"
+    async with conftest.test_session_factory() as db:
+        assert await db.scalar(select(func.count()).select_from(MediaAsset)) == 1
+
+
+@pytest.mark.asyncio
+async def test_hash_index_loaded_once_and_extended_on_insert(monkeypatch):
+    photos = {"https://pexels/a.jpg": _photo_bytes(4), "https://pexels/a-2.jpg": _photo_bytes(4)}
+    stored: list[str] = []
+    _fake_library_io(monkeypatch, photos, stored)
+
+    async with conftest.test_session_factory() as db:
+        [first] = await media_library._ingest(db, [("scene", EMBEDDING, "https://pexels/a.jpg")])
+        await db.commit()
+    index = media_library._library_hashes.index
+    assert len(index) == 1
+
+    async with conftest.test_session_factory() as db:
+        [second] = await media_library._ingest(db, [("scene", EMBEDDING, "https://pexels/a-2.jpg")])
+
+    assert media_library._library_hashes.index is index  # bez ponownego odczytu z bazy
+    assert second.id == first.id
+    assert len(stored) == 1
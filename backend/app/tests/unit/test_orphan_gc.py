@@ -0,0 +1,112 @@
+"""Testy GC osieroconych artefaktów S3 (porównanie z referencjami, karencja, dry-run)."""
+
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.series import Series
+from app.models.video import Video
+from app.services.video import orphan_gc
+from app.services.video.storage import StorageService
+from app.tests import conftest
+
+OLD = datetime.now(timezone.utc) - timedelta(days=7)
+NEW = datetime.now(timezone.utc)
+
+
+class _FakeS3:
+    def __init__(self, objects: dict[str, datetime]):
+        self.objects = objects
+        self.delete_calls: list[int] = []
+
+    def get_paginator(self, name):
+        return self
+
+    def paginate(self, Bucket, Prefix, Delimiter=None):  # noqa: N803 — API boto3
+        keys = sorted(k for k in self.objects if k.startswith(Prefix))
+        if Delimiter:
+            prefixes = sorted({Prefix + k[len(Prefix) :].split("/")[0] + "/" for k in keys})
+            yield {"CommonPrefixes": [{"Prefix": p} for p in prefixes]}
+            return
+        for i in range(0, len(keys), 2):  # małe strony — test stronicowania
+            yield {
+                "Contents": [
+                    {"Key": k, "LastModified": self.objects[k], "Size": 10}
+                    for k in keys[i : i + 2]
+                ]
+            }
+
+    def delete_objects(self, Bucket, Delete):  # noqa: N803
+        self.delete_calls.append(len(Delete["Objects"]))
+        for obj in Delete["Objects"]:
+            self.objects.pop(obj["Key"])
+        return {}
+
+
+@pytest.mark.asyncio
+async def test_orphans_past_grace_period_are_deleted(test_user, monkeypatch):
+    series_id = uuid.uuid4()
+    live_audio, live_video = f"audio/{series_id}/a.mp3", f"videos/{series_id}/v.mp4"
+    orphan_audio, fresh_orphan = f"audio/{series_id}/old.mp3", f"videos/{series_id}/new.mp4"
+    gone_series = f"videos/{uuid.uuid4()}/x.mp4"  # seria usunięta z bazy
+    fake = _FakeS3({
+        live_audio: OLD,
+        live_video: OLD,
+        orphan_audio: OLD,
+        fresh_orphan: NEW,
+        gone_series: OLD,
+        "videos/not-a-series/keep.mp4": OLD,
+    })
+    storage = StorageService.__new__(StorageService)
+    storage.bucket, storage.s3, storage.local = "autoshorts-media", fake, None
+    monkeypatch.setattr("app.services.video.storage.settings.S3_PUBLIC_BASE_URL", "http://cdn")
+
+    async with conftest.test_session_factory() as db:
+        db.add(Series(id=series_id, user_id=test_user.id, title="S", topic="t"))
+        db.add(Video(
+            series_id=series_id,
+            voice_url=storage.public_url(live_audio),
+            video_url=storage.public_url(live_video),
+        ))
+        await db.commit()
+
+        dry = await orphan_gc.collect_orphaned_artifacts(db, storage, grace_hours=24)
+        assert dry.dry_run and dry.deleted == 0
+        assert sorted(dry.sample) == sorted([orphan_audio, gone_series])
+        assert len(fake.objects) == 6
+
+        report = await orphan_gc.collect_orphaned_artifacts(
+            db, storage, grace_hours=24, dry_run=False
+        )
+
+    assert report.deleted == 2
+    assert fake.delete_calls == [2]
+    assert sorted(fake.objects) == sorted(
+        [live_audio, live_video, fresh_orphan, "videos/not-a-series/keep.mp4"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_unparseable_reference_keeps_whole_series(test_user, monkeypatch):
+    series_id = uuid.uuid4()
+    old_audio = f"audio/{series_id}/a.mp3"
+    fake = _FakeS3({old_audio: OLD, f"videos/{series_id}/v.mp4": OLD})
+    storage = StorageService.__new__(StorageService)
+    storage.bucket, storage.s3, storage.local = "autoshorts-media", fake, None
+    monkeypatch.setattr("app.services.video.storage.settings.S3_PUBLIC_BASE_URL", "http://cdn")
+
+    async with conftest.test_session_factory() as db:
+        db.add(Series(id=series_id, user_id=test_user.id, title="S", topic="t"))
+        # URL sprzed zmiany S3_PUBLIC_BASE_URL — key_from_url go nie rozpozna
+        db.add(Video(series_id=series_id, voice_url=f"http://old-cdn/bucket/{old_audio}"))
+        await db.commit()
+
+        report = await orphan_gc.collect_orphaned_artifacts(
+            db, storage, grace_hours=24, dry_run=False
+        )
+
+    assert report.unparseable_refs == 2  # audio/ i videos/ — osobne przebiegi
+    assert report.series_kept == 2
+    assert report.orphans == report.deleted == 0
+    assert len(fake.objects) == 2
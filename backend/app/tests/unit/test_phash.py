@@ -0,0 +1,58 @@
+"""Testy perceptual hash i indeksu Hamminga."""
+
+import io
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from app.services.media.phash import HashIndex, dhash, hamming, phash, to_signed, to_unsigned
+
+
+def _photo(seed: int) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 256, (48, 27, 3), dtype=np.uint8)
+    return Image.fromarray(noise).resize((540, 960), Image.Resampling.BICUBIC)
+
+
+def _recompressed(img: Image.Image) -> Image.Image:
+    buf = io.BytesIO()
+    img.resize((1080, 1920)).filter(ImageFilter.GaussianBlur(1)).save(buf, "JPEG", quality=60)
+    return Image.open(io.BytesIO(buf.getvalue()))
+
+
+def test_near_duplicates_are_close_and_different_photos_far():
+    original, other = _photo(1), _photo(2)
+    copy = _recompressed(original)
+
+    for hash_fn in (phash, dhash):
+        assert hamming(hash_fn(original), hash_fn(copy)) <= 6
+        assert hamming(hash_fn(original), hash_fn(other)) > 16
+
+
+def test_hash_index_finds_nearest_within_distance():
+    h = phash(_photo(1))
+    index = HashIndex([("a", phash(_photo(2))), ("b", to_signed(h))])
+    index.add("c", phash(_photo(3)))
+
+    assert index.nearest(phash(_recompressed(_photo(1))), max_distance=6)[0] == "b"
+    assert index.nearest(h ^ 0xFFFF_FFFF, max_distance=6) is None
+    assert HashIndex().nearest(h, max_distance=64) is None
+
+
+def test_signed_roundtrip():
+    for h in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+        assert -(1 << 63) <= to_signed(h) < 1 << 63
+        assert to_unsigned(to_signed(h)) == h
+
+
+def test_hash_index_grows_geometrically():
+    index = HashIndex()
+    capacities = set()
+    for i in range(1000):
+        index.add(i, i)
+        capacities.add(len(index._hashes))
+
+    assert len(index) == 1000
+    assert len(capacities) <= 7  # 16, 32, ..., 1024
+    assert index.nearest(999, max_distance=0) == (999, 0)
+    assert len(index.distances(0)) == 1000
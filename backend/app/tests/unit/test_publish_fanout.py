@@ -0,0 +1,126 @@
+"""Testy publikacji na wiele platform z jednego pobrania pliku."""
+
+import io
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+from app.models.platform_connection import PlatformConnection
+from app.models.publish_job import PublishJob, PublishStatus
+from app.models.series import Series
+from app.models.video import Video
+from app.services.publishing import video_source
+from app.services.publishing.instagram_publisher import InstagramPublisher
+from app.services.publishing.tiktok_publisher import TikTokPublisher
+from app.services.publishing.youtube_publisher import YouTubePublisher
+from app.tasks import publishing
+from app.tests import conftest
+
+DATA = b"mp4" * 1000
+
+
+class _FakeStorage:
+    opened = 0
+
+    def key_from_url(self, url):
+        return url.rsplit("/bucket/", 1)[1]
+
+    async def size(self, key):
+        return len(DATA)
+
+    async def open_object(self, key, start=0):
+        type(self).opened += 1
+        return io.BytesIO(DATA[start:])
+
+    async def get_presigned_url(self, key, expires_in=3600):
+        return f"https://signed/{key}"
+
+
+@pytest.mark.asyncio
+async def test_one_fetch_concurrent_uploads_and_per_platform_outcomes(
+    test_user, tmp_path, monkeypatch
+):
+    monkeypatch.setattr("app.core.database.async_session_factory", conftest.test_session_factory)
+    monkeypatch.setattr("app.services.video.storage.AsyncStorageService", _FakeStorage)
+    monkeypatch.setattr(video_source.settings, "PUBLISH_RENDER_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(video_source.settings, "STORAGE_BACKEND", "s3")
+    received: dict[str, bytes] = {}
+
+    async def tiktok_upload(self, access_token, video, title, description, **kwargs):
+        received["tiktok"] = b"".join([c async for c in video.chunks(1024)])
+        return {"publish_id": "tt1"}
+
+    async def youtube_upload(self, access_token, video, *args, **kwargs):
+        received["youtube"] = b"".join([c async for c in video.chunks(1024)])
+        raise RuntimeError("quota exceeded")
+
+    async def create_container(self, access_token, ig_user_id, video_url, caption):
+        assert video_url == "https://signed/videos/v.mp4"
+        return "c1"
+
+    monkeypatch.setattr(TikTokPublisher, "upload", tiktok_upload)
+    monkeypatch.setattr(YouTubePublisher, "upload", youtube_upload)
+    monkeypatch.setattr(InstagramPublisher, "create_container", create_container)
+
+    platforms = ["youtube", "tiktok", "instagram"]
+    series_id = uuid.uuid4()
+    async with conftest.test_session_factory() as db:
+        db.add(Series(id=series_id, user_id=test_user.id, title="S", topic="t"))
+        video = Video(series_id=series_id, video_url="http://s3/bucket/videos/v.mp4")
+        db.add(video)
+        await db.flush()
+        for platform in platforms:
+            db.add(PlatformConnection(
+                user_id=test_user.id, platform=platform, access_token="tok"  # noqa: S106
+            ))
+            db.add(PublishJob(video_id=video.id, platform=platform))
+        await db.commit()
+        video_id = str(video.id)
+
+    outcomes = await publishing._publish_many(video_id, platforms)
+
+    assert _FakeStorage.opened == 1  # jeden GetObject na dwa uploady
+    assert received == {"youtube": DATA, "tiktok": DATA}
+    assert list(tmp_path.iterdir()) == []  # plik tymczasowy usunięty
+    assert outcomes["tiktok"] == "published"
+    assert outcomes["instagram"] == "processing"
+    assert isinstance(outcomes["youtube"], RuntimeError)
+
+    async with conftest.test_session_factory() as db:
+        result = await db.execute(select(PublishJob).where(PublishJob.video_id == video.id))
+        jobs = {job.platform: job for job in result.scalars()}
+    assert jobs["tiktok"].status == PublishStatus.PUBLISHED
+    assert jobs["instagram"].status == PublishStatus.PROCESSING
+    assert jobs["youtube"].status == PublishStatus.UPLOADING  # failed ustawia zadanie Celery
+
+
+@pytest.mark.asyncio
+async def test_youtube_session_cleared_with_published_state(test_user, tmp_path, monkeypatch):
+    monkeypatch.setattr("app.core.database.async_session_factory", conftest.test_session_factory)
+    monkeypatch.setattr("app.services.video.storage.AsyncStorageService", _FakeStorage)
+    monkeypatch.setattr(video_source.settings, "PUBLISH_RENDER_CACHE_DIR", str(tmp_path))
+
+    async def youtube_upload(self, access_token, video, *args, on_session, **kwargs):
+        await on_session("https://upload/session-1")
+        return {"video_id": "yt1", "url": "https://youtu.be/yt1"}
+
+    monkeypatch.setattr(YouTubePublisher, "upload", youtube_upload)
+    series_id = uuid.uuid4()
+    async with conftest.test_session_factory() as db:
+        db.add(Series(id=series_id, user_id=test_user.id, title="S", topic="t"))
+        video = Video(series_id=series_id, video_url="http://s3/bucket/videos/v.mp4")
+        db.add(video)
+        await db.flush()
+        db.add(PlatformConnection(user_id=test_user.id, platform="youtube", access_token="tok"))  # noqa: S106
+        db.add(PublishJob(video_id=video.id, platform="youtube", metadata_extra={"keep": 1}))
+        await db.commit()
+
+    outcomes = await publishing._publish_many(str(video.id), ["youtube"])
+
+    assert outcomes == {"youtube": "published"}
+    async with conftest.test_session_factory() as db:
+        job = await db.scalar(select(PublishJob).where(PublishJob.video_id == video.id))
+    assert job.status == PublishStatus.PUBLISHED
+    assert job.platform_content_id == "yt1"
+    assert job.metadata_extra == {"keep": 1}
@@ -0,0 +1,24 @@
+"""Testy limitera providerów (ścieżki bez działającego Redis)."""
+
+import asyncio
+
+from app.core import rate_limiter
+
+
+def test_slot_fails_open_when_redis_unavailable(monkeypatch):
+    monkeypatch.setattr(rate_limiter.settings, "REDIS_URL", "redis://127.0.0.1:1/0")
+    entered = []
+
+    async def run():
+        async with rate_limiter.provider_slot("openai", "sk-test"):
+            entered.append(True)
+
+    asyncio.run(run())
+    assert entered == [True]
+
+
+def test_keys_do_not_leak_api_key():
+    bucket, inflight = rate_limiter._keys("pexels", "secret-key")
+    assert "secret-key" not in bucket + inflight
+    assert bucket.startswith("ratelimit:pexels:")
+    assert rate_limiter._keys("pexels", "other-key")[0] != bucket
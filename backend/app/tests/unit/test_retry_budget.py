@@ -0,0 +1,46 @@
+"""Testy wspólnego budżetu ponowień."""
+
+import asyncio
+
+import pytest
+from tenacity import retry, wait_none
+
+from app.core.retry_budget import RetryBudget, budgeted_retry_kwargs, use_retry_budget
+
+
+def _flaky(provider: str, calls: list[int]):
+    @retry(**{**budgeted_retry_kwargs(provider, attempts=5), "wait": wait_none()})
+    async def call():
+        calls.append(1)
+        raise ConnectionError("provider down")
+
+    return call
+
+
+def test_budget_caps_retries_across_wrappers():
+    budget = RetryBudget(3)
+    openai_calls: list[int] = []
+    tts_calls: list[int] = []
+
+    async def run():
+        with pytest.raises(ConnectionError):
+            await _flaky("openai", openai_calls)()
+        with pytest.raises(ConnectionError):
+            await _flaky("elevenlabs", tts_calls)()
+
+    with use_retry_budget(budget):
+        asyncio.run(run())
+
+    # 1 + 3 ponowienia dla OpenAI, potem budżet pusty — ElevenLabs bez ponowień
+    assert len(openai_calls) == 4
+    assert len(tts_calls) == 1
+    assert budget.remaining == 0
+    assert budget.denied == {"openai": 1, "elevenlabs": 1}
+    assert budget.amplification() == {"openai": 4.0, "elevenlabs": 1.0}
+
+
+def test_without_budget_only_per_call_limit_applies():
+    calls: list[int] = []
+    with pytest.raises(ConnectionError):
+        asyncio.run(_flaky("openai", calls)())
+    assert len(calls) == 5
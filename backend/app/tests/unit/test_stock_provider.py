@@ -0,0 +1,91 @@
+"""Testy wyboru mediów stockowych (deduplikacja zapytań, omijanie powtórek)."""
+
+import pytest
+
+from app.core.config import get_settings
+from app.services.media import stock_provider
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "PEXELS_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://127.0.0.1:1/0")  # cache fail-open
+
+    calls: list[str] = []
+
+    async def fake_search(client, api_key, query, orientation="portrait"):
+        calls.append(query)
+        return [f"https://img/{query.replace(' ', '-')}/{i}.jpg" for i in range(3)]
+
+    monkeypatch.setattr(stock_provider, "_search_pexels_photos", fake_search)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_identical_descriptions_are_searched_once(searches):
+    scenes = [
+        {"text": "a", "visual_description": "Subscribe, follow button animation!"},
+        {"text": "b", "visual_description": "subscribe follow   button animation"},
+        {"text": "c", "visual_description": "Mountain lake"},
+    ]
+    enriched = await stock_provider.find_media_for_scenes(scenes)
+
+    assert sorted(searches) == ["mountain lake", "subscribe follow button animation"]
+    urls = [s["media_url"] for s in enriched]
+    # Ta sama scena w jednym wideo dostaje innego kandydata
+    assert urls[0] != urls[1]
+    assert len(set(urls)) == 3
+
+
+@pytest.mark.asyncio
+async def test_urls_used_in_series_are_skipped(searches):
+    used = {"https://img/mountain-lake/0.jpg"}
+    enriched = await stock_provider.find_media_for_scenes(
+        [{"text": "x", "visual_description": "Mountain lake"}], exclude_urls=used
+    )
+    assert enriched[0]["media_url"] == "https://img/mountain-lake/1.jpg"
+    assert "https://img/mountain-lake/1.jpg" in used
+
+
+def _photo(width: int, height: int) -> dict:
+    base = "https://images.pexels.com/photos/1/pexels-photo-1.jpeg"
+    return {
+        "width": width,
+        "height": height,
+        "src": {
+            "original": base,
+            "large2x": f"{base}?auto=compress&cs=tinysrgb&dpr=2&h=650&w=940",
+            "large": f"{base}?auto=compress&cs=tinysrgb&h=650&w=940",
+            "portrait": f"{base}?auto=compress&cs=tinysrgb&fit=crop&h=1200&w=800",
+        },
+    }
+
+
+def test_rendition_is_smallest_covering_frame():
+    frame = (1080, 1920)
+    # Pionowe 3000x6000: large2x (mieści się w 1880x1300) jest za niskie,
+    # więc zamiast oryginału (18 MPx) CDN przycina do samego kadru
+    tall = stock_provider.select_rendition(_photo(3000, 6000), frame)
+    assert tall.endswith("fit=crop&w=1080&h=1920")
+
+    # Oryginał mniejszy od kadru — nic lepszego niż oryginał
+    small = stock_provider.select_rendition(_photo(800, 1000), frame)
+    assert small == _photo(800, 1000)["src"]["original"]
+
+    # Mały kadr pokrywa już gotowa rendycja large
+    assert "dpr" not in stock_provider.select_rendition(_photo(3000, 2000), (600, 400))
+
+
+def test_video_file_is_smallest_mp4_covering_frame():
+    video = {
+        "video_files": [
+            {"link": "sd", "file_type": "video/mp4", "width": 540, "height": 960},
+            {"link": "hd", "file_type": "video/mp4", "width": 1080, "height": 1920},
+            {"link": "uhd", "file_type": "video/mp4", "width": 2160, "height": 3840},
+            {"link": "hls", "file_type": "application/x-mpegURL", "width": 0, "height": 0},
+        ]
+    }
+    assert stock_provider.select_video_file(video, (1080, 1920)) == "hd"
+    assert stock_provider.select_video_file(video, (4000, 4000)) == "uhd"
+    assert stock_provider.select_video_file({"video_files": []}, (1080, 1920)) is None
@@ -0,0 +1,35 @@
+"""Testy serwisu storage (wspólny klient, asynchroniczne wywołania w puli wątków)."""
+
+import threading
+
+import pytest
+
+from app.services.analytics import ledger
+from app.services.video import storage
+
+
+class _FakeS3:
+    def __init__(self):
+        self.threads: list[str] = []
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None):  # noqa: N803 — API boto3
+        self.threads.append(threading.current_thread().name)
+
+
+def test_client_is_shared_per_process():
+    assert storage.StorageService().s3 is storage.StorageService().s3
+
+
+@pytest.mark.asyncio
+async def test_async_upload_runs_in_pool_and_keeps_ledger_context(monkeypatch):
+    fake = _FakeS3()
+    monkeypatch.setattr(storage, "get_s3_client", lambda: fake)
+    before = ledger.pending_records()
+
+    with ledger.ledger_video("00000000-0000-0000-0000-000000000001"):
+        url = await storage.AsyncStorageService().upload_bytes(b"abc", "media/x.jpg", "image/jpeg")
+
+    assert url.endswith("/media/x.jpg")
+    assert fake.threads and fake.threads[0].startswith("s3")
+    assert ledger.pending_records() == before + 1
+    assert str(ledger._buffer[-1]["video_id"]) == "00000000-0000-0000-0000-000000000001"
@@ -0,0 +1,40 @@
+"""Testy inkrementalnego parsera scen ze strumienia LLM."""
+
+import json
+
+from app.services.llm.stream_parser import SceneStreamParser
+
+SCRIPT = {
+    "title": "Sceny { i } w tytule",
+    "hook": "scenes",
+    "scenes": [
+        {"text": "Pierwsza scena z \"cudzysłowem\" i [nawiasem]", "visual_description": "a"},
+        {"text": "Druga scena", "visual_description": "b", "meta": {"x": [1, 2]}},
+        {"text": "Trzecia", "visual_description": "c"},
+    ],
+    "call_to_action": "Obserwuj!",
+    "tags": ["a", "b"],
+}
+
+
+def test_parser_emits_each_scene_once_when_complete():
+    raw = json.dumps(SCRIPT, ensure_ascii=False, indent=2)
+    parser = SceneStreamParser()
+
+    emitted = []
+    emitted_at = []
+    for i in range(0, len(raw), 7):
+        for scene in parser.feed(raw[i : i + 7]):
+            emitted.append(scene)
+            emitted_at.append(i)
+
+    assert emitted == SCRIPT["scenes"]
+    # Pierwsza scena musi wyjść, zanim strumień się skończy
+    assert emitted_at[0] < len(raw) // 2
+    assert parser.text == raw
+
+
+def test_parser_ignores_nested_arrays_outside_scenes():
+    raw = json.dumps({"tags": [{"text": "nie scena"}], "scenes": [{"text": "scena"}]})
+    parser = SceneStreamParser()
+    assert parser.feed(raw) == [{"text": "scena"}]
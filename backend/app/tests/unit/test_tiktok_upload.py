@@ -0,0 +1,71 @@
+"""Testy uploadu TikTok w kawałkach (plan zgodny z API, ponowienie jednego kawałka)."""
+
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services.publishing import tiktok_publisher
+from app.services.publishing.tiktok_publisher import plan_chunks
+from app.services.publishing.video_source import VideoSource
+
+MIB = 1024 * 1024
+
+
+def test_plan_chunks_follows_api_rules():
+    assert plan_chunks(3 * MIB, 10 * MIB) == [(0, 3 * MIB)]
+    assert plan_chunks(25 * MIB, 10 * MIB) == [(0, 10 * MIB), (10 * MIB, 15 * MIB)]
+    # Kawałek poniżej minimum API jest podnoszony do 5 MB
+    assert [n for _, n in plan_chunks(12 * MIB, MIB)] == [5 * MIB, 7 * MIB]
+
+
+@pytest.mark.asyncio
+async def test_flaky_chunk_is_retried_alone(tmp_path, monkeypatch):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"v" * (11 * MIB))
+    monkeypatch.setattr(tiktok_publisher.settings, "TIKTOK_UPLOAD_CHUNK_MB", 5)
+
+    real_sleep = asyncio.sleep
+    monkeypatch.setattr(asyncio, "sleep", lambda _: real_sleep(0))
+
+    ranges: list[str] = []
+    failures = {"bytes 0-5242879/11534336": 1}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            info = json.loads(request.content)["source_info"]
+            assert (info["chunk_size"], info["total_chunk_count"]) == (5 * MIB, 2)
+            return httpx.Response(
+                200, json={"data": {"publish_id": "p1", "upload_url": "https://up/1"}}
+            )
+        content_range = request.headers["Content-Range"]
+        ranges.append(content_range)
+        if failures.get(content_range):
+            failures[content_range] -= 1
+            return httpx.Response(500)
+        return httpx.Response(206)
+
+    real_client = httpx.AsyncClient
+    monkeypatch.setattr(
+        tiktok_publisher.httpx,
+        "AsyncClient",
+        lambda **kw: real_client(transport=httpx.MockTransport(handler), **kw),
+    )
+    progress: list[dict] = []
+
+    async def on_progress(p):
+        progress.append(p)
+
+    result = await tiktok_publisher.TikTokPublisher().upload(
+        "token", VideoSource.from_path(str(path)), "Tytuł", "Opis", on_progress=on_progress
+    )
+
+    assert result["publish_id"] == "p1"
+    assert ranges == [
+        "bytes 0-5242879/11534336",
+        "bytes 0-5242879/11534336",
+        "bytes 5242880-11534335/11534336",
+    ]
+    assert [p["chunks_done"] for p in progress] == [1, 2]
+    assert progress[-1]["bytes_done"] == 11 * MIB
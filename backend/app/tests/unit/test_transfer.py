@@ -0,0 +1,183 @@
+"""Testy transferu S3 (multipart z sumami kontrolnymi, wznawianie po przerwaniu)."""
+
+import base64
+import hashlib
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.video import transfer
+
+
+class _FakeS3:
+    """Minimalny S3 multipart w pamięci (weryfikuje ChecksumSHA256 jak S3)."""
+
+    def __init__(self, fail_on_part: int | None = None):
+        self.objects: dict[str, bytes] = {}
+        self.uploads: dict[str, dict[int, tuple[bytes, str]]] = {}
+        self.fail_on_part = fail_on_part
+        self.sent_parts: list[int] = []
+        self.aborted: list[str] = []
+
+    def put_object(self, Bucket, Key, Body, ChecksumSHA256, **kwargs):  # noqa: N803
+        assert base64.b64encode(hashlib.sha256(Body).digest()).decode() == ChecksumSHA256
+        self.objects[Key] = Body
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):  # noqa: N803
+        upload_id = f"up-{len(self.uploads)}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, ChecksumSHA256, **kw):  # noqa: N803
+        if PartNumber == self.fail_on_part:
+            raise ConnectionError("worker restart")
+        assert base64.b64encode(hashlib.sha256(Body).digest()).decode() == ChecksumSHA256
+        self.sent_parts.append(PartNumber)
+        self.uploads[UploadId][PartNumber] = (Body, ChecksumSHA256)
+        return {"ETag": f'"{PartNumber}"'}
+
+    def list_parts(self, Bucket, Key, UploadId, **kwargs):  # noqa: N803
+        parts = self.uploads[UploadId]
+        return {
+            "Parts": [
+                {"PartNumber": n, "ETag": f'"{n}"', "ChecksumSHA256": checksum}
+                for n, (_, checksum) in sorted(parts.items())
+            ],
+            "IsTruncated": False,
+        }
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):  # noqa: N803
+        self.uploads.pop(UploadId)
+        self.aborted.append(UploadId)
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):  # noqa: N803
+        parts = self.uploads.pop(UploadId)
+        numbers = [p["PartNumber"] for p in MultipartUpload["Parts"]]
+        self.objects[Key] = b"".join(parts[n][0] for n in numbers)
+
+
+@pytest.fixture
+def state(monkeypatch):
+    store: dict[str, dict] = {}
+    monkeypatch.setattr(transfer, "_load_state", store.get)
+    monkeypatch.setattr(transfer, "_save_state", store.__setitem__)
+    monkeypatch.setattr(transfer, "_delete_state", lambda k: store.pop(k, None))
+    return store
+
+
+def test_interrupted_multipart_upload_resumes_missing_parts(tmp_path, state):
+    path = tmp_path / "render.mp4"
+    data = bytes(range(256)) * 40  # 10 240 B → 5 części po 2 KiB
+    path.write_bytes(data)
+    s3 = _FakeS3(fail_on_part=4)
+
+    with pytest.raises(ConnectionError):
+        transfer.upload_file(
+            s3, "bucket", str(path), "videos/a.mp4", "video/mp4", part_size=2048, threshold=1
+        )
+    assert len(state) == 1
+
+    s3.fail_on_part = None
+    s3.sent_parts.clear()
+    stats = transfer.upload_file(
+        s3, "bucket", str(path), "videos/a.mp4", "video/mp4", part_size=2048, threshold=1
+    )
+
+    assert stats.key == "videos/a.mp4"
+    assert stats.parts == 5
+    assert stats.resumed_parts == len(set(range(1, 6)) - set(s3.sent_parts))
+    assert 4 in s3.sent_parts
+    assert s3.objects["videos/a.mp4"] == data
+    assert stats.sha256 == hashlib.sha256(data).hexdigest()
+    assert state == {}
+
+
+def test_small_file_uses_single_put_with_checksum(tmp_path, state):
+    path = tmp_path / "voice.mp3"
+    path.write_bytes(b"mp3" * 100)
+    s3 = _FakeS3()
+
+    stats = transfer.upload_file(s3, "bucket", str(path), "audio/x.mp3", "audio/mpeg")
+
+    assert stats.parts == 1
+    assert s3.objects["audio/x.mp3"] == b"mp3" * 100
+
+
+def test_resume_state_is_per_target_key(tmp_path, state):
+    path = tmp_path / "render.mp4"
+    data = bytes(range(256)) * 40
+    path.write_bytes(data)
+    s3 = _FakeS3(fail_on_part=4)
+    with pytest.raises(ConnectionError):
+        transfer.upload_file(
+            s3, "bucket", str(path), "videos/a.mp4", "video/mp4", part_size=2048, threshold=1
+        )
+
+    s3.fail_on_part = None
+    stats = transfer.upload_file(
+        s3, "bucket", str(path), "videos/b.mp4", "video/mp4", part_size=2048, threshold=1
+    )
+
+    assert stats.key == "videos/b.mp4"
+    assert stats.resumed_parts == 0
+    assert s3.objects == {"videos/b.mp4": data}
+
+
+def test_stale_upload_with_other_part_size_is_aborted(tmp_path, state):
+    path = tmp_path / "render.mp4"
+    data = bytes(range(256)) * 40
+    path.write_bytes(data)
+    s3 = _FakeS3(fail_on_part=4)
+    with pytest.raises(ConnectionError):
+        transfer.upload_file(
+            s3, "bucket", str(path), "videos/a.mp4", "video/mp4", part_size=2048, threshold=1
+        )
+
+    s3.fail_on_part = None
+    stats = transfer.upload_file(
+        s3, "bucket", str(path), "videos/a.mp4", "video/mp4", part_size=4096, threshold=1
+    )
+
+    assert s3.aborted == ["up-0"]
+    assert s3.uploads == {}
+    assert stats.resumed_parts == 0
+    assert s3.objects["videos/a.mp4"] == data
+
+
+def test_failed_upload_under_one_off_key_is_aborted(tmp_path, state):
+    path = tmp_path / "render.mp4"
+    path.write_bytes(bytes(range(256)) * 40)
+    s3 = _FakeS3(fail_on_part=4)
+
+    with pytest.raises(ConnectionError):
+        transfer.upload_file(
+            s3,
+            "bucket",
+            str(path),
+            "videos/a.mp4",
+            "video/mp4",
+            part_size=2048,
+            threshold=1,
+            resumable=False,
+        )
+
+    assert s3.aborted == ["up-0"]
+    assert s3.uploads == {}
+    assert state == {}
+
+
+def test_abort_stale_uploads_skips_recent_ones():
+    now = datetime.now(timezone.utc)
+    s3 = _FakeS3()
+    s3.uploads = {"old": {}, "new": {}}
+    page = {
+        "Uploads": [
+            {"Key": "videos/a.mp4", "UploadId": "old", "Initiated": now - timedelta(days=4)},
+            {"Key": "videos/b.mp4", "UploadId": "new", "Initiated": now - timedelta(hours=1)},
+        ]
+    }
+    s3.get_paginator = lambda name: SimpleNamespace(paginate=lambda **kwargs: [page])
+
+    assert transfer.abort_stale_uploads(s3, "bucket", max_age_seconds=3 * 24 * 3600) == 1
+    assert s3.aborted == ["old"]
@@ -0,0 +1,51 @@
+"""Testy lokalnego (offline) providera TTS."""
+
+import io
+import time
+import wave
+
+import pytest
+
+from app.services.tts.tts_service import LocalTTS, get_tts_provider
+
+
+def _duration(audio: bytes) -> float:
+    with wave.open(io.BytesIO(audio)) as wav:
+        return wav.getnframes() / wav.getframerate()
+
+
+def test_factory_returns_local_provider():
+    assert isinstance(get_tts_provider("local"), LocalTTS)
+
+
+@pytest.mark.asyncio
+async def test_local_tts_is_deterministic():
+    tts = LocalTTS()
+    first = await tts.synthesize("Czy wiesz, że ośmiornice mają trzy serca?")
+    second = await tts.synthesize("Czy wiesz, że ośmiornice mają trzy serca?")
+    other_voice = await tts.synthesize("Czy wiesz, że ośmiornice mają trzy serca?", "local-low")
+
+    assert first == second
+    assert first != other_voice
+    assert first[:4] == b"RIFF"
+
+
+@pytest.mark.asyncio
+async def test_local_tts_duration_scales_with_text():
+    tts = LocalTTS()
+    short = await tts.synthesize("Krótki tekst.")
+    long = await tts.synthesize(" ".join(["Znacznie dłuższy tekst narracji."] * 10))
+
+    assert _duration(long) > 5 * _duration(short)
+    # ~15 znaków/s -> 320 znaków to ok. 20 sekund audio
+    assert 15 < _duration(long) < 30
+
+
+@pytest.mark.asyncio
+async def test_local_tts_artificial_latency():
+    tts = LocalTTS()
+    tts.latency_ms = 200
+
+    start = time.monotonic()
+    await tts.synthesize("Test opóźnienia")
+    assert time.monotonic() - start >= 0.2
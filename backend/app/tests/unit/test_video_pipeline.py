@@ -0,0 +1,123 @@
+"""Testy pipeline'u wideo (tryb strumieniowy: media scen wybierane równolegle)."""
+
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import get_settings
+from app.models.media_asset import MediaAsset
+from app.services.media import media_library
+from app.tests import conftest
+
+EMBEDDING = [1.0] + [0.0] * (media_library.settings.EMBEDDING_DIMENSIONS - 1)
+PHASH = 0x0F0F_0F0F_0F0F_0F0F
+
+
+class _Db:
+    def add(self, obj) -> None:
+        pass
+
+    async def commit(self) -> None:
+        pass
+
+
+@pytest.fixture
+def streaming(monkeypatch):
+    """Hook, skrypt, TTS i audio bez sieci; sceny dochodzą ze „strumienia”."""
+    monkeypatch.setattr(get_settings(), "OPENAI_API_KEY", "sk-test")  # klienci przy imporcie
+    from app.services.hooks import hook_optimizer
+    from app.services.llm import embeddings, script_generator, semantic_cache
+    from app.services.tts import tts_service
+    from app.services.video.renderer import VideoRenderer
+
+    scenes = [
+        {"text": f"Scena {i}", "visual_description": "Mountain lake at sunrise"} for i in range(2)
+    ]
+
+    async def cached_generate(db, *, generate, **kwargs):
+        return await generate(None)
+
+    async def generate_hooks(topic, language, few_shot_examples=None):
+        return {"best_hook": ""}
+
+    async def stream_script(topic, on_scene, **kwargs):
+        for scene in scenes:
+            on_scene(scene)
+        return {"scenes": scenes}
+
+    async def synthesize(text, provider_name, voice_id):
+        return b"ID3" + text.encode()
+
+    async def concat_audio(self, audio_paths, output_path):
+        return [1.0] * len(audio_paths)
+
+    async def embed_texts(texts):
+        return [EMBEDDING for _ in texts]
+
+    monkeypatch.setattr(semantic_cache, "cached_generate", cached_generate)
+    monkeypatch.setattr(hook_optimizer, "generate_hooks", generate_hooks)
+    monkeypatch.setattr(script_generator, "stream_script", stream_script)
+    monkeypatch.setattr(tts_service, "synthesize_with_fallback", synthesize)
+    monkeypatch.setattr(VideoRenderer, "concat_audio", concat_audio)
+    monkeypatch.setattr(embeddings, "embed_texts", embed_texts)
+    monkeypatch.setattr(media_library.settings, "MEDIA_LIBRARY_ENABLED", True)
+
+
+@pytest.mark.asyncio
+async def test_streaming_scenes_do_not_share_library_asset(streaming, tmp_path, monkeypatch):
+    from app.tasks import video_pipeline
+
+    async with conftest.test_session_factory() as db:
+        for name in ("lake", "lake-copy"):  # ten sam kadr pod dwoma URL-ami
+            db.add(
+                MediaAsset(
+                    source_url=f"https://pexels/{name}.jpg",
+                    description="mountain lake at sunrise",
+                    embedding=EMBEDDING,
+                    storage_key=f"media/library/{name}.jpg",
+                    public_url=f"https://cdn/{name}.jpg",
+                    phash=media_library.to_signed(PHASH),
+                )
+            )
+        await db.commit()
+
+    async def nearest_asset(db, embedding, exclude, frames):
+        # Bez pgvector: każdy zasób jest „najbliższy”; przełączenie kontekstu
+        # między zapytaniem a wyborem odsłania wyścig równoległych scen
+        assets = (await db.execute(MediaAsset.__table__.select())).all()
+        await asyncio.sleep(0)
+        for row in assets:
+            asset = await db.get(MediaAsset, row.id)
+            fresh = asset.public_url not in exclude and asset.source_url not in exclude
+            if fresh and not media_library._is_duplicate(frames, asset):
+                return asset
+        return None
+
+    async def find_media(scenes, exclude_urls=None):
+        return [{**s, "media_url": "https://pexels/forest.jpg"} for s in scenes]
+
+    async def ingest(db, items):
+        return [None for _ in items]
+
+    monkeypatch.setattr(media_library, "_nearest_asset", nearest_asset)
+    monkeypatch.setattr(media_library, "find_media_for_scenes", find_media)
+    monkeypatch.setattr(media_library, "_ingest", ingest)
+    series = SimpleNamespace(
+        id=uuid.uuid4(),
+        language="pl",
+        tone="edukacyjny",
+        target_duration_seconds=30,
+        prompt_template=None,
+        tts_provider="local",
+        voice_id=None,
+    )
+    video = SimpleNamespace(id=uuid.uuid4(), status=None, hook_text=None)
+
+    _, _, enriched, _ = await video_pipeline._generate_streaming(
+        _Db(), video, series, "jeziora", None, str(tmp_path), set(), conftest.test_session_factory
+    )
+
+    urls = [scene["media_url"] for scene in enriched]
+    assert sorted(urls) == ["https://cdn/lake.jpg", "https://pexels/forest.jpg"]
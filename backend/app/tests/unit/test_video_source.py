@@ -0,0 +1,67 @@
+"""Testy strumieniowego źródła wideo dla publikacji."""
+
+import io
+
+import pytest
+
+from app.services.publishing import video_source
+
+DATA = bytes(range(256)) * 4
+
+
+class _TrickleBody(io.BytesIO):
+    """Jak StreamingBody: read(n) potrafi zwrócić mniej niż n bajtów."""
+
+    def read(self, size=-1):
+        return super().read(min(size, 7) if size and size > 0 else size)
+
+
+class _FakeStorage:
+    def __init__(self):
+        self.opened: list[int] = []
+
+    def key_from_url(self, url):
+        return url.split("/bucket/", 1)[1] if url else None
+
+    async def size(self, key):
+        return len(DATA)
+
+    async def open_object(self, key, start=0):
+        self.opened.append(start)
+        return _TrickleBody(DATA[start:])
+
+
+@pytest.fixture
+def render_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(video_source.settings, "PUBLISH_RENDER_CACHE_DIR", str(tmp_path / "r"))
+    monkeypatch.setattr(video_source.settings, "STORAGE_BACKEND", "s3")
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_streams_full_chunks_from_offset(render_cache):
+    storage = _FakeStorage()
+    source = await video_source.open_video_source(storage, "http://s3/bucket/videos/a.mp4")
+
+    chunks = [c async for c in source.chunks(100, start=300)]
+
+    assert source.origin == "s3"
+    assert storage.opened == [300]
+    assert [len(c) for c in chunks] == [100] * 7 + [24]
+    assert b"".join(chunks) == DATA[300:]
+
+
+@pytest.mark.asyncio
+async def test_prefers_render_retained_on_this_node(render_cache):
+    render = render_cache / "final.mp4"
+    render.write_bytes(DATA)
+    video_source.retain_local_render(str(render), "videos/a.mp4")
+    storage = _FakeStorage()
+
+    source = await video_source.open_video_source(storage, "http://s3/bucket/videos/a.mp4")
+    other = await video_source.open_video_source(storage, "http://s3/bucket/videos/b.mp4")
+
+    assert source.origin == "local_render"
+    assert b"".join([c async for c in source.chunks(512)]) == DATA
+    assert other.origin == "s3"
+    assert storage.opened == []
@@ -0,0 +1,42 @@
+"""Testy katalogu głosów (ETag + walidacja voice_id serii)."""
+
+import pytest
+from httpx import AsyncClient
+
+
+@pytest.mark.asyncio
+async def test_list_voices_with_etag(client: AsyncClient, auth_headers):
+    response = await client.get("/api/v1/voices?provider=local", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert {v["id"] for v in data["voices"]} == {"local-low", "local-mid", "local-high"}
+
+    etag = response.headers["ETag"]
+    cached = await client.get(
+        "/api/v1/voices?provider=local",
+        headers={**auth_headers, "If-None-Match": etag},
+    )
+    assert cached.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_list_voices_unknown_provider(client: AsyncClient, auth_headers):
+    response = await client.get("/api/v1/voices?provider=nope", headers=auth_headers)
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_create_series_rejects_unknown_voice(client: AsyncClient, auth_headers):
+    response = await client.post(
+        "/api/v1/series",
+        headers=auth_headers,
+        json={"title": "Głos", "topic": "Topic", "tts_provider": "local", "voice_id": "missing"},
+    )
+    assert response.status_code == 422
+
+    response = await client.post(
+        "/api/v1/series",
+        headers=auth_headers,
+        json={"title": "Głos", "topic": "Topic", "tts_provider": "local", "voice_id": "local-low"},
+    )
+    assert response.status_code == 201
@@ -0,0 +1,133 @@
+"""Testy uploadu YouTube w kawałkach (resumable, wznawianie od offsetu)."""
+
+import httpx
+import pytest
+
+from app.services.publishing import youtube_publisher
+from app.services.publishing.video_source import VideoSource
+
+SESSION = "https://upload.example/session/1"
+CHUNK = 256 * 1024
+
+
+class _FakeSession:
+    """Serwer resumable: pamięta potwierdzone bajty, opcjonalnie psuje wybrany kawałek."""
+
+    def __init__(
+        self, size: int, received: int = 0, fail_at: int | None = None, fail_status: int = 0
+    ):
+        self.size, self.received, self.fail_at = size, received, fail_at
+        self.fail_status = fail_status  # ile zapytań o stan ma się nie udać
+        self.puts: list[str] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            assert request.headers["X-Upload-Content-Length"] == str(self.size)
+            return httpx.Response(200, headers={"Location": SESSION})
+        content_range = request.headers["Content-Range"]
+        self.puts.append(content_range)
+        if content_range.startswith("bytes */") and self.fail_status:
+            self.fail_status -= 1
+            raise httpx.ConnectError("connection reset")
+        if not content_range.startswith("bytes */"):
+            start = int(content_range.split()[1].split("-")[0])
+            if start == self.fail_at:
+                self.fail_at = None
+                return httpx.Response(503)
+            assert start == self.received
+            self.received += len(request.content)
+        if self.received == self.size:
+            return httpx.Response(200, json={"id": "yt123"})
+        headers = {"Range": f"bytes=0-{self.received - 1}"} if self.received else {}
+        return httpx.Response(308, headers=headers)
+
+
+@pytest.fixture
+def youtube(tmp_path, monkeypatch):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(b"x" * (CHUNK * 2 + 1000))
+    monkeypatch.setattr(youtube_publisher.settings, "YOUTUBE_UPLOAD_CHUNK_MB", 0)  # = 256 KiB
+
+    async def no_sleep(_):
+        return None
+
+    monkeypatch.setattr(youtube_publisher.asyncio, "sleep", no_sleep)
+
+    def install(server: _FakeSession):
+        real_client = httpx.AsyncClient
+        monkeypatch.setattr(
+            youtube_publisher.httpx,
+            "AsyncClient",
+            lambda **kw: real_client(transport=httpx.MockTransport(server.handler), **kw),
+        )
+
+    return VideoSource.from_path(str(path)), install
+
+
+@pytest.mark.asyncio
+async def test_failed_chunk_is_resumed_from_acknowledged_offset(youtube):
+    video, install = youtube
+    server = _FakeSession(video.size, fail_at=CHUNK)
+    install(server)
+    sessions: list[str] = []
+
+    async def on_session(url):
+        sessions.append(url)
+
+    result = await youtube_publisher.YouTubePublisher().upload(
+        "token", video, "Tytuł", "Opis", [], on_session=on_session
+    )
+
+    assert result["video_id"] == "yt123"
+    assert sessions == [SESSION]
+    assert server.puts == [
+        f"bytes 0-{CHUNK - 1}/{video.size}",
+        f"bytes {CHUNK}-{2 * CHUNK - 1}/{video.size}",  # 503
+        f"bytes */{video.size}",
+        f"bytes {CHUNK}-{2 * CHUNK - 1}/{video.size}",
+        f"bytes {2 * CHUNK}-{video.size - 1}/{video.size}",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_persisted_session_sends_only_missing_bytes(youtube):
+    video, install = youtube
+    server = _FakeSession(video.size, received=2 * CHUNK)
+    install(server)
+
+    result = await youtube_publisher.YouTubePublisher().upload(
+        "token", video, "Tytuł", "Opis", [], session_url=SESSION
+    )
+
+    assert result["video_id"] == "yt123"
+    assert server.puts == [
+        f"bytes */{video.size}",
+        f"bytes {2 * CHUNK}-{video.size - 1}/{video.size}",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_failed_status_query_counts_as_resume(youtube):
+    video, install = youtube
+    server = _FakeSession(video.size, fail_at=CHUNK, fail_status=1)
+    install(server)
+
+    result = await youtube_publisher.YouTubePublisher().upload("token", video, "T", "O", [])
+
+    assert result["video_id"] == "yt123"
+    assert server.puts[1:5] == [
+        f"bytes {CHUNK}-{2 * CHUNK - 1}/{video.size}",  # 503
+        f"bytes */{video.size}",  # błąd sieci
+        f"bytes */{video.size}",
+        f"bytes {CHUNK}-{2 * CHUNK - 1}/{video.size}",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_status_query_failures_respect_resume_limit(youtube, monkeypatch):
+    video, install = youtube
+    monkeypatch.setattr(youtube_publisher.settings, "YOUTUBE_UPLOAD_MAX_RESUMES", 2)
+    install(_FakeSession(video.size, fail_at=CHUNK, fail_status=10))
+
+    with pytest.raises(httpx.ConnectError):
+        await youtube_publisher.YouTubePublisher().upload("token", video, "T", "O", [])